@@ -1,4 +1,3 @@
-from curses import nonl
 import re
 import asyncio
 import sys
@@ -10,22 +9,43 @@ import traceback
 import os
 import shutil
 import signal
-from threading import Thread
-from pynput.keyboard import Listener, Key
 import xml.etree.ElementTree as ET
-from collections import deque
 import aiofiles
 import aiofiles.os
-from huggingface_hub.commands import user
-from numpy import full
 from termcolor import colored
 import aioconsole
-from pynput import keyboard
+from aioconsole.stream import NonFileStreamReader, NonFileStreamWriter
 from anthropic import AsyncAnthropic, RateLimitError, APIError
+from anthropic.types import Message
 # from simple_editor import SimpleEditor
 # from fileselector import FileTreeSelector
 from fileselector import select_files_manually
 from requirements import do_requirements
+from response_cache import ResponseCache
+from rate_limiter import RateLimiter, estimate_request_tokens, get_retry_after
+from stream_writer import StreamingFileWriter, FILE_TAG
+from code_outline import extract_outline
+from context_packer import pack_context, estimate_tokens
+from code_edits import parse_edits, apply_hunks
+from retrieval_index import RetrievalIndex
+from traceback_parser import parse_errors, normalize_path
+from fix_memo import FixMemo
+from plan_scheduler import build_dependency_graph, topological_waves, run_waves
+from snapshot_store import SnapshotStore
+from project_index import ProjectIndex
+from dependency_env import DependencyEnvironment
+from process_runner import ProcessRunner
+from suite_runner import run_test_suite
+from impact_analysis import ImpactSelector
+from prompt_cache import build_system, uses_cache_control, CacheStats, PROMPT_CACHING_BETA
+from fake_anthropic import FakeAnthropic
+from tracing import Tracer, trace_calls, current_span, LLM_SPAN
+from pipeline_state import PipelineState
+from speculation import Speculation
+from log_sink import LogSink
+from loc_counter import LineCounter
+from batch_runner import HeadlessPolicy, run_batch, read_json, write_json, JOB_FILE, RESULT_FILE, LOG_FILE, MAX_ERROR_CHARS, DEFAULT_WORKERS, DEFAULT_JOB_TIMEOUT
+from workspace import Workspace, current_workspace, set_default_workspace, use_workspace, route_output
 
 show_user_consent = False
 FILE_EXTENSIONS = (
@@ -40,22 +60,66 @@ FOLDERS_TO_EXCLUDE = ['node_modules', 'venv', '.venv', 'env', '.env', 'build',
 IGNORE_PATTERNS = [f for f in FOLDERS_TO_EXCLUDE]
 FILES_TO_EXCLUDE = ['appmap.log']
 ENCODINGS = ['utf-8', 'latin-1', 'ascii']
-unittest_exists = False
-requirements_installed = False
+PROJECT_INDEX_MEMORY_BUDGET = 64 * 1024 * 1024 # bytes of file contents kept in memory
+CONTEXT_TOKEN_BUDGET = 60000 # tokens of project files per prompt, less relevant files are reduced to signatures
+ERROR_REMINDER_LINES = 15 # lines of the error repeated at the end of a fix prompt
+MAX_ERROR_LINES = 80 # longer error output is sent as a summary of the distinct errors plus its tail
+RETRIEVAL_CONFIDENCE = 0.3 # below this select_relevant_files asks the model instead of the local index
+USE_PROJECT_VENV = True # run the app in a reusable virtualenv in .system/venv instead of this interpreter
+PIP_TIMEOUT = 300 # seconds
+RUN_TIMEOUT = None # seconds the application may run, None to run until it exits or Ctrl+C
+RUN_IDLE_TIMEOUT = None # seconds without output before the application is stopped
+UNITTEST_TIMEOUT = 300 # seconds
+UNITTEST_IDLE_TIMEOUT = 120 # seconds
+PROCESS_OUTPUT_LINES = 2000 # lines of stdout/stderr kept per run
+TEST_TIMEOUT = 60 # seconds per test of the project's test suite
+TEST_WORKERS = os.cpu_count() or 1 # test modules run in parallel worker processes
+RUN_ALL_TESTS = False # set True or pass --all-tests to ignore the impact analysis and run every test module
+BATCH_FOLDER = "batch" # --batch workspaces and results.jsonl, one folder per batch file
+BATCH_WORKERS = DEFAULT_WORKERS # jobs built at once by --batch, sharing the api rate limits
+BATCH_IN_PROCESS = True # --batch builds the jobs as concurrent workspaces of this process, False starts a worker process per job
 dont_send_diagnostic_file = True
-max_attempts = 5 # create application
+max_attempts = 5 # create application, fix rounds before the user is asked
 default_number_of_iterations = 2
 PRINT_RESPONSE = True
-REQUEST_LIMIT = 145
+STREAM_RESPONSES = True # write generated files to disk as the response streams in
+EDIT_MODE = "diff" # "diff": fix and feedback rounds return search/replace edits, "full": whole files
+EDIT_FORMAT_INSTRUCTIONS = """For files that already exist return only the changes, as search/replace blocks in the following format:
+<edit name="path/to/filename.ext">
+<<<<<<< SEARCH
+the exact lines of the current file to replace, with a few lines of context so they are unique
+=======
+the new lines
+>>>>>>> REPLACE
+</edit>
+Use one SEARCH/REPLACE block per change, an <edit> block may contain several. Unified diffs inside <edit> are accepted too.
+For new files return the full contents in the following format:
+<file name="path/to/filename.ext">
+file_contents
+</file>
+"""
+REQUEST_LIMIT = 145 # requests per TIME_WINDOW
+INPUT_TOKEN_LIMIT = 80000 # input tokens per TIME_WINDOW
+OUTPUT_TOKEN_LIMIT = 16000 # output tokens per TIME_WINDOW
+MAX_CONCURRENT_REQUESTS = 8
+GENERATION_PARALLELISM = MAX_CONCURRENT_REQUESTS # files generated at once within a dependency wave
 TIME_WINDOW = 60  # seconds
+PROMPT_CACHING = True # send the plan and references as cached system blocks shared by every request
 MAX_RETRIES = 20 # number of ai retrys api issue
-BASE_DELAY = 60  # second
-request_counter = 0
-DEV_FOLDER = "devfolder"
+BASE_DELAY = 60  # second, upper bound of the backoff when the server sends no retry-after
+DEV_FOLDER = "devfolder" # project folder of a workspace, its .system folder holds the plan, logs, caches and snapshots
 THIS_DIRECTORY = os.getcwd()
-PROJECT_SYSTEM_FOLDER = f"{THIS_DIRECTORY}/{DEV_FOLDER}/.system"
-BACKUP_FOLDER = f"{PROJECT_SYSTEM_FOLDER}/{DEV_FOLDER}_backup"
-LOGS_FOLDER = f"{PROJECT_SYSTEM_FOLDER}/logs"
+SNAPSHOTS_TO_KEEP = 20
+LOG_MAX_BYTES = 5 * 1024 * 1024 # a log file is rotated into gzip compressed generations past this size
+LOG_BACKUPS = 3
+RESPONSE_CACHE_ENABLED = True # set False or pass --no-cache to always call the api
+RESPONSE_CACHE_MAX_BYTES = 200 * 1024 * 1024 # 200 MB, least recently used entries are evicted
+RESPONSE_CACHE_TTL = 7 * 24 * 60 * 60 # seconds
+TRACING_ENABLED = True # timing spans of every session in .system/logs/trace.jsonl, summarize with python tracing.py
+FIX_MEMO_FILE = f"{THIS_DIRECTORY}/projects/fix_memo.json" # patches that resolved an error, shared by all projects
+FIX_SEND_DELAY = 3 # seconds to read the list of files before a fix request is sent
+WRITE_SETTLE_DELAY = 1 # seconds to wait after writing a batch of files before they are run
+READ_BACK_DELAY = 0.5 # seconds to wait before a written file is read back for verification
 current_line_count = 0
 ANTHROPIC_API_KEY = "sk-ant-REDACTED"
 print(__name__)
@@ -72,8 +136,58 @@ if "ANTHROPIC_API_KEY" not in os.environ:
         print(colored("Make sure api key ANTHROPIC_API_KEY is set in environment variable.", "yellow"))
         sys.exit(0)
 
-# Initialize Anthropic client
-client = AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+# Initialize Anthropic client, or the offline fake when FAKE_ANTHROPIC is set (see fake_anthropic.py)
+client = FakeAnthropic.from_env() or AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+# Shared by every concurrent request of every workspace so REQUEST_LIMIT and the token limits hold across asyncio.gather fan-outs and concurrent builds
+rate_limiter = RateLimiter(REQUEST_LIMIT, INPUT_TOKEN_LIMIT, OUTPUT_TOKEN_LIMIT, max_concurrency=MAX_CONCURRENT_REQUESTS, period=TIME_WINDOW)
+fix_memo = FixMemo(FIX_MEMO_FILE)
+
+
+def create_workspace(root=THIS_DIRECTORY, headless_policy=None, limiter=None):
+    """
+    Creates the workspace of the project in root/DEV_FOLDER with its own caches, indexes, checkpoint and trace.
+
+    Args:
+        root (str, optional): The folder holding DEV_FOLDER. Defaults to THIS_DIRECTORY.
+        headless_policy (HeadlessPolicy, optional): Answers the prompts of an unattended build.
+        limiter (RateLimiter, optional): The api budget of the workspace, the rate_limiter shared by
+            every workspace of the process by default.
+
+    Returns:
+        Workspace: The workspace, make it current with use_workspace.
+    """
+    ws = Workspace(root, DEV_FOLDER, headless_policy=headless_policy,
+                   max_attempts=headless_policy.max_fix_attempts if headless_policy is not None else max_attempts)
+    ws.rate_limiter = limiter if limiter is not None else rate_limiter
+    # Cached contents of the project files, revalidated by mtime and size
+    ws.project_index = ProjectIndex(ws.dev_folder, FILE_EXTENSIONS, exclude_dirs=FOLDERS_TO_EXCLUDE, memory_budget=PROJECT_INDEX_MEMORY_BUDGET, encodings=ENCODINGS)
+    # BM25 index over the project files and plan descriptions used to select relevant files
+    ws.retrieval_index = RetrievalIndex()
+    # Installs only the requirements that changed since the last run
+    ws.dependency_environment = DependencyEnvironment(ws.dev_folder, ws.system_folder, use_venv=USE_PROJECT_VENV, pip_timeout=PIP_TIMEOUT)
+    ws.response_cache = ResponseCache(ws.response_cache_folder, max_bytes=RESPONSE_CACHE_MAX_BYTES, ttl=RESPONSE_CACHE_TTL, enabled=RESPONSE_CACHE_ENABLED)
+    ws.prompt_cache_stats = CacheStats()
+    ws.tracer = Tracer(ws.trace_file, enabled=TRACING_ENABLED)
+    # Checkpoint of the session, continued with --resume
+    ws.pipeline_state = PipelineState(ws.pipeline_state_file)
+    # Work started while a prompt waits for the user, kept or dropped depending on the answer
+    ws.speculation = Speculation()
+    # Prompts and responses written to the logs folder are queued and written in batches by a background task
+    ws.log_sink = LogSink(ws.logs_folder, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS)
+    # Recounts only the files that changed since the last count_lines_of_code
+    ws.line_counter = LineCounter(ws.dev_folder, FILE_EXTENSIONS, exclude_dirs=FOLDERS_TO_EXCLUDE)
+    # Skips test modules that passed against the same versions of the files they depend on
+    ws.impact_selector = ImpactSelector(ws.test_impact_file, coverage_map_path=ws.test_coverage_map_file)
+    return ws
+
+
+def traced(name=None, args=()):
+    """Tracer.traced writing to the tracer of the workspace each call runs in."""
+    return trace_calls(lambda: current_workspace().tracer, name, args)
+
+
+# The project in THIS_DIRECTORY, used by interactive sessions and wherever no other workspace is active
+set_default_workspace(create_workspace())
 
 # Function to check for consecutive user messages and add a separator
 def add_separator_between_consecutive_user_messages(messages):
@@ -92,22 +206,24 @@ def add_separator_between_consecutive_user_messages(messages):
     return messages
 
 # Function for planner agents to discuss and plan the project
+@traced()
 async def plan_project(user_input, iterations):
     """
     Plan a Python application project based on user input and number of iterations.
     """
+    ws = current_workspace()
     system_message_1 = f"""You are a logical, critical application design expert. Your role is to discuss and plan with a critical and rigorous eye, a python Full Stack applications project based on user input. One of the main goals is to review the logic of the code to ensure a user-friendly and enjoyable application experience for the user.
 Focus on application mechanics, structure, and overall design and function and method inputs inputs(proper inputs and number of inputs) and returns of functions and methods. Do not suggest external media files or images. make sure no code files need any external files. All assets must be generated. for images or media use place holder files. Critical objective is to keep the project logically structured simple while making sure no circular imports or broken imports occur. No need to discuss timelines or git commands. Main purpose is to review and evaluate the project structure so that when the final files and their descriptions are prepared the code will function without any errors.
 Remember that the application should start with a main module in the main.py file.
 here is the user input: {user_input}
 """
-    await save_file_contents(f"{LOGS_FOLDER}/initial_project_plan_file_system_prompt_1.txt", system_message_1)
+    await save_file_contents(f"{ws.logs_folder}/initial_project_plan_file_system_prompt_1.txt", system_message_1)
     system_message_2 = f"""You are a logical, critical Python architecture expert Full Stack Developer. Your role is to discuss and plan with a critical and rigorous eye the file structure for a python application project. One of the main goals is to review the logic of the code to ensure a user-friendly and enjoyable application play experience for the user.
 Focus on code organization, modularity, and best practices for functions and methods (proper inputs and number of inputs) and their returns. Make sure no code files need any external files. All assets must be generated. for images or media use place holder files. Critical objective is to keep the project structure logical while making sure no circular imports or broken imports occur. No need to discuss timelines or git commands. Main purpose is to review and evaluate the project structure so that when the final files and their descriptions are prepared the code will function without any errors.
 Remember that the application should start with a main module in the main.py file.
 Here is the user input: {user_input}
 """
-    await save_file_contents(f"{LOGS_FOLDER}/initial_project_plan_file_system_prompt_2.txt", system_message_2, mode="a")
+    await save_file_contents(f"{ws.logs_folder}/initial_project_plan_file_system_prompt_2.txt", system_message_2, mode="a")
     messages_1 = [{"role": "user", "content": f"please plan a python application project based on the following user input: {user_input}. Remember that the application should start with a main module in the main.py file."}]
 
     messages_2 = []
@@ -183,13 +299,13 @@ IMPORTANT please return all file names including there relative path ./ along wi
             if response_2 and hasattr(response_2, "content") and response_2.content[0] and hasattr(response_2.content[0], "text"):
                 print(colored(response_2.content[0].text, "blue"))  # type: ignore
         print(colored("Application structure so far : do you want to continue?", "green"))
-        x = get_string_from_user(colored("(y/n): ", "green"), default_string="y")
+        x = await get_string_from_user(colored("(y/n): ", "green"), default_string="y")
         if x == "n":
             is_final = True
     for i, message in enumerate(messages_1):
-        await save_file_contents(f"{LOGS_FOLDER}/initial_project_plan_file_message_1.txt", message["content"]+"\n\n", mode="a")
+        await save_file_contents(f"{ws.logs_folder}/initial_project_plan_file_message_1.txt", message["content"]+"\n\n", mode="a")
     for i, message in enumerate(messages_2):
-        await save_file_contents(f"{LOGS_FOLDER}/initial_project_plan_file_message_2.txt", message["content"]+"\n\n", mode="a")
+        await save_file_contents(f"{ws.logs_folder}/initial_project_plan_file_message_2.txt", message["content"]+"\n\n", mode="a")
     xml_content = False
     if response_2 and hasattr(response_2, "content") and response_2.content[0] and hasattr(response_2.content[0], "text"):    # Extract the XML content from the response
         xml_content = re.search(r'<application_plan>.*?</application_plan>', response_2.content[0].text, re.DOTALL) # type: ignore
@@ -199,17 +315,15 @@ IMPORTANT please return all file names including there relative path ./ along wi
         raise ValueError("No valid XML content found in the response")
 
 # Function to call model and write files
-async def agent_write_file(file_name, file_description, application_plan):
-    if os.path.exists(f"{DEV_FOLDER}/{file_name}"):
+@traced(args=("file_name",))
+async def agent_write_file(file_name, file_description, application_plan, dependency_signatures=""):
+    ws = current_workspace()
+    if os.path.exists(f"{ws.dev_folder}/{file_name}"):
         pass
     else:
         print(colored(f"Creating file '{file_name}' ... ", "yellow"))
         # create application folder if it doesnt exist
-        os.makedirs(f"{DEV_FOLDER}", exist_ok=True)
-        additional_system_message = ""
-        if os.path.exists(f"{THIS_DIRECTORY}/additional_info.txt"):
-            additional_info = await get_file_contents(f"{THIS_DIRECTORY}/additional_info.txt")
-            additional_system_message = f"heres some additional references: \n{additional_info}"
+        os.makedirs(ws.dev_folder, exist_ok=True)
         system_message = f"""You are a Python and Web Full Stack expert Developer. Your task is to write a error free code file for a the application based on the overall project logical structure. IMPORTANT Always return the full contents of the file. One of the main goals is to review the logic of the code to ensure a user-friendly and welformed enjoyable application experience for the user.
 Do not include any external media files or images in your code instead include placeholders files with no content.
 Write clean, well-commented code that follows best practices.
@@ -217,36 +331,54 @@ Add comment at top of file with purpose of the file and short simple description
 Make sure that any error is logged appropriately to the terminal use traceback.
 Always add debugging statements to your code if DEBUG = True, DEBUG = True by default. Debug and Verify All Pathways.
 The application should start with a main module in the main.py file(main shouldn't take any arguments).
+Follow the application plan above while writing the file.
 return the code for the file in the following format:
 <code>
 file code
 </code>
-
-    {additional_system_message}
-    """
-        await save_file_contents(f"{LOGS_FOLDER}/initial_project_file_system_prompt.txt", system_message, mode="w")
+"""
+        system = build_system(await project_context(application_plan), system_message, enabled=PROMPT_CACHING)
+        await save_file_contents(f"{ws.logs_folder}/initial_project_file_system_prompt.txt", system_message, mode="w")
         if file_name == "main.py":
             main = ",  and should have a comment IMPORTANT: do not remove main function as automated test will fail IMPORTANT: do not remove this comment"
         else:
             main = ""
+        dependencies = ""
+        if dependency_signatures:
+            dependencies = f"""
+These files that '{file_name}' depends on have already been written. Import from them using exactly these names and signatures:
+<dependencies>
+{dependency_signatures}
+</dependencies>
+"""
         prompt = f"""Create a file named '{file_name}' with the following description: {file_description}
-
+{dependencies}
 For python files include famework such as unittest
 
-
-Here's the overall application plan which you should follow while writing the file:
-{application_plan}
-
 Remember, the application should start with a main module in the main.py file(main shouldn't take any arguments{main}). Always return the full contents of the file
         """
-        await save_file_contents(f"{LOGS_FOLDER}/{file_name}", prompt, mode="w")
+        await save_file_contents(f"{ws.logs_folder}/{file_name}", prompt, mode="w")
+        stream_handler = None
+        if STREAM_RESPONSES:
+            # the <code> body is written to {file_name}.partial as it arrives and renamed into place on </code>
+            stream_handler = StreamingFileWriter(lambda _: f"{ws.dev_folder}/{file_name}", single=True,
+                                                 on_complete=on_streamed_file, on_restore=record_project_write)
         # send prompt to model
-        response = await rate_limited_request(
-            model="claude-3-5-sonnet-20240620",
-            system=system_message,
-            max_tokens=4000,
-            messages=[{"role": "user", "content": prompt}],
-            )
+        try:
+            response = await rate_limited_request(
+                model="claude-3-5-sonnet-20240620",
+                system=system,
+                max_tokens=4000,
+                messages=[{"role": "user", "content": prompt}],
+                stream_handler=stream_handler,
+                )
+        finally:
+            if stream_handler is not None:
+                # a response cut off before </code> leaves the .partial file open
+                stream_handler.abort()
+        if stream_handler is not None and stream_handler.completed:
+            print(f"File '{file_name}' has been created.")
+            return
         # extract code
         if response and hasattr(response, "content") and response.content[0] and hasattr(response.content[0], "text"):
             code = response.content[0].text  # type: ignore
@@ -255,23 +387,71 @@ Remember, the application should start with a main module in the main.py file(ma
             print(colored(f"response : {response}"))
         code = code.split("<code>")[1].split("</code>")[0]
 
-        # remove old backup folder then duplicate app folder to backup
-        print(colored(f"Warning ! {DEV_FOLDER}_backup will be deleted. Creating backup folder ... ", "red"))
-        await update_backup_folder()
-        dirname = os.path.dirname(os.path.join(os.path.dirname(__file__), f"{DEV_FOLDER}/{file_name}"))
+        dirname = os.path.dirname(f"{ws.dev_folder}/{file_name}")
         await aiofiles.os.makedirs(dirname, exist_ok=True)
-        await save_file_contents(f"{DEV_FOLDER}/{file_name}", code)
+        await save_file_contents(f"{ws.dev_folder}/{file_name}", code)
 
         print(f"File '{file_name}' has been created.")
 
 
+def report_syntax_errors(file_path, content=None):
+    """
+    Compiles a freshly written python file and prints any syntax error, so problems show up while
+    the rest of the response is still streaming.
+
+    Args:
+        file_path (str): The path of the written file.
+        content (str, optional): The written content, read from the file when not given.
+    """
+    if not file_path.endswith(".py"):
+        return
+    try:
+        if content is None:
+            with open(file_path, "r", encoding="utf-8") as f:
+                content = f.read()
+        compile(content, file_path, "exec")
+    except SyntaxError as e:
+        print(colored(f"Syntax error in {file_path} line {e.lineno}: {e.msg}", "red"))
+    except (OSError, UnicodeDecodeError, ValueError) as e:
+        print(colored(f"Unable to check syntax of {file_path}: {e}", "red"))
+
+
+def record_project_write(file_name, content, mode="w"):
+    """
+    Brings the indexes of the current workspace up to date after a project file was written, and
+    marks it changed for the test impact selection. Files outside the project are ignored.
+
+    Args:
+        file_name (str): The path of the written file.
+        content (str or None): The written content, None if the file was removed.
+        mode (str, optional): The file mode it was written with; appended files are re-read from disk.
+    """
+    ws = current_workspace()
+    ws.project_index.invalidate_path(file_name)
+    relative_path = ws.project_index.relative_path(file_name)
+    if relative_path is not None and ws.project_index.is_indexed(relative_path):
+        if mode == "w" and content is not None:
+            ws.retrieval_index.update(relative_path, content)
+        else:
+            ws.retrieval_index.remove(relative_path)
+        ws.changed_files.add(relative_path)
+
+
+def on_streamed_file(file_path, content):
+    """Post-write hook of the stream writers: the same bookkeeping as save_file_contents, plus a syntax check."""
+    record_project_write(file_path, content)
+    report_syntax_errors(file_path, content)
+
+
 # Function to create plan or application_plan.xml
+@traced(args=("coding_phase",))
 async def create_plan(coding_phase):
     """
     Asynchronously creates a plan for a Python application based on the given coding phase.
 
     Args:
-        coding_phase (str): The phase of coding. Can be either "create" or "plan".
+        coding_phase (str): The phase of coding. Can be "create", "plan", "fix", "feedback" or "resume".
+            "resume" continues the checkpointed session and skips every step it already finished.
 
     Returns:
         Tuple[str, str]: A tuple containing the coding phase and the final plan for the application.
@@ -282,10 +462,23 @@ async def create_plan(coding_phase):
     Description:
         This function first checks if the coding phase is "create". If it is, it prompts the user to describe the Python application they want to create and saves the user input to a log file. It then sends the user input to a model for prompt rewriting and uses the response to update the user input. It then prompts the user for the number of planning iterations they want and saves the final plan to a file. If the coding phase is "plan", it prompts the user to enter the multiline input for the application plan. Otherwise, it plans the application structure using the user input and saves the final plan to a file. It then creates the application files based on the file structure and counts the lines of code in the application. Finally, it returns the coding phase and the final plan for the application.
     """
+    ws = current_workspace()
     iterations = 2
-    if coding_phase == "create":
-        user_input = input(colored("Describe the python application application you want to create: ", "green"))
-        await save_file_contents(f"{LOGS_FOLDER}/initial_project_description.txt", user_input, mode="a")
+    resume = coding_phase == "resume"
+    if resume:
+        print(colored(f"Resuming session: {ws.pipeline_state.summary()}", "yellow"))
+        if ws.pipeline_state.reached("generated"):
+            return "fix", await get_file_contents(ws.plan_file)
+        coding_phase = "create"
+    if resume and ws.pipeline_state.reached("described"):
+        user_input = ws.pipeline_state.get("description")
+        iterations = ws.pipeline_state.get("iterations", default_number_of_iterations)
+    elif coding_phase == "create":
+        if ws.headless_policy is not None:
+            user_input = ws.headless_policy.description
+        else:
+            user_input = await ainput(colored("Describe the python application application you want to create: ", "green"))
+        await save_file_contents(f"{ws.logs_folder}/initial_project_description.txt", user_input, mode="a")
         system_message = """You are a prompt rewrite the following:"""
         # send prompt to model
         response = await rate_limited_request(
@@ -300,26 +493,31 @@ async def create_plan(coding_phase):
         if PRINT_RESPONSE:
             print(colored(system_message, "magenta"))
             print(colored(user_input, "green"))
-        iterations = await get_number_from_user("How many planning iterations do you want? Higher numbers for more planning: ", default_number=default_number_of_iterations)
+        if ws.headless_policy is not None:
+            iterations = ws.headless_policy.planning_iterations
+        else:
+            iterations = await get_number_from_user("How many planning iterations do you want? Higher numbers for more planning: ", default_number=default_number_of_iterations)
+        ws.pipeline_state.update("described", description=user_input, iterations=iterations)
     if coding_phase == "create" or coding_phase == "plan":
-        if coding_phase == "plan":
+        if resume and ws.pipeline_state.reached("planned"):
+            final_plan = await load_application_plan()
+        elif coding_phase == "plan":
             # get multiline input for manual input of application_plan.xml
-            print(colored(f"Enter your multiline input {PROJECT_SYSTEM_FOLDER}/application_plan.xml file contents. Press Ctrl+D (Unix) or Ctrl+Z (Windows) followed by Enter to finish:", "green"))
-            final_plan = get_multiline_input()
+            print(colored(f"Enter your multiline input {ws.plan_file} file contents. Press Ctrl+D (Unix) or Ctrl+Z (Windows) followed by Enter to finish:", "green"))
+            final_plan = await get_multiline_input()
         else:
             print(colored("Planning the application structure ... ", "yellow"))
             final_plan = await plan_project(user_input, iterations)
 
-        await save_application_plan(final_plan)
-        print(colored(f"saved application plan to {PROJECT_SYSTEM_FOLDER}/application_plan.xml", "yellow"))
+        if not (resume and ws.pipeline_state.reached("planned")):
+            await save_application_plan(final_plan)
+            ws.pipeline_state.update("planned")
+            print(colored(f"saved application plan to {ws.plan_file}", "yellow"))
         print(colored("Parsing application plan ... ", "yellow"))
         file_structure = parse_file_structure_xml(final_plan)
         print(colored("Creating application files ... ", "yellow"))
-        tasks = []
-        for file_name, file_description in file_structure:
-            task = asyncio.create_task(agent_write_file(file_name, file_description, final_plan))
-            tasks.append(task)
-        await asyncio.gather(*tasks)
+        await generate_files_in_waves(file_structure, final_plan, resume=resume)
+        ws.pipeline_state.update("generated")
 
         print(colored("Application files Created.", "yellow"))
         print(colored("Analizing Application files ... ", "yellow"))
@@ -331,54 +529,155 @@ async def create_plan(coding_phase):
         if PRINT_RESPONSE:
             print("Final application plan:")
             print(final_plan)
-    final_plan = await get_file_contents(f"{PROJECT_SYSTEM_FOLDER}/application_plan.xml")
+    final_plan = await get_file_contents(ws.plan_file)
     return coding_phase, final_plan
 
+async def get_dependency_signatures(dependencies):
+    """
+    Extracts the signatures of already generated python dependencies.
+
+    Args:
+        dependencies (Iterable[str]): File names relative to DEV_FOLDER.
+
+    Returns:
+        str: The outlines of the dependencies that exist and parse, or an empty string.
+    """
+    ws = current_workspace()
+    sections = []
+    for dependency in sorted(dependencies):
+        file_path = f"{ws.dev_folder}/{dependency}"
+        if not dependency.endswith(".py") or not os.path.exists(file_path):
+            continue
+        content = await get_file_contents(file_path)
+        outline = extract_outline(content) if content else None
+        if outline:
+            sections.append(f"# {dependency}\n{outline}")
+    return "\n\n".join(sections)
+
+
+async def generate_files_in_waves(file_structure, final_plan, resume=False):
+    """
+    Generates the plan files in dependency order.
+
+    Files are grouped into topological waves using the import hints in the plan descriptions.
+    Each wave runs with at most GENERATION_PARALLELISM files at once, and every file is given the
+    signatures of the dependencies generated in earlier waves. With PROMPT_CACHING the first request
+    is sent alone, so the shared plan prefix is written to the cache once instead of by every request
+    of the first wave.
+
+    Args:
+        file_structure (List[Tuple[str, str]]): (file name, description) pairs from parse_file_structure_xml.
+        final_plan (str): The application plan xml.
+        resume (bool, optional): Skip the files the checkpoint records as generated and regenerate
+            the others, which may have been cut short by the crash.
+    """
+    ws = current_workspace()
+    descriptions = dict(file_structure)
+    graph = build_dependency_graph(file_structure)
+    waves = topological_waves(graph)
+    print(colored(f"Generating {len(descriptions)} files in {len(waves)} dependency waves", "yellow"))
+    # one snapshot for the whole batch of writes
+    await update_backup_folder()
+    prefix_cached = not PROMPT_CACHING
+    first_request = asyncio.Lock()
+
+    async def write_file(file_name):
+        nonlocal prefix_cached
+        file_path = f"{ws.dev_folder}/{file_name}"
+        if resume:
+            if ws.pipeline_state.is_file_done(file_name, file_path):
+                return
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        dependency_signatures = await get_dependency_signatures(graph[file_name])
+        if not prefix_cached:
+            # the other files wait until one request has gone out and written the cached prefix
+            async with first_request:
+                if not prefix_cached:
+                    requests_before = ws.request_counter
+                    await agent_write_file(file_name, descriptions[file_name], final_plan, dependency_signatures)
+                    prefix_cached = ws.request_counter > requests_before
+                    ws.pipeline_state.file_done(file_name, file_path)
+                    return
+        await agent_write_file(file_name, descriptions[file_name], final_plan, dependency_signatures)
+        ws.pipeline_state.file_done(file_name, file_path)
+
+    await run_waves(waves, write_file, max_parallel=GENERATION_PARALLELISM)
+
+
 # Main function to orchestrate the application creation process
+@traced(args=("coding_phase",))
 async def create_application(coding_phase):
     """
     Creates an application by running it in a loop to catch and fix errors, then entering a feedback loop.
 
     Args:
-        coding_phase (str): The current coding phase.
+        coding_phase (str): The current coding phase, "resume" to continue the checkpointed session.
 
     Returns:
-        None
+        str or None: The last error when the fix attempts were given up, None when the application ran.
     """
-    global max_attempts
+    ws = current_workspace()
     if PRINT_RESPONSE:
         print(colored("Creating application ... ", "yellow"))
+    resume = coding_phase == "resume"
+    if not resume:
+        ws.pipeline_state.start("started" if coding_phase in ("create", "plan") else "generated")
     coding_phase, final_plan = await create_plan(coding_phase)
     if final_plan:
         pass
     attempt = 0
     # Run the application in a loop to catch and fix errors, then enter feedback loop
     attempt_to_fix = 0
+    pending_fix = None # (error, changes) of the last fix, remembered once the error is gone
+    resumed_error = None
+    if resume:
+        attempt, attempt_to_fix = ws.pipeline_state.get("attempt", 0), ws.pipeline_state.get("attempt_to_fix", 0)
+        resumed_error = ws.pipeline_state.get("pending_error")
+        if ws.pipeline_state.stage == "feedback":
+            coding_phase = "feedback"
     while True:
-        if not coding_phase == "feedback":
+        if resumed_error is not None:
+            # the error the interrupted session was handling, no need to run the application again
+            error_message, resumed_error = resumed_error, None
+        elif not coding_phase == "feedback":
             coding_phase = "fix"
             error_message = await run_application()
         else:
             error_message = None
+        if pending_fix is not None:
+            fixed_error, changes = pending_fix
+            if fixed_error.fingerprint not in {error.fingerprint for error in parse_errors(error_message or "")}:
+                fix_memo.record(fixed_error.fingerprint, fixed_error.summary(), changes)
+            pending_fix = None
         if error_message is None:
+            ws.pipeline_state.update("feedback", pending_error=None)
             print(colored("application ran successfully with no error!", "green"))
             print(colored("Please provide your feedback on the application for iterative improvement (or type 'q' to exit): ", "green"))
-            feedback = get_multiline_input()
+            if ws.headless_policy is None:
+                # get the next run ready while the user writes the feedback
+                ws.speculation.start("runner", prepare_application_run())
+            feedback = ws.headless_policy.next_feedback() if ws.headless_policy is not None else await get_multiline_input()
             if feedback.lower() == 'q':
-                break
+                await ws.speculation.discard()
+                ws.pipeline_state.update("done")
+                return None
             print("Updating application based on feedback ... ")
             await get_application_update(feedback)
+            ws.pipeline_state.update("fixing")
             current_line_count = await count_lines_of_code(False)
             if current_line_count:
                 pass
             coding_phase = "fix"
         else:
+            ws.pipeline_state.record_error(error_message, attempt, attempt_to_fix)
             if PRINT_RESPONSE:
                 print(colored(f"Error detected:\n{error_message}", "red"))
                 print(colored("------------------------end of error output------------------------ ", "red"))
 
             if ".wav" in error_message or ".png" in error_message or ".jpg" in error_message or ".mp3" in error_message:
-                input(colored("Missing media file please and it then press Enter if ?__debugger is not in the error will attempt to fix ", "red"))
+                if ws.headless_policy is None:
+                    await ainput(colored("Missing media file please and it then press Enter if ?__debugger is not in the error will attempt to fix ", "red"))
                 if "?__debugger" not in error_message:
                     error_message = "\n".join([line for line in string.split('\n') if '/admin/?__debugger__=yes' not in line])
                     continue
@@ -386,10 +685,14 @@ async def create_application(coding_phase):
                 attempt_to_fix += 1
                 # skip first fix due to install requirements
                 continue
-            if attempt_to_fix > max_attempts:
-                feedback = input(colored("Attempt to fix error? (or type 'q' to exit): ", "green"))
+            if attempt_to_fix > ws.max_attempts:
+                if ws.headless_policy is not None:
+                    ws.pipeline_state.update("done")
+                    return error_message
+                feedback = await ainput(colored("Attempt to fix error? (or type 'q' to exit): ", "green"))
                 if feedback.lower() == 'q':
-                    break
+                    ws.pipeline_state.update("done")
+                    return error_message
             else:
                 attempt_to_fix += 1
 
@@ -399,47 +702,184 @@ async def create_application(coding_phase):
             
             # print(error_message)
             # sys.exit(0)
-            print("exiting ... ", os.getcwd(), THIS_DIRECTORY)
-            await save_file_contents(LOGS_FOLDER + "/error_message_logs.txt", error_message, encoding="utf-8", mode="a")
+            print("exiting ... ", os.getcwd(), ws.root)
+            await save_file_contents(ws.logs_folder + "/error_message_logs.txt", error_message, encoding="utf-8", mode="a")
+            if ws.headless_policy is None:
+                # the local work the fix starts with, done while the user reads the error; nothing paid
+                # is sent before the answer
+                ws.speculation.start("local_selection", select_files_locally(error_message, await load_application_plan()))
+                ws.speculation.start("diagnostics", run_diagnostics(quiet=True))
             user_input = await get_string_from_user("Do you want to try autofixing the error? Y/N: default is y", default_string="y")
             if user_input.lower() == "y":
-                await fix_application_files(error_message)
-                time.sleep(1) # Allow time for files to be written
+                pending_fix = await fix_application_files(error_message)
+                ws.pipeline_state.error_handled(attempt, attempt_to_fix)
+                await asyncio.sleep(WRITE_SETTLE_DELAY) # Allow time for files to be written
                 current_line_count = await count_lines_of_code(False)
                 if current_line_count:
                     pass
-                time.sleep(1)
+                await asyncio.sleep(WRITE_SETTLE_DELAY)
+            else:
+                await ws.speculation.discard()
             
 
+async def build_job(identifier):
+    """
+    Builds the application of a --batch job in the current workspace, whose headless_policy answers
+    every prompt.
+
+    Args:
+        identifier (str): The job id.
+
+    Returns:
+        dict: The result record: status, last error, requests, lines of code and files.
+    """
+    ws = current_workspace()
+    started = time.time()
+    result = {"id": identifier, "description": ws.headless_policy.description}
+    try:
+        # a job stopped by a timeout continues where it was when the batch is run again; failed jobs start over
+        error_message = await create_application("resume" if ws.pipeline_state.resumable() else "create")
+        result["status"] = "success" if error_message is None else "failed"
+        if error_message is not None:
+            result["error"] = error_message[-MAX_ERROR_CHARS:]
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{e}\n{traceback.format_exc()}"[-MAX_ERROR_CHARS:]
+    result["requests"] = ws.request_counter
+    result["prompt_cache"] = ws.prompt_cache_stats.to_dict()
+    result["duration"] = round(time.time() - started, 1)
+    try:
+        result["lines_of_code"] = await count_lines_of_code(True)
+        result["lines_by_language"] = ws.last_line_count.by_language
+        result["files"] = sorted(ws.project_index.get_all())
+    except Exception:
+        pass
+    return result
+
+
+async def run_batch_job(job_file):
+    """
+    Builds one application of a --batch run in a worker process and writes its result record.
+
+    The job file holds the HeadlessPolicy settings, the job id and the share of the api rate limits
+    this worker may use. The worker runs with the job workspace as working directory.
+
+    Args:
+        job_file (str): Path of the job file written by batch_runner.run_job.
+
+    Returns:
+        dict: The result record, also written to RESULT_FILE.
+    """
+    job = read_json(job_file)
+    share = job.get("rate_share", 1.0)
+    limiter = RateLimiter(max(1, int(REQUEST_LIMIT * share)), max(1, int(INPUT_TOKEN_LIMIT * share)), max(1, int(OUTPUT_TOKEN_LIMIT * share)),
+                          max_concurrency=max(1, int(MAX_CONCURRENT_REQUESTS * share)), period=TIME_WINDOW)
+    ws = create_workspace(THIS_DIRECTORY, headless_policy=HeadlessPolicy.from_dict(job), limiter=limiter)
+    with use_workspace(ws):
+        result = await build_job(job.get("id"))
+        await ws.log_sink.close()
+    write_json(RESULT_FILE, result)
+    return result
+
+
+async def run_job_in_process(identifier, policy, workspace, job_timeout=DEFAULT_JOB_TIMEOUT):
+    """
+    Builds one application of a --batch run as a workspace of this process, next to the other jobs
+    of the batch; the in-process counterpart of batch_runner.run_job.
+
+    The job shares the client and the rate_limiter of the process with every other job, so the
+    api budget is used by whichever jobs have requests waiting instead of being split up front.
+    Its output goes to LOG_FILE in the job folder (see route_output).
+
+    Args:
+        identifier (str): The job id.
+        policy (HeadlessPolicy): The answers of the job.
+        workspace (str): The job folder, created if needed.
+        job_timeout (float, optional): Seconds the job may take.
+
+    Returns:
+        dict: The result record of the job, also written to RESULT_FILE in the job folder.
+    """
+    os.makedirs(workspace, exist_ok=True)
+    result_path = os.path.join(workspace, RESULT_FILE)
+    if os.path.exists(result_path):
+        os.remove(result_path)
+    started = time.time()
+    log_path = os.path.join(workspace, LOG_FILE)
+    ws = create_workspace(workspace, headless_policy=policy)
+    with open(log_path, "w", encoding="utf-8", errors="replace") as log, use_workspace(ws):
+        ws.output = log
+        try:
+            result = await asyncio.wait_for(build_job(identifier), timeout=job_timeout)
+        except asyncio.TimeoutError:
+            # cancelling the build stops the processes it started
+            result = {"status": "timeout", "error": f"stopped after {job_timeout} seconds"}
+        finally:
+            await ws.log_sink.close()
+    result.update(id=identifier, workspace=workspace, duration=round(time.time() - started, 1), log=log_path)
+    write_json(result_path, result)
+    return result
+
+
+async def prepare_application_run():
+    """
+    Writes requirements.txt and installs the requirements into the project environment, as the
+    next run_application would, so the run starts right away. Used as background work while a
+    prompt is open; errors are left for run_application to report.
+
+    Returns:
+        str or None: The python executable of the project, None if the preparation failed.
+    """
+    ws = current_workspace()
+    scan = asyncio.ensure_future(asyncio.to_thread(do_requirements, ws.dev_folder, FOLDERS_TO_EXCLUDE))
+    try:
+        await asyncio.shield(scan)
+        return await ws.dependency_environment.ensure()
+    except asyncio.CancelledError:
+        # the scan thread cannot be interrupted; let it finish so it does not race the next run's scan
+        await asyncio.gather(scan, return_exceptions=True)
+        raise
+    except Exception:
+        return None
+
+
 # Function to run the application and capture errors
 
+@traced()
 async def run_application():
-    global requirements_installed
+    ws = current_workspace()
     print(colored("Running the application ...", "yellow"))
     full_output = ""
     full_error = ""
     user_terminated_flag = False
 
     output, error, full_out_array = [], [], []
+    # let a preparation started during the last prompt finish first, it makes the steps below no-ops
+    await ws.speculation.commit("runner")
     try:
-        do_requirements(f"./{DEV_FOLDER}", FOLDERS_TO_EXCLUDE)
-        if not requirements_installed:
-            print(colored("Installing requirements ...", "yellow"))
-            subprocess.run([sys.executable, "-m", "pip", "install", "-r", f"./{DEV_FOLDER}/requirements.txt"], timeout=60, check=True)
-            print(colored("Requirements installed.", "yellow"))
-            requirements_installed = True
+        # in a thread, the other workspaces of the process keep running meanwhile
+        await asyncio.to_thread(do_requirements, ws.dev_folder, FOLDERS_TO_EXCLUDE)
+        # skips pip entirely when the requirements fingerprint is unchanged
+        python_executable = await ws.dependency_environment.ensure()
 
     except Exception as e:
         print(colored(f"Error installing requirements: {e}", "red"))
         return f"Error installing requirements: {e}"
 
     try:
-        cmd = [sys.executable, "main.py"]
-        cwd = os.path.join(THIS_DIRECTORY, DEV_FOLDER)
+        cmd = [python_executable, "main.py"]
+        cwd = ws.dev_folder
         
         # cmd = [sys.executable, "-m", "pip", "install", "-r", f"./{DEV_FOLDER}/requirements.txt"]
         # cwd = os.path.join(os.getcwd(), "devfolder")
-        _, full_error, full_output = await runner_cmd(cmd, cwd)
+        if ws.headless_policy is not None:
+            # nobody can close the application, so one that is still running after run_timeout works
+            result = await runner_cmd(cmd, cwd, timeout=ws.headless_policy.run_timeout, stdin=asyncio.subprocess.DEVNULL, handle_signals=False)
+        else:
+            result = await runner_cmd(cmd, cwd)
+        full_error = result.stderr
+        if result.stop_reason == "idle timeout" or (result.stop_reason == "timeout" and ws.headless_policy is None):
+            full_error += f"\nThe application was stopped after a {result.stop_reason}"
 
     except Exception as e:
         print("subprocess try Exception")
@@ -466,14 +906,14 @@ async def run_application():
         # print(colored("Application completed with errors", "white"))
 
     if error_summary:
-        error_summary = error_summary.replace(THIS_DIRECTORY + "/", "")
-        error_summary = error_summary.replace(THIS_DIRECTORY + "\\", "")
+        error_summary = error_summary.replace(ws.root + "/", "")
+        error_summary = error_summary.replace(ws.root + "\\", "")
         error_summary = error_summary.replace("\\", "/")
         error_summary = error_summary.replace(sys.exec_prefix.replace("\\", "/"), "venv")
         libs = get_python_library_directory()
         if libs is not None:
             error_summary = error_summary.replace(libs.replace("\\", "/"), "venv/lib")
-        error_summary = error_summary.replace(f"{DEV_FOLDER}/", "")
+        error_summary = error_summary.replace(f"{ws.dev_folder_name}/", "")
         print(colored("Application completed with errors", "white"))
         return error_summary
     else:
@@ -503,6 +943,7 @@ def get_python_library_directory():
     return None  # Return None if no typical lib directory is found
 
 # Function to fix errors in the application files
+@traced()
 async def fix_application_files(error_message):
     """
     Asynchronously fixes errors in the application files.
@@ -511,9 +952,11 @@ async def fix_application_files(error_message):
         error_message (str): The error message to fix.
 
     Returns:
-        None
+        tuple: (ParsedError, {filename: (old content, new content)}) of the primary error and the files
+        changed to fix it, to be recorded in the fix memo once the error is gone; None otherwise.
 
-    This function attempts to fix errors in the application files by analyzing the error message and the contents of the application files. It provides corrected versions of the files to resolve the error. The corrected file contents are returned in the following format:
+    If the fix memo holds a patch for the fingerprint of the error that still applies exactly, it is
+    replayed without calling the model, once per build. This function attempts to fix errors in the application files by analyzing the error message and the contents of the application files. It provides corrected versions of the files to resolve the error. The corrected file contents are returned in the following format:
 
     <file name="path/to/filename.ext">
     corrected_file_contents
@@ -524,23 +967,38 @@ async def fix_application_files(error_message):
     Note: This function assumes that the necessary imports and variables are defined in the codebase.
 
     """
+    ws = current_workspace()
     print(colored("Attempting to fix the error ... ", "yellow"))
 
-    # Extract all filenames from the error message
-    pattern = r'\b([^/\\:*?"<>|\r\n]+(?:' + '|'.join(re.escape(ext) for ext in FILE_EXTENSIONS) + r'))\b'
-    error_filenames = re.findall(pattern, error_message)
-    error_filenames = list(set(error_filenames)) # Remove duplicates
-
-    # Remove agent_application_maker.py from the list if present
-    error_filenames = [f for f in error_filenames if f != 'agent_application_maker.py']
+    errors = parse_errors(error_message)
+    primary_error = errors[0] if errors else None
+    # project files in the traceback frames, innermost last
+    error_filenames = list(dict.fromkeys(normalize_path(frame.file) for error in errors for frame in error.project_frames))
+    files_before = await asyncio.to_thread(ws.project_index.get_all)
+    previous_fix = fix_memo.get(primary_error.fingerprint) if primary_error else None
+    # a patch is replayed once per build; if the error comes back the model gets it as a hint instead
+    if previous_fix is not None and primary_error.fingerprint not in ws.replayed_fixes:
+        replayed_files = fix_memo.replay(primary_error.fingerprint, files_before)
+        if replayed_files is not None:
+            ws.replayed_fixes.add(primary_error.fingerprint)
+            print(colored(f"Replaying the remembered fix for:\n{primary_error.summary()}", "cyan"))
+            await ws.speculation.discard("local_selection", "diagnostics")
+            await update_backup_folder()
+            for filename, content in replayed_files.items():
+                await save_file_contents(os.path.join(ws.dev_folder, filename), content)
+                print(f"Updated file: {filename}")
+            return primary_error, {filename: (files_before.get(filename, ""), content) for filename, content in replayed_files.items()}
     application_plan = await load_application_plan()
+    # the diagnostics run in the background while the user answers the prompts below
+    if ws.headless_policy is None:
+        ws.speculation.start("diagnostics", run_diagnostics(quiet=True))
     # file_contents, application_files = await get_project_files_contents()
-    relevant_files = await select_relevant_files(error_message, application_plan)
+    local_selection = await ws.speculation.commit("local_selection", lambda: select_files_locally(error_message, application_plan))
+    relevant_files = await select_relevant_files(error_message, application_plan, local_selection)
     print(colored(f"Model selected files: {relevant_files}\ndo you want to change the file selection y/n enter for no?", "yellow"))
     inputs = await get_string_from_user("Input: ", default_string="n")
     if inputs.lower() == "y":
-        relevant_files = select_files_manually(location=DEV_FOLDER, our_selected_files=relevant_files)
-    file_contents, application_files = await get_project_files_contents(selected_files=relevant_files)
+        relevant_files = select_files_manually(location=ws.dev_folder, our_selected_files=relevant_files)
     comment = ""
     if error_filenames:
         print(colored(f"Error occurred in files: {', '.join(error_filenames)}", "red"))
@@ -548,12 +1006,10 @@ async def fix_application_files(error_message):
         print(colored("""Could not determine specific files causing the error
 Please provide a comment about the error (press Ctrl+Z enter to finish): """, "green"))
     print(colored("do you have any comments Press Ctrl+Z enter to finish", "green"))
-    user_response = get_multiline_input()
+    user_response = await get_multiline_input()
     if user_response.strip() != "":
         comment = "\n\nUser comment: " + user_response
 
-    print(f"Sending these files for error correction in 3 seconds. Files: {','.join(application_files.keys())}")
-    time.sleep(3)
     system_message = """You are a Python Full Stack Web and application development expert. Your task is to fix errors in python application project files.
 Analyze the error message and the contents of the application files, then provide the corrected versions of the files.
 Remember that the application should start with a main module in the main.py file(main shouldn't take any arguments). The file app/main.py must have def main(no arguments) and should have a comment IMPORTANT: do not remove main function as automated test will fail IMPORTANT: do not remove this comment
@@ -561,15 +1017,21 @@ carefully reason about the error in a step by step manner ahead of providing the
 <reasoning>
 reasoning about the error
 </reasoning>
-Return the corrected file contents in the following format only for the files that requires correction:
+"""
+    if EDIT_MODE == "diff":
+        system_message += EDIT_FORMAT_INSTRUCTIONS
+        output_request = "return only the edits needed"
+    else:
+        system_message += """Return the corrected file contents in the following format only for the files that requires correction:
 <file name="path/to/filename.ext">
 corrected_file_contents
 </file>
 """
-    diagnostics_report = await run_unittests()
+        output_request = "return the full content of the files"
+    diagnostics_report = await confirm_diagnostics(await ws.speculation.commit("diagnostics", run_diagnostics))
 
     if diagnostics_report is not None:
-        diagnostics_report = diagnostics_report.replace(os.getcwd() + "/", "")
+        diagnostics_report = diagnostics_report.replace(ws.root + "/", "")
         diagnostics_report = f"""
 
 Here is the output of diagnostics_report.py unittest:
@@ -580,26 +1042,54 @@ Here is the output of diagnostics_report.py unittest:
     else:
         diagnostics_report = ""
 
+    # the whole error is sent once, the reminder only repeats its tail
+    error_reminder = "\n".join(error_message.strip().splitlines()[-ERROR_REMINDER_LINES:])
+    error_details = error_message
+    if errors and len(error_message.splitlines()) > MAX_ERROR_LINES:
+        # repeated errors are collapsed into one summary each
+        error_details = "\n\n".join(error.summary() for error in errors) + f"\n\nEnd of the output:\n{error_reminder}"
+    if previous_fix is not None:
+        patches = "\n".join(previous_fix["patches"].values())
+        comment += f"\n\nThis error was fixed before in a similar project with the following patch, adapt it to the current files:\n{patches}"
+    budget = CONTEXT_TOKEN_BUDGET - estimate_tokens(error_details + error_reminder + diagnostics_report + comment)
+    file_contents, packed_files = await pack_project_context(f"{error_message}\n{diagnostics_report}", pinned=relevant_files + error_filenames, budget_tokens=budget)
+    print(f"Sending these files for error correction in {FIX_SEND_DELAY} seconds. Files: {','.join(packed_files)}")
+    await asyncio.sleep(FIX_SEND_DELAY)
+
     prompt = f"""An error occurred while running the python application project. Here's the error message:
 
-{error_message}
+{error_details}
 
-Here are the contents of the files involved in the error:{file_contents}
+Here are the contents of the files involved in the error:
+
+{file_contents}
 {diagnostics_report}
 Here a reminder of the error:
 
-{error_message}{comment}
+{error_reminder}{comment}
 
-Please analyze the error and provide corrected versions of the files to resolve the error. return the full content of the files Remember that the application should start with a main module in the main.py file(main shouldn't take any arguments)."""
-    await save_file_contents(file_name=f"{LOGS_FOLDER}/last_fix_application_files.txt", content=prompt)
+Please analyze the error and provide corrected versions of the files to resolve the error. {output_request} Remember that the application should start with a main module in the main.py file(main shouldn't take any arguments)."""
+    await save_file_contents(file_name=f"{ws.logs_folder}/last_fix_application_files.txt", content=prompt)
 
+    stream_handler = None
+    if STREAM_RESPONSES:
+        # corrected files are written while the response streams, so back up first
+        await update_backup_folder()
+        stream_handler = StreamingFileWriter(lambda name: os.path.join(ws.dev_folder, name), open_tag=FILE_TAG, close_tag="</file>",
+                                             on_complete=on_streamed_file, on_restore=record_project_write)
     # Send the prompt to the model
-    response = await rate_limited_request(
-        model="claude-3-5-sonnet-20240620",
-        system=system_message,
-        max_tokens=4000,
-        messages=[{"role": "user", "content": prompt}],
-    )
+    try:
+        response = await rate_limited_request(
+            model="claude-3-5-sonnet-20240620",
+            system=build_system(await project_context(application_plan), system_message, enabled=PROMPT_CACHING),
+            max_tokens=4000,
+            messages=[{"role": "user", "content": prompt}],
+            stream_handler=stream_handler,
+        )
+    finally:
+        if stream_handler is not None:
+            # a response cut off inside a <file> block leaves its .partial file open
+            stream_handler.abort()
     if PRINT_RESPONSE:
         print(colored(system_message, "magenta"))
         print(colored(prompt, "magenta"))
@@ -611,21 +1101,26 @@ Please analyze the error and provide corrected versions of the files to resolve
     # Extract corrected file contents from the response
     if response and hasattr(response, "content") and response.content[0] and hasattr(response.content[0], "text"):
         corrected_files = re.findall(r'<file name="(.*?)">(.*?)</file>', response.content[0].text, re.DOTALL)  # type: ignore
+        if EDIT_MODE == "diff":
+            corrected_files = list(corrected_files) + await apply_edit_blocks(response.content[0].text, f"Fix this error:\n\n{error_reminder}{comment}")  # type: ignore
     if corrected_files:
-        # remove old backup folder then duplicate app folder to backup
-        await update_backup_folder()
+        streamed_files = stream_handler.completed if stream_handler is not None else {}
+        if not streamed_files:
+            # remove old backup folder then duplicate app folder to backup
+            await update_backup_folder()
         for filename, content in corrected_files:
-            file_path = os.path.join(f"{DEV_FOLDER}", filename)
-            dir_name = os.path.dirname(file_path)
-            os.makedirs(dir_name, exist_ok=True)
-            # Write the file
-            await save_file_contents(file_path, content)
+            file_path = os.path.join(ws.dev_folder, filename)
+            if streamed_files.get(file_path) != content:
+                dir_name = os.path.dirname(file_path)
+                os.makedirs(dir_name, exist_ok=True)
+                # Write the file
+                await save_file_contents(file_path, content)
             print(f"Updated file: {file_path}")
             # Retry mechanism for reading the file back
             max_retries = 5
             for attempt in range(max_retries):
                 try:
-                    await asyncio.sleep(0.5)  # Short delay before reading
+                    await asyncio.sleep(READ_BACK_DELAY)  # Short delay before reading
                     
                     written_content = await get_file_contents(file_path)
                     if written_content.strip() == content.strip(): # type: ignore
@@ -641,9 +1136,16 @@ Please analyze the error and provide corrected versions of the files to resolve
         for module_name in list(sys.modules.keys()):
             if module_name.startswith(f"{DEV_FOLDER}/."):
                 del sys.modules[module_name]
-        await asyncio.sleep(1)  # Add a small delay to ensure files are fully written
+        await asyncio.sleep(WRITE_SETTLE_DELAY)  # Add a small delay to ensure files are fully written
+        if primary_error is not None:
+            changes = {}
+            for filename, content in corrected_files:
+                filename = os.path.normpath(filename).replace("\\", "/")
+                changes[filename] = (files_before.get(filename, ""), content)
+            return primary_error, changes
     else:
         print("No corrected file content found in the response.")
+    return None
 
 
 async def create_unittests():
@@ -653,20 +1155,21 @@ async def create_unittests():
     It handles the retrieval and update of file contents, including diagnostic_report.py.
     The generated unit tests are saved in the specified file format.
     """
-    global unittest_exists, dont_send_diagnostic_file
-    unittest_exists = True
-    file_contents, application_files = await get_project_files_contents()
+    ws = current_workspace()
+    ws.unittest_exists = True
     application_plan = await load_application_plan()
     updated_file_contents = None
-    if os.path.exists(f"{DEV_FOLDER}/diagnostic_report.py"):
-        diagnostic_report = await get_file_contents(f"{DEV_FOLDER}/diagnostic_report.py")
+    if os.path.exists(f"{ws.dev_folder}/diagnostic_report.py"):
+        diagnostic_report = await get_file_contents(f"{ws.dev_folder}/diagnostic_report.py")
         updated_file_contents = f"\n# diagnostic_report.py\n\n{diagnostic_report}\n\n"
     if not updated_file_contents:
         updated_file_contents = ""
+    # large projects no longer give up on unit tests, the files that do not fit are reduced to signatures
+    budget = CONTEXT_TOKEN_BUDGET - estimate_tokens(updated_file_contents)
+    file_contents, _ = await pack_project_context(application_plan, budget_tokens=budget, relevant_only=False)
     print(colored("Creating unit tests ... ", "yellow"))
     system_message = """You are a full stack expert developer:"""
     prompt = f"""Please create unit tests for the following Python code:\n\n{file_contents}
-# application_plan.xml\n\n{application_plan}
 {updated_file_contents}
 Based on the application_plan.xml please generate a debugging diagnostic write a full unittest script to test all classes and functions and produce a report of any unexpected ensure that all, be sure to order put the tests in a logical order be carefully to include required dependence for each test, Use try except and traceback to output the errors. Important make sure to output details and reason for test before each test and the filename the test is for between tests. make sure that the the script uses def main() with no arguments. Only print output details for tests that fail or errors. This file will be saved as diagnostic_report.py Ensure to handle NameError: name 'diagnostic_report' is not defined in the unittest as it fails and cause Runtime error Traceback.
 
@@ -675,36 +1178,68 @@ Return the updated file contents in the following format only for the files that
 updated_file_contents
 </file>
 """
-    await save_file_contents(f"{LOGS_FOLDER}/diagnostic_report_initial_project_file_system_prompt.txt", system_message, mode="w")
-    if len(prompt) < 4000:
-        # Send the prompt to the model
-        response = await rate_limited_request(
-            model="claude-3-5-sonnet-20240620",
-            system=system_message,
-            max_tokens=4000,
-            messages=[{"role": "user", "content": prompt}],
-        )
-        corrected_files = False
-        # Extract corrected file contents from the response
-        if response and hasattr(response, "content") and response.content[0] and hasattr(response.content[0], "text"):
-            corrected_files = re.findall(r'<file name="(.*?)">(.*?)</file>', response.content[0].text, re.DOTALL)  # type: ignore
-        if dont_send_diagnostic_file:
-            pass
-            corrected_files = list(filter(lambda x: x[0] != 'diagnostic_report.py', corrected_files)) # type: ignore
-            corrected_files = list(filter(lambda x: x[0] != 'README.md', corrected_files))
-        if corrected_files:
-            for filename, content in corrected_files:
-                file_path = os.path.join(f"{DEV_FOLDER}", filename)
-                dir_name = os.path.dirname(file_path)
-                os.makedirs(dir_name, exist_ok=True)
-                await save_file_contents(file_path, content)
-                print(f"Updated file: {file_path}")
-    else:
-        await save_file_contents(f"{DEV_FOLDER}/diagnostic_report.py", "print('unable to generate unit tests due to source code size.')")
+    await save_file_contents(f"{ws.logs_folder}/diagnostic_report_initial_project_file_system_prompt.txt", system_message, mode="w")
+    # Send the prompt to the model
+    response = await rate_limited_request(
+        model="claude-3-5-sonnet-20240620",
+        system=build_system(await project_context(application_plan), system_message, enabled=PROMPT_CACHING),
+        max_tokens=4000,
+        messages=[{"role": "user", "content": prompt}],
+    )
+    corrected_files = False
+    # Extract corrected file contents from the response
+    if response and hasattr(response, "content") and response.content[0] and hasattr(response.content[0], "text"):
+        corrected_files = re.findall(r'<file name="(.*?)">(.*?)</file>', response.content[0].text, re.DOTALL)  # type: ignore
+    if dont_send_diagnostic_file:
+        pass
+        corrected_files = list(filter(lambda x: x[0] != 'diagnostic_report.py', corrected_files)) # type: ignore
+        corrected_files = list(filter(lambda x: x[0] != 'README.md', corrected_files))
+    if corrected_files:
+        for filename, content in corrected_files:
+            file_path = os.path.join(ws.dev_folder, filename)
+            dir_name = os.path.dirname(file_path)
+            os.makedirs(dir_name, exist_ok=True)
+            await save_file_contents(file_path, content)
+            print(f"Updated file: {file_path}")
 
 
 # run the unittests
+@traced()
 async def run_unittests():
+    """
+    Runs the diagnostics and asks whether their errors should be sent for fixing.
+
+    Returns:
+        str or None: The error summary, None when there are no errors or the user skips them.
+    """
+    return await confirm_diagnostics(await run_diagnostics())
+
+
+async def confirm_diagnostics(error_summary):
+    """
+    Shows the errors found by run_diagnostics and asks whether they should be sent for fixing.
+
+    Args:
+        error_summary (str or None): The result of run_diagnostics.
+
+    Returns:
+        str or None: The error summary, None when there are no errors or the user skips them.
+    """
+    ws = current_workspace()
+    if not error_summary:
+        return None
+    print(colored(error_summary, "red"))
+    if ws.headless_policy is None:
+        print(colored("break now to cancel ", "yellow"))
+        await asyncio.sleep(5)
+    user_response = await get_string_from_user(message="Press enter to submit error summary or N to skip", default_string="y")
+    if user_response.lower() == "y":
+        return error_summary
+    return None
+
+
+@traced()
+async def run_diagnostics(quiet=False):
     """
     Asynchronously runs unit tests.
 
@@ -724,25 +1259,27 @@ async def run_unittests():
     If the `unittest_exists` flag is still False, the function calls the `create_unittests`
     function.
 
-    The function then starts a subprocess to run the `diagnostic_report.py` file. It reads the
-    output and error streams of the subprocess asynchronously.
+    The function then runs the `diagnostic_report.py` file with runner_cmd, printing its output
+    as it arrives and skipping specific lines based on their content. Ctrl+C stops the tests, and
+    they are stopped after UNITTEST_TIMEOUT seconds or UNITTEST_IDLE_TIMEOUT seconds without output.
 
-    The function defines two helper functions:
-    - `read_stream(stream, is_error=False)`: This function reads lines from a given stream
-      asynchronously. It skips specific lines based on their content and prints the lines
-      with appropriate formatting.
-    - `user_input()`: This function handles user input while the subprocess is running.
-      It reads user input from the standard input and terminates the subprocess if the input
-      is 'q'.
+    Meanwhile the project's own test modules (test_*.py, *_test.py) run sharded across TEST_WORKERS
+    worker processes, each test limited to TEST_TIMEOUT seconds. Only modules whose import closure
+    changed since they last passed are run, unless RUN_ALL_TESTS is set (see impact_analysis); the
+    same applies to `diagnostic_report.py`, which is skipped when it passed on unchanged imports.
+    Their JUnit report is written to junit.xml in the logs folder and a summary of the failing tests is
+    added to the errors.
 
-    The function awaits the completion of the subprocess. If the return code is not 0, it
-    appends the return code to the `full_error` variable.
+    If the return code is not 0, it appends the return code to the `full_error` variable.
 
     The function returns the `full_error` variable if there are any errors. Otherwise, it
     returns None.
 
+    With `quiet` the tests run in the background while a prompt is open: their output is not
+    printed, they get no stdin and Ctrl+C is left to the prompt.
+
     Args:
-        None
+        quiet (bool, optional): Run without output, stdin or signal handling. Defaults to False.
 
     Returns:
         str or None: The `full_error` variable if there are any errors. Otherwise, None.
@@ -751,166 +1288,125 @@ async def run_unittests():
         None
 
     """
-    global unittest_exists
+    ws = current_workspace()
     user_terminated = False
     print(colored("Running unit tests ... ", "yellow"))
     # clear os file stats cache
     try:
-        content = await get_file_contents(f"{DEV_FOLDER}/diagnostic_report.py")
+        content = await get_file_contents(f"{ws.dev_folder}/diagnostic_report.py")
         if not content:
             pass
         else:
             # if file age older than 500 seconds pass
-            date_of_diagnostic_file = time.time() - os.path.getmtime(f"{DEV_FOLDER}/diagnostic_report.py")
+            date_of_diagnostic_file = time.time() - os.path.getmtime(f"{ws.dev_folder}/diagnostic_report.py")
             print(f"File age: {date_of_diagnostic_file}")
-            if time.time() - os.stat(f"{DEV_FOLDER}/diagnostic_report.py").st_mtime > 500:
-                unittest_exists = False
+            if time.time() - os.stat(f"{ws.dev_folder}/diagnostic_report.py").st_mtime > 500:
+                ws.unittest_exists = False
             else:
-                unittest_exists = True
+                ws.unittest_exists = True
 
     except FileNotFoundError:
-        print(f"File not found: {DEV_FOLDER}/diagnostic_report.py")
-        unittest_exists = False
+        print(f"File not found: {ws.dev_folder}/diagnostic_report.py")
+        ws.unittest_exists = False
     except Exception as e:
-        print(f"Error reading {DEV_FOLDER}/diagnostic_report.py: {str(e)}")
-        unittest_exists = False
+        print(f"Error reading {ws.dev_folder}/diagnostic_report.py: {str(e)}")
+        ws.unittest_exists = False
 
-    if not unittest_exists:
+    if not ws.unittest_exists:
         await create_unittests()
     try:
         # subprocess force file system update with stat
-        await aiofiles.os.stat(f"{DEV_FOLDER}/diagnostic_report.py")
+        await aiofiles.os.stat(f"{ws.dev_folder}/diagnostic_report.py")
     except FileNotFoundError:
-        print(f"File not found: {DEV_FOLDER}/diagnostic_report.py")
-        unittest_exists = False
+        print(f"File not found: {ws.dev_folder}/diagnostic_report.py")
+        ws.unittest_exists = False
     except Exception as e:
-        print(f"Error reading {DEV_FOLDER}/diagnostic_report.py: {str(e)}")
-        unittest_exists = False
-    if not unittest_exists:
+        print(f"Error reading {ws.dev_folder}/diagnostic_report.py: {str(e)}")
+        ws.unittest_exists = False
+    if not ws.unittest_exists:
         await create_unittests()
-        time.sleep(0.5)
+        await asyncio.sleep(0.5)
     full_error = ""
     full_output = ""
     user_terminated_flag = False
-    try:
-        # change directory to app if current folder is not app
-        print(sys.executable, "diagnostic_report.py")
-        process = subprocess.Popen(
-            [sys.executable, "diagnostic_report.py"],
-            cwd=os.path.join(THIS_DIRECTORY, DEV_FOLDER),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
+    # Skip specific lines based on content
+    skip_lines = [
+        "---------------------------------------------------------------------",
+        "* Running on ",
+        "ent server. Do not use it in a product",
+        "ion deployment. Use a production WSGI server instead.",
+        "INFO:werkzeug: * Restarting with stat",
+        "INFO:werkzeug: * Debugger PIN",
+        "DEBUG:app:Application starting in DEBUG"
+    ]
+
+    def is_skipped(line):
+        return any(line.startswith(s) or s in line for s in skip_lines)
+
+    def print_line(name, line):
+        if is_skipped(line) or not PRINT_RESPONSE or quiet:
+            return
+        if name == "stderr":
+            print("-------------- line below is an error -------------------")
+            print(colored(f"Runtime error: {line.strip()}", "red"))
+            print("-------------- line above is an error -------------------")
+        else:
+            print("-------------- line below is output -------------------")
+            print(line.strip())
+            print("-------------- line above is output -------------------")
+
+    suite_task = None
+    project_folder = ws.dev_folder
+    application_files = await asyncio.to_thread(ws.project_index.get_all)
+    changed_files = set(ws.changed_files)
+    ws.changed_files.clear()
+    selected, skipped, test_hashes = await asyncio.to_thread(ws.impact_selector.select, application_files, changed_files, RUN_ALL_TESTS)
+    diagnostic_selected, _, diagnostic_hashes = await asyncio.to_thread(
+        ws.impact_selector.select, application_files, changed_files, RUN_ALL_TESTS, ["diagnostic_report.py"])
+    if skipped:
+        print(colored(f"Skipping {len(skipped)} test modules that passed with unchanged dependencies", "yellow"))
+    for module, reason in selected.items():
+        print(f"Test module {module}: {reason}")
+    if selected:
+        print(colored(f"Running {len(selected)} test modules on {TEST_WORKERS} workers ... ", "yellow"))
+        suite_task = asyncio.create_task(run_test_suite(
+            project_folder,
+            ws.dependency_environment.python,
+            modules=list(selected),
+            max_workers=TEST_WORKERS,
+            test_timeout=TEST_TIMEOUT,
+            exclude_dirs=FOLDERS_TO_EXCLUDE,
+            junit_path=f"{ws.logs_folder}/junit.xml",
+        ))
+    if diagnostic_selected:
+        print(f"diagnostic_report.py: {diagnostic_selected['diagnostic_report.py']}")
+        try:
+            # change directory to app if current folder is not app
+            print(ws.dependency_environment.python, "diagnostic_report.py")
+            result = await runner_cmd(
+                [ws.dependency_environment.python, "diagnostic_report.py"],
+                ws.dev_folder,
+                timeout=UNITTEST_TIMEOUT,
+                idle_timeout=UNITTEST_IDLE_TIMEOUT,
+                on_line=print_line,
+                stdin=asyncio.subprocess.DEVNULL if ws.headless_policy is not None or quiet else None,
+                # concurrent workspaces would replace each other's signal handlers
+                handle_signals=ws.headless_policy is None and not quiet,
+            )
+            user_terminated_flag = result.stop_reason in ("stopped", "signal")
+            full_output = "".join(line for line in result.stdout.splitlines(True) if not is_skipped(line))
+            full_error = "".join(line for line in result.stderr.splitlines(True) if not is_skipped(line))
+            print(colored("diagnostic_report.py stopped.", "yellow"))
+            if result.stop_reason in ("timeout", "idle timeout"):
+                full_error += f"\ndiagnostic_report.py was stopped after a {result.stop_reason}"
+            elif result.returncode != 0:
+                full_error += f"\nProcess exited with return code {result.returncode}"
+        except Exception as e:
+            if not user_terminated_flag:
+                full_error += f"\nError running diagnostic_report.py : {str(e)}\n{traceback.format_exc()}"
+    else:
+        print(colored("Skipping diagnostic_report.py, it passed with unchanged dependencies", "yellow"))
 
-        async def read_stream(stream, is_error=False, subprocess=None):
-            """
-            Asynchronously reads lines from a given stream. Skips specific lines based on content.
-            Handles error and output lines differently. Appends lines to respective variables.
-
-            Args:
-                stream (TextIO): The stream to read from.
-                is_error (bool, optional): Indicates whether the lines are errors or not. Defaults to False.
-
-            Returns:
-                None
-            """
-            nonlocal user_terminated_flag
-            while not user_terminated_flag and (line := await asyncio.to_thread(stream.readline)):
-
-                
-                
-                # Skip specific lines based on content
-                skip_lines = [
-                    "---------------------------------------------------------------------",
-                    "* Running on ",
-                    "ent server. Do not use it in a product",
-                    "ion deployment. Use a production WSGI server instead.",
-                    "INFO:werkzeug: * Restarting with stat",
-                    "INFO:werkzeug: * Debugger PIN",
-                    "DEBUG:app:Application starting in DEBUG"
-                ]
-                if any(line.startswith(s) or s in line for s in skip_lines):
-                    continue
-                
-                if is_error:
-                    if PRINT_RESPONSE:
-                        print("-------------- line below is an error -------------------")
-                        # print(colored(f"Runtime error: {line}", "red"))
-                        print(colored(f"Runtime error: {line.strip()}", "red"))
-                        print("-------------- line above is an error -------------------")
-                    nonlocal full_error
-                    full_error += line
-                else:
-                    if PRINT_RESPONSE:
-                        print("-------------- line below is output -------------------")
-                        print(line.strip())
-                        print("-------------- line above is output -------------------")
-                    nonlocal full_output
-                    full_output += line
-
-                if user_terminated_flag:
-                    print(colored("read_stream Application stopped by user.", "yellow"))
-                    break
-                if subprocess is not None and subprocess.poll() is not None:
-                    print(colored("Application stopped ending monitor output.", "yellow"))
-                    break
-
-        async def user_input(process):
-            """
-            A function that handles key presses.
-                
-            Parameters:
-                key: The key object representing the pressed key.
-        
-            Returns:
-                False if the key press indicates the user wants to stop the application, otherwise None.
-            """
-            
-            def key_press(key):
-                """
-                A function that handles key presses.
-                
-                Parameters:
-                    key: The key object representing the pressed key.
-
-                Returns:
-                    False if the key press indicates the user wants to stop the application, otherwise None.
-                """
-                # print(key)
-                if (hasattr(key, 'char') and key.char == 'q') or key == Key.esc:
-                    while process.poll() is None:
-                        print("terminated")
-                        process.kill()
-                    
-                    nonlocal user_terminated_flag
-                    user_terminated_flag = True
-                    print(colored("key_press Application stopped by user.", "yellow"))
-                    return None  # Stop the listener
-                
-            listener = Listener(on_press=key_press)
-            listener.start()
-            nonlocal user_terminated_flag
-            while not user_terminated_flag and process.poll() is None:
-                await asyncio.sleep(0.1)
-            listener.stop()
-            
-        # Concurrently read output streams and listen for user input
-        await asyncio.gather(
-            read_stream(process.stdout, is_error=False, subprocess=process),
-            read_stream(process.stderr, is_error=True, subprocess=process),
-            user_input(process)
-        )
-        print(colored("diagnostic_report.py stopped.", "yellow"))
-        return_code = process.wait()
-        if return_code != 0:
-            full_error += f"\nProcess exited with return code {return_code}"
-    except KeyboardInterrupt:
-        full_error += f"\nError running diagnostic_report.py user interrupted: {str(e)}\n{traceback.format_exc()}"
-    except Exception as e:
-        if not user_terminated_flag:
-            full_error += f"\nError running diagnostic_report.py : {str(e)}\n{traceback.format_exc()}"
-            
     # print(colored(full_output, "yellow"))
     # print("--------------------------------------------------------------------")
     # print(colored(full_error, "yellow"))
@@ -920,42 +1416,53 @@ async def run_unittests():
         if full_error or "error" in full_output.lower() or "exception" in full_output.lower():
             error_summary = f"Runtime errors:\n{full_error}\nPossible errors in output: \n{full_output}\n"
             print(colored("Application completed with errors", "white"))
+        if diagnostic_selected:
+            await asyncio.to_thread(ws.impact_selector.record_outcomes, {"diagnostic_report.py": not error_summary}, diagnostic_hashes)
+    if suite_task is not None:
+        if user_terminated_flag:
+            suite_task.cancel()
+        else:
+            try:
+                suite = await suite_task
+                await asyncio.to_thread(ws.impact_selector.record, suite, test_hashes)
+                print(colored(suite.summary().splitlines()[0], "green" if suite.passed else "red"))
+                if not suite.passed:
+                    error_summary += f"Failing project tests:\n{suite.summary()}\n"
+            except Exception as e:
+                error_summary += f"Error running the project tests: {str(e)}\n"
         
     # print(error_summary)
     if error_summary:
         print(colored("Application completed with errors", "white"))
-        error_summary = error_summary.replace(THIS_DIRECTORY + "/", "")
-        error_summary = error_summary.replace(THIS_DIRECTORY + "\\", "")
+        error_summary = error_summary.replace(ws.root + "/", "")
+        error_summary = error_summary.replace(ws.root + "\\", "")
         error_summary = error_summary.replace("\\", "/")
         error_summary = error_summary.replace(sys.exec_prefix.replace("\\", "/"), "venv")
         libs = get_python_library_directory()
         if libs is not None:
             error_summary = error_summary.replace(libs.replace("\\", "/"), "venv/lib")
-        error_summary = error_summary.replace(f"{DEV_FOLDER}/", "")
+        error_summary = error_summary.replace(f"{ws.dev_folder_name}/", "")
         print(colored("Diagnostic completed with errors", "white"))
-        print(colored(error_summary, "red"))
-        print(colored("break now to cancel ", "yellow"))
-        time.sleep(5)
-        user_response = get_string_from_user(message="Press enter to submit error summary or N to skip", default_string="y")
-        if user_response.lower() == "y":
-            return error_summary
-        else:
-            return None
+        return error_summary
     else:
         print(colored("Unittest completed", "green"))
     return None
 
 # Function to get multiline input
-def get_multiline_input():
+async def get_multiline_input():
     """
     A function that prompts the user to enter multiline input and returns it as a single string.
     No parameters are taken, and the function returns a string.
+    Unattended runs (headless_policy) get an empty string.
     """
+    ws = current_workspace()
+    if ws.headless_policy is not None:
+        return ""
     print("Enter your multiline input. Press Ctrl+D (Unix) or Ctrl+Z (Windows) followed by Enter to finish:")
     lines = []
     try:
         while True:
-            line = input()
+            line = await ainput()
             lines.append(line)
     except EOFError:
         pass
@@ -967,7 +1474,8 @@ def get_multiline_input():
 # New function to update application_plan.xml
 
 async def update_application_plan(updated_xml):
-    file_path = f"{PROJECT_SYSTEM_FOLDER}/application_plan.xml"
+    ws = current_workspace()
+    file_path = ws.plan_file
     if await aiofiles.os.path.exists(file_path):
         current_plan = await load_application_plan()
         if current_plan is False:
@@ -1023,26 +1531,60 @@ async def update_application_plan(updated_xml):
 
 
 # New function to select relevant files for user feedback
-async def select_relevant_files(user_feedback, application_plan):
+async def select_files_locally(user_feedback, application_plan):
+    """
+    Ranks the project files for a query with the local retrieval index, without any api request,
+    so it can run speculatively while a prompt is open.
+    Parameters:
+        user_feedback: The feedback or error message to search for.
+        application_plan: The current application plan.
+    Returns:
+        tuple: (candidate files, confidence of the selection).
+    """
+    ws = current_workspace()
+    application_files = await asyncio.to_thread(ws.project_index.get_all)
+
+    def refresh_retrieval_index():
+        ws.retrieval_index.sync(application_files)
+        try:
+            for name, description in parse_file_structure_xml(application_plan):
+                ws.retrieval_index.set_description(name, description)
+        except (ET.ParseError, AttributeError, TypeError) as e:
+            print(colored(f"Unable to index the plan descriptions: {e}", "yellow"))
+
+    await asyncio.to_thread(refresh_retrieval_index)
+    return ws.retrieval_index.select(user_feedback)
+
+
+async def select_relevant_files(user_feedback, application_plan, local_selection=None):
     """
     A function to select relevant files based on user feedback and application plan.
+    Files are looked up in the local retrieval index first; the model is only asked when the
+    index is not confident about its selection.
     Parameters:
         user_feedback: The feedback provided by the user.
         application_plan: The current application plan.
+        local_selection: The result of select_files_locally if it already ran, e.g. speculatively.
     Returns:
         List of files that are most likely to need updates to address the feedback.
     """
+    ws = current_workspace()
+    if local_selection is None:
+        local_selection = await select_files_locally(user_feedback, application_plan)
+    candidates, confidence = local_selection
+    if candidates and confidence >= RETRIEVAL_CONFIDENCE:
+        print(colored(f"Selected files from the local index (confidence {confidence:.2f})", "cyan"))
+        return candidates
+    candidate_hint = f"\n    Candidates from a local search: {', '.join(candidates)}\n" if candidates else ""
+
     system_message = "You are an expert in understanding software architecture and user feedback. Your task is to identify which files in the project are likely to be affected by the given user feedback."
 
     prompt = f"""
-    Given the following user feedback and the current application plan, please identify which files are most likely to need updates to address the feedback.
+    Given the following user feedback and the current application plan above, please identify which files are most likely to need updates to address the feedback.
 
     User Feedback:
     {user_feedback}
-
-    Application Plan:
-    {application_plan}
-
+{candidate_hint}
     Please return your response in the following format:
     <relevant_files>
     <file>filename1.ext</file>
@@ -1052,17 +1594,18 @@ async def select_relevant_files(user_feedback, application_plan):
 
     response = await rate_limited_request(
         model="claude-3-5-sonnet-20240620",
-        system=system_message,
+        system=build_system(await project_context(application_plan), system_message, enabled=PROMPT_CACHING),
         max_tokens=1000,
         messages=[{"role": "user", "content": prompt}],
     )
     if response and hasattr(response, "content") and len(response.content) > -1 and hasattr(response.content[0], "text"):
-        await save_file_contents(file_name=f"{LOGS_FOLDER}/select_relevant_files.txt", content=response.content[0].text) # type: ignore
+        await save_file_contents(file_name=f"{ws.logs_folder}/select_relevant_files.txt", content=response.content[0].text) # type: ignore
         relevant_files = re.findall(r'<file>(.*?)</file>', response.content[0].text) # type: ignore
     else:
         relevant_files = []
     return relevant_files
 
+@traced()
 async def get_application_update(user_feedback):
     """
     Asynchronously updates a Python application project based on user feedback.
@@ -1078,8 +1621,9 @@ async def get_application_update(user_feedback):
     Note:
         - The function assumes that the model is available and can be accessed through the `rate_limited_request` function.
         - The function assumes that the necessary functions (`load_application_plan`, `get_string_from_user`, `select_files_manually`, `get_project_files_contents`, `save_file_contents`, `update_backup_folder`, `update_application_files`, `update_application_plan`) are defined and accessible.
-        - The function assumes that the necessary constants (`DEV_FOLDER`, `LOGS_FOLDER`, `PRINT_RESPONSE`) are defined and accessible.
+        - The function assumes that the necessary constants (`DEV_FOLDER`, `PRINT_RESPONSE`) are defined and accessible and that a workspace is active.
     """
+    ws = current_workspace()
     application_plan = await load_application_plan()
 
     # Prompt user to choose file selection method
@@ -1087,55 +1631,55 @@ async def get_application_update(user_feedback):
 
     if selection_method.lower() == "m":
         # Use FileTreeSelector for manual file selection
-        relevant_files = select_files_manually(location=DEV_FOLDER)
+        relevant_files = select_files_manually(location=ws.dev_folder)
     else:
         # Use model-based file selection
         relevant_files = await select_relevant_files(user_feedback, application_plan)
         print(colored(f"Model selected files: {relevant_files}\ndo you want to change the file selection y/n enter for no?", "yellow"))
         inputs = await get_string_from_user("Input: ", default_string="n")
         if inputs.lower() == "y":
-            relevant_files = select_files_manually(location=DEV_FOLDER, our_selected_files=relevant_files)
-
+            relevant_files = select_files_manually(location=ws.dev_folder, our_selected_files=relevant_files)
 
-    file_contents, application_files = await get_project_files_contents(selected_files=relevant_files)
-    print(colored("File contents loaded", "green"))
-    relevant_file_contents = "\n\n".join([f"File: {filename}\n\n{application_files[filename]}" for filename in relevant_files if filename in application_files])
 
     print(colored(f"Model selected files: {relevant_files}\ndo you want to change the file selection y/n enter for no?", "yellow"))
-    inputs = input()
+    inputs = await get_string_from_user("Input: ", default_string="n")
     if inputs.lower() == "y":
-        relevant_files = select_files_manually(location=DEV_FOLDER, our_selected_files=relevant_files)
-        file_contents, application_files = await get_project_files_contents(selected_files=relevant_files)
-        print(colored("File contents loaded", "green"))
+        relevant_files = select_files_manually(location=ws.dev_folder, our_selected_files=relevant_files)
+    budget = CONTEXT_TOKEN_BUDGET - estimate_tokens(user_feedback)
+    relevant_file_contents, _ = await pack_project_context(user_feedback, pinned=relevant_files, budget_tokens=budget)
+    print(colored("File contents loaded", "green"))
+    if EDIT_MODE == "diff":
+        output_format = EDIT_FORMAT_INSTRUCTIONS
+    else:
+        output_format = """Provide the Full updated content for any files that need changes.
+Return the updated Full file contents in the following format only for the files that require updates:
+<file name="path/to/filename.ext">
+updated_file_contents
+</file>
+"""
     prompt = f"""
 Here are the current contents of the relevant python application project files:
 {relevant_file_contents}
 
-The current application plan is application_plan xml:
-{application_plan}
+The current application plan is the application_plan xml above.
 
 The user has provided the following feedback about the application:
 {user_feedback}
 
-Please analyze the feedback and suggest Full updates to the application files to address the user's comments.
-Provide the Full updated content for any files that need changes.
-Return the updated Full file contents in the following format only for the files that require updates:
-<file name="path/to/filename.ext">
-updated_file_contents
-</file>
-Important: ensure to provide a full and complete xml application_plan  with any changes or additions.
+Please analyze the feedback and suggest {"the edits" if EDIT_MODE == "diff" else "Full updates"} to the application files to address the user's comments.
+{output_format}Important: ensure to provide a full and complete xml application_plan  with any changes or additions.
 """
 
     system_message = """You are an expert Python and python application developer. Your task is to update a python application project based on user feedback.
-Analyze the current application files and the user's feedback, then provide updated versions of any files that need changes to address the feedback. Always return the full content of the files. One of the main goals is to review the logic of the code to ensure a user-friendly and enjoyable application play experience for the user. no external files are allowed within the application
+Analyze the current application files and the user's feedback, then provide updated versions of any files that need changes to address the feedback. One of the main goals is to review the logic of the code to ensure a user-friendly and enjoyable application play experience for the user. no external files are allowed within the application
 Ensure that your changes are consistent with the existing code structure and python application best practices. Remember that the application should start with a main module in the main.py file(main shouldn't take any arguments) the file app/main.py must have def main(no arguments) and should have a comment IMPORTANT: do not remove main function as automated test will fail IMPORTANT: do not remove this comment."""
-    print(f"{LOGS_FOLDER}/last_get_application_update.txt")
+    print(f"{ws.logs_folder}/last_get_application_update.txt")
 
-    await save_file_contents(f"{LOGS_FOLDER}/last_get_application_update.txt", prompt)
+    await save_file_contents(f"{ws.logs_folder}/last_get_application_update.txt", prompt)
     # send the prompt to the model
     response = await rate_limited_request(
         model="claude-3-5-sonnet-20240620",
-        system=system_message,
+        system=build_system(await project_context(application_plan), system_message, enabled=PROMPT_CACHING),
         max_tokens=4000,
         messages=[{"role": "user", "content": prompt}],
     )
@@ -1149,14 +1693,18 @@ Ensure that your changes are consistent with the existing code structure and pyt
             print(f"No content found in the response. {e}")
             print(response)
     if response and hasattr(response, "content") and len(response.content) > 0 and hasattr(response.content[0], "text"):
-        await save_file_contents(file_name=f"{LOGS_FOLDER}/last_get_application_update_response.txt", content=response.content[0].text) # type: ignore
+        await save_file_contents(file_name=f"{ws.logs_folder}/last_get_application_update_response.txt", content=response.content[0].text) # type: ignore
     # Extract the XML content from the response
     updated_files = False
     plan = False
     if response and hasattr(response, "content") and len(response.content) > 0 and hasattr(response.content[0], "text"):
         plan = re.search(r'<application_plan>.*?</application_plan>', response.content[0].text, re.DOTALL) # type: ignore
         updated_files = re.findall(r'<file name="(.*?)">(.*?)</file>', response.content[0].text, re.DOTALL) # type: ignore
+        if EDIT_MODE == "diff":
+            updated_files = list(updated_files) + await apply_edit_blocks(response.content[0].text, f"Address this user feedback:\n\n{user_feedback}") # type: ignore
     if updated_files:
+        # a run prepared during the feedback prompt scanned the files that are about to change
+        await ws.speculation.discard("runner")
         await update_backup_folder()
         await update_application_files(updated_files)
         if plan and plan.group(0):
@@ -1168,20 +1716,93 @@ Ensure that your changes are consistent with the existing code structure and pyt
             if module_name.startswith(f'{DEV_FOLDER}.'):
                 del sys.modules[module_name]
 
-        time.sleep(1) # Add a small delay to ensure files are fully written
+        await asyncio.sleep(WRITE_SETTLE_DELAY) # Add a small delay to ensure files are fully written
     else:
         print(colored("No updates were necessary based on the user's feedback.", "yellow"))
 
 
+async def apply_edit_blocks(response_text, task):
+    """
+    Applies the <edit> blocks of a response to the current project files.
+
+    Edits are located with a fuzzy match, so small drifts in whitespace or context still apply. When
+    an edit cannot be located, the full content of that file alone is requested from the model.
+
+    Parameters:
+        response_text (str): The model response.
+        task (str): What the edits are meant to do, repeated in the full file request.
+
+    Returns:
+        list: (filename, content) pairs of the edited files, ready to be written.
+    """
+    ws = current_workspace()
+    updated_files = []
+    for filename, hunks in parse_edits(response_text).items():
+        file_path = os.path.join(ws.dev_folder, filename)
+        original = await get_file_contents(file_path) if os.path.exists(file_path) else ""
+        content, failed = apply_hunks(original or "", hunks)
+        if failed:
+            print(colored(f"{len(failed)} of {len(hunks)} edits could not be applied to {filename}, requesting the full file", "yellow"))
+            content = await request_full_file(filename, original or "", task, failed)
+            if content is None:
+                print(colored(f"Unable to update {filename}", "red"))
+                continue
+        updated_files.append((filename, content))
+    return updated_files
+
+
+async def request_full_file(filename, original, task, failed_hunks):
+    """
+    Asks the model for the full content of a single file whose edits could not be applied.
+
+    Parameters:
+        filename (str): The file, relative to the project folder.
+        original (str): Its current content.
+        task (str): What the edits were meant to do.
+        failed_hunks (list): The Hunk objects that did not apply.
+
+    Returns:
+        str: The new file content, or None if the response held no file.
+    """
+    failed_edits = "\n".join(hunk.render() for hunk in failed_hunks)
+    prompt = f"""{task}
+
+Here are the current contents of {filename}:
+
+{original}
+
+These edits to {filename} could not be applied because their SEARCH lines do not match the file:
+
+{failed_edits}
+
+Return the full updated content of {filename}, with these edits applied, in the following format:
+<file name="{filename}">
+updated_file_contents
+</file>
+"""
+    response = await rate_limited_request(
+        model="claude-3-5-sonnet-20240620",
+        system="You are an expert Python developer. Apply the requested changes to the file and return its full content.",
+        max_tokens=4000,
+        messages=[{"role": "user", "content": prompt}],
+    )
+    if response and hasattr(response, "content") and len(response.content) > 0 and hasattr(response.content[0], "text"):
+        match = re.search(r'<file name=".*?">(.*?)</file>', response.content[0].text, re.DOTALL) # type: ignore
+        if match:
+            return match.group(1)
+    return None
+
+
 async def update_application_files(updated_files):
     """
     A function that updates files with the provided content.
     It ensures the correct writing of the files by reading them back and comparing the content.
     If the file is not written correctly, it retries the writing process.
     """
+    ws = current_workspace()
     updated_files = [(filename, content.strip()) for filename, content in updated_files]
     for filename, content in updated_files:
-        file_path = os.path.join(f"{DEV_FOLDER}", filename)
+        file_path = os.path.join(ws.dev_folder, filename)
         dir_name = os.path.dirname(file_path)
         if not await aiofiles.os.path.exists(dir_name):
             await aiofiles.os.makedirs(dir_name, exist_ok=True)
@@ -1192,7 +1813,7 @@ async def update_application_files(updated_files):
         written_content = await get_file_contents(file_path)
         if written_content.strip() != content.strip(): # type: ignore
             print(colored(f"Warning: File {filename} may not have been written correctly. retrying...", "yellow"))
-            file_path = os.path.join(f"{DEV_FOLDER}", filename)
+            file_path = os.path.join(ws.dev_folder, filename)
             dir_name = os.path.dirname(file_path)
             if not await aiofiles.os.path.exists(dir_name):
                 await aiofiles.os.makedirs(dir_name, exist_ok=True)
@@ -1244,6 +1865,7 @@ def parse_file_structure_xml(xml_string):
 async def get_project_files_contents(selected_files=None):
     """
     Function to get the contents of project files, excluding certain directories and files.
+    Contents come from the project index, which only re-reads files whose mtime or size changed.
 
     Parameters:
         selected_files (list): A list of selected files to retrieve contents for.
@@ -1251,94 +1873,83 @@ async def get_project_files_contents(selected_files=None):
     Returns:
         tuple: A tuple containing the concatenated file contents and a dictionary of file paths and contents.
     """
-    application_files = {}
-    for root, dirs, files in os.walk(f"{DEV_FOLDER}"):
-
-        # Rest of the function remains the same
-        if '__pycache__' in dirs:
-            shutil.rmtree(os.path.join(root, '__pycache__'))
-            dirs.remove('__pycache__')
-
-        dirs[:] = [d for d in dirs if d not in FOLDERS_TO_EXCLUDE]
-        if dont_send_diagnostic_file:
-            dirs[:] = [d for d in dirs if d not in ['diagnostic_report.py']]
-        for filename in files:
-            if filename.endswith(FILE_EXTENSIONS):
-                file_path = os.path.join(root, filename)
-                relative_path = os.path.relpath(file_path, f"{DEV_FOLDER}").replace('\\', '/')
-                # print("get_project_files_contents : ", file_path)
-                if selected_files is not None:
-                    if relative_path not in selected_files:
-                        continue
-                for encoding in ENCODINGS:
-                    try:
-                        content = await get_file_contents(file_name=file_path, encoding=encoding)
-                        application_files[relative_path] = content
-                        print(f"Successfully read {relative_path} with {encoding} encoding")
-                        break
-                    except UnicodeDecodeError:
-                        if encoding == ENCODINGS[-1]:
-                            print(f"Error: Unable to read {relative_path} with any of the attempted ENCODINGS")
-                    except Exception as e:
-                        print(f"get_project_files_contents Error reading {relative_path}: {str(e)}")
-                        break
+    ws = current_workspace()
+    if selected_files is not None:
+        # only the selected files are looked up, without walking the project
+        application_files = await asyncio.to_thread(ws.project_index.get_many, [f.replace('\\', '/') for f in selected_files])
+    else:
+        application_files = await asyncio.to_thread(ws.project_index.get_all)
+    print(f"Loaded {len(application_files)} files from the project index")
     file_contents = "\n\n".join([f"File: {filename}\n\n{content}" for filename, content in application_files.items()])
     return file_contents, application_files
 
 
+async def pack_project_context(text="", pinned=(), budget_tokens=CONTEXT_TOKEN_BUDGET, relevant_only=True):
+    """
+    Packs the project files most relevant to a traceback or feedback into a token budget.
+
+    Files are ranked by traceback frames, the pinned selection and the import graph; the top ones are
+    included verbatim and the rest as signatures only (see context_packer.pack_context).
+
+    Parameters:
+        text (str): Error message, diagnostics or user feedback used for ranking.
+        pinned (list): Files selected by the model or the user.
+        budget_tokens (int): Token budget of the packed files.
+        relevant_only (bool): Only send files related to the text or selection in full.
+
+    Returns:
+        tuple: The packed file contents and the list of files included verbatim.
+    """
+    ws = current_workspace()
+    application_files = await asyncio.to_thread(ws.project_index.get_all)
+    pinned = [os.path.normpath(f).replace('\\', '/') for f in pinned]
+    packed, verbatim, summarized = await asyncio.to_thread(pack_context, application_files, text, max(budget_tokens, 0), pinned, relevant_only)
+    print(f"Packed {len(verbatim)} files verbatim and {len(summarized)} as signatures into {budget_tokens} tokens")
+    return packed, verbatim
+
+
 async def count_lines_of_code(silent=True):
     """
-    Counts the number of lines of code in the files in the specified directory and its subdirectories.
-    
+    Counts the non-blank lines of the project files in DEV_FOLDER and its subdirectories.
+
+    The count is incremental: the line counter of the workspace caches each file's count by modification time and size,
+    so only files changed since the previous count are read.
+
     Args:
-        silent (bool, optional): If True, suppresses the output of file and encoding information. Defaults to True.
-    
+        silent (bool, optional): If True, suppresses the breakdown per language and directory. Defaults to True.
+
     Returns:
         int: The total number of lines of code in the specified directory and its subdirectories.
-    
-    Raises:
-        Exception: If there is an error reading a file with any of the attempted encodings.
-    
-    Note:
-        - The function uses the `os.walk` function to recursively traverse the directory and its subdirectories.
-        - The function uses the `os.path.join` function to construct the absolute file path.
-        - The function uses the `os.path.relpath` function to get the relative file path.
-        - The function uses the `aiofiles.open` function to open the file asynchronously.
-        - The function uses the `async for` loop to iterate over the lines of the file asynchronously.
-        - The function uses the `colored` function from the `termcolor` module to colorize the output.
-    """
-    total_lines = 0
-    for root, dirs, files in os.walk(f"{DEV_FOLDER}"):
-        dirs[:] = [d for d in dirs if d not in FOLDERS_TO_EXCLUDE]
-
-        for filename in files:
-            if filename.endswith(tuple(FILE_EXTENSIONS)):  # Using tuple for endswith check on multiple extensions
-                file_path = os.path.join(root, filename)
-                relative_path = os.path.relpath(file_path, DEV_FOLDER)
-                
-                for encoding in ENCODINGS:
-                    try:
-                        async with aiofiles.open(file_path, mode='r', encoding=encoding) as file:
-                            file_lines = 0
-                            async for line in file:
-                                if line.strip():  # Count non-empty lines
-                                    file_lines += 1
-                            total_lines += file_lines
-                            if not silent:
-                                print(colored(f"File: {relative_path}, Lines: {file_lines}", "cyan"))
-                        if not silent:
-                            print(f"Successfully read {relative_path} with {encoding} encoding")
-                        break
-                    except UnicodeDecodeError:
-                        continue  # Try the next encoding
-                    except Exception as e:
-                        if not silent:
-                            print(colored(f"count_lines_of_code Error reading {relative_path}: {str(e)}", "red"))
-                        break
-
+    """
+    ws = current_workspace()
+    errors = []
+    ws.last_line_count = await asyncio.to_thread(ws.line_counter.count, errors)
     if not silent:
-        print(colored(f"Total lines of code: {total_lines}", "yellow"))
-    return total_lines
+        for relative_path, error in errors:
+            print(colored(f"count_lines_of_code Error reading {relative_path}: {str(error)}", "red"))
+        for language, lines in sorted(ws.last_line_count.by_language.items(), key=lambda item: -item[1]):
+            print(colored(f"{language}: {lines} lines", "cyan"))
+        for directory, lines in sorted(ws.last_line_count.by_directory.items()):
+            print(colored(f"{directory}/: {lines} lines", "cyan"))
+        print(colored(f"Total lines of code: {ws.last_line_count.total} in {len(ws.last_line_count.files)} files ({len(ws.last_line_count.read)} recounted)", "yellow"))
+    return ws.last_line_count.total
+
+
+async def ainput(prompt=""):
+    """
+    Reads a line from the terminal without blocking the event loop, so background work keeps going
+    while the user answers.
+
+    aioconsole reads through a thread here instead of its pipe transport: stdin stays in blocking
+    mode for the synchronous file selector, and Ctrl+D only ends the current multiline answer
+    instead of closing stdin for every later prompt.
+
+    Raises:
+        EOFError: When the user ends the input with Ctrl+D (Ctrl+Z on Windows).
+    """
+    loop = asyncio.get_running_loop()
+    streams = (NonFileStreamReader(sys.stdin, loop=loop), NonFileStreamWriter(sys.stdout, loop=loop))
+    return await aioconsole.ainput(prompt, streams=streams)
 
 
 async def get_string_from_user(message="", default_string="y"):
@@ -1358,9 +1969,13 @@ async def get_string_from_user(message="", default_string="y"):
     Notes:
         - If the user does not provide an input, the default string is used.
         - If the user provides an input that is not a valid string, they will be prompted to re-enter a valid input.
+        - Unattended runs get the answer of the headless_policy, usually the default.
     """
+    ws = current_workspace()
+    if ws.headless_policy is not None:
+        return str(ws.headless_policy.answer(message, default_string))
     while True:
-        user_input = input(colored(f"{message} Default is {default_string}: ", "green"))
+        user_input = await ainput(colored(f"{message} Default is {default_string}: ", "green"))
         if user_input == "" or user_input is None:
             user_input = default_string
             print(f"Using default string. {default_string}")
@@ -1394,9 +2009,13 @@ async def get_number_from_user(message="", default_number=2):
     Notes:
         - If the user does not provide an input, the default number is used.
         - If the user provides an input that is not a valid integer, they will be prompted to re-enter a valid input.
+        - Unattended runs get the answer of the headless_policy, usually the default.
     """
+    ws = current_workspace()
+    if ws.headless_policy is not None:
+        return int(ws.headless_policy.answer(message, default_number))
     while True:
-        user_input = input(colored(f"{message} Default is {default_number}: ", "green"))
+        user_input = await ainput(colored(f"{message} Default is {default_number}: ", "green"))
         if user_input == "" or user_input is None:
             user_input = default_number
             break
@@ -1411,40 +2030,50 @@ async def get_number_from_user(message="", default_number=2):
     return user_input
 
 
-# Updated function to create backups within the app folder
+# Function to snapshot the app folder before files are overwritten
 
-async def update_backup_folder():
+def take_snapshot():
     """
-    Asynchronously updates backup files from DEV_FOLDER to BACKUP_FOLDER.
-    Creates a new backup folder with a timestamp and maintains a limited number of backups.
-    
+    Records a snapshot of DEV_FOLDER and the application plan in the snapshot store and prunes old snapshots.
+
     Returns:
-        True if backup was successful, False otherwise.
+        str: The snapshot id.
     """
-    print(colored("Updating backup files ...", "yellow"))
-
-    try:
-        if os.path.exists(os.path.join(THIS_DIRECTORY, DEV_FOLDER)):
-            timestamp = time.strftime("%Y%m%d-%H%M%S")
-            await aiofiles.os.makedirs(BACKUP_FOLDER, exist_ok=True)
-            new_backup_folder = os.path.join(BACKUP_FOLDER, f"backup_{timestamp}")
+    ws = current_workspace()
+    store = SnapshotStore(ws.snapshot_folder, keep=SNAPSHOTS_TO_KEEP)
+    snapshot_id = store.snapshot(
+        ws.dev_folder,
+        exclude=IGNORE_PATTERNS + FILES_TO_EXCLUDE,
+        extra_files={".system/application_plan.xml": ws.plan_file},
+    )
+    store.prune()
+    return snapshot_id
 
-            print(colored(f"Moving {DEV_FOLDER} to {new_backup_folder}", "yellow"))
 
-            if await aiofiles.os.path.exists(os.path.join(THIS_DIRECTORY, DEV_FOLDER)):
-                await asyncio.to_thread(shutil.copytree, os.path.join(THIS_DIRECTORY, DEV_FOLDER), new_backup_folder, ignore=shutil.ignore_patterns(*IGNORE_PATTERNS))
-                await asyncio.to_thread(shutil.copy, f"{PROJECT_SYSTEM_FOLDER}/application_plan.xml", f"{new_backup_folder}/application_plan.xml")
+@traced()
+async def update_backup_folder():
+    """
+    Asynchronously snapshots DEV_FOLDER into the content-addressed snapshot store.
 
-            # Maintain a limited number of backups
-            backups = sorted([d for d in os.listdir(BACKUP_FOLDER) if d.startswith("backup_")])
-            while len(backups) > 5:  # Keep only the 5 most recent backups
-                shutil.rmtree(os.path.join(BACKUP_FOLDER, backups.pop(0)))
+    Only files that changed since the previous snapshot are hashed and stored. Concurrent calls share
+    the snapshot that is already in progress instead of starting another one. Snapshots can be listed,
+    compared and restored with `python snapshot_store.py devfolder/.system/snapshots list|diff|restore`.
 
-            return True
+    Returns:
+        True if backup was successful, False otherwise.
+    """
+    ws = current_workspace()
+    if not os.path.exists(ws.dev_folder):
+        return False
+    if ws.backup_task is None or ws.backup_task.done():
+        print(colored("Updating backup snapshot ...", "yellow"))
+        ws.backup_task = asyncio.create_task(asyncio.to_thread(take_snapshot))
+    try:
+        snapshot_id = await asyncio.shield(ws.backup_task)
+        print(colored(f"Backup snapshot {snapshot_id} saved to {ws.snapshot_folder}", "yellow"))
+        return True
     except Exception as e:
         print(colored(f"Error updating backup files: {e}", "red"))
-
-    await asyncio.sleep(2)  # Simulate delay even in case of error
     return False
 
 
@@ -1455,7 +2084,8 @@ async def load_application_plan():
     Returns:
         str: The content of the application plan if the file is found, False otherwise.
     """
-    file_name = f"{PROJECT_SYSTEM_FOLDER}/application_plan.xml"
+    ws = current_workspace()
+    file_name = ws.plan_file
     print(colored(f"loading application plan from '{file_name}'", "yellow"))
     if await aiofiles.os.path.exists(file_name):
         async with aiofiles.open(file_name, "r", encoding="utf-8") as f:
@@ -1465,6 +2095,32 @@ async def load_application_plan():
     return False
 
 
+async def project_context(application_plan=None):
+    """
+    Returns the content shared by every request about the project, most stable first: the
+    references in additional_info.txt next to the project folder (copied into each job folder of a
+    --batch run), then the application plan. build_system puts these blocks ahead of the
+    instructions of each request so they are read from the prompt cache.
+
+    Parameters:
+        application_plan (str): The plan, loaded from the workspace when not given.
+
+    Returns:
+        list: The texts of the stable system blocks.
+    """
+    ws = current_workspace()
+    blocks = []
+    if os.path.exists(f"{ws.root}/additional_info.txt"):
+        additional_info = await get_file_contents(f"{ws.root}/additional_info.txt")
+        if additional_info:
+            blocks.append(f"heres some additional references: \n{additional_info}")
+    if application_plan is None:
+        application_plan = await load_application_plan()
+    if application_plan:
+        blocks.append(f"Here's the overall application plan, application_plan.xml:\n{application_plan}")
+    return blocks
+
+
 async def save_application_plan(final_plan):
     """
     Asynchronously saves the final plan to a file specified by 'file_name'.
@@ -1475,7 +2131,8 @@ async def save_application_plan(final_plan):
     Returns:
         bool: True if the file was successfully saved, False otherwise.
     """
-    file_name = f"{PROJECT_SYSTEM_FOLDER}/application_plan.xml"
+    ws = current_workspace()
+    file_name = ws.plan_file
     print(colored(f"writing application plan to {file_name}", "yellow"))
 
     await save_file_contents(file_name=file_name, content=final_plan)
@@ -1488,6 +2145,9 @@ async def save_application_plan(final_plan):
 async def save_file_contents(file_name="", content="", encoding="utf-8", mode="w"):
     """
     Asynchronously saves the content to a file specified by 'file_name'.
+
+    Files in the logs folder of the workspace are handed to its log sink and written in the
+    background; await log_sink.flush() before reading one back.
     
     Parameters:
         file_name (str): The path to the file to be saved.
@@ -1498,7 +2158,12 @@ async def save_file_contents(file_name="", content="", encoding="utf-8", mode="w
     Returns:
         bool: True if the file was successfully saved, False otherwise.
     """
+    ws = current_workspace()
+    if ws.log_sink.handles(file_name):
+        ws.log_sink.write(file_name, content, mode=mode, encoding=encoding)
+        return True
     dir_name = os.path.dirname(file_name)
+    record_project_write(file_name, content, mode=mode)
     print(colored(f"making directory: '{dir_name}' file with mode: {mode}", "yellow"))
     await aiofiles.os.makedirs(os.path.dirname(file_name), exist_ok=True)
     print(colored(f"Saving file: '{file_name}' file with mode: {mode}", "yellow"))
@@ -1533,137 +2198,51 @@ async def get_file_contents(file_name="", encoding="utf-8"):
     return False
 
 
-async def async_process_simulator(cmd, cwd, stop_event):
-    """Run a subprocess and manage stdout, stderr, and a combined output."""
-    try:
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            cwd=cwd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        
-        print("Subprocess started. Press 'q' to terminate.")
-        combined_output = []
-        stdout_data = []
-        stderr_data = []
-
-        stdout_task = asyncio.create_task(read_stream(process.stdout, "STDOUT", combined_output, stdout_data, stop_event))
-        stderr_task = asyncio.create_task(read_stream(process.stderr, "STDERR", combined_output, stderr_data, stop_event))
-        wait_task = asyncio.create_task(process.wait())
-
-        done, pending = await asyncio.wait(
-            [stdout_task, stderr_task, wait_task],
-            return_when=asyncio.FIRST_COMPLETED
-        )
-
-        if stop_event.is_set():
-            print("Termination requested...")
-            process.terminate()
-            await process.wait()
-            print("Process terminated by user.")
-
-        await asyncio.gather(*pending)
-
-        combined_output_str = "\n".join([f"{src}: {text}" for src, text in combined_output])
-        stdout_str = "\n".join(stdout_data)
-        stderr_str = "\n".join(stderr_data)
-
-        return stdout_str, stderr_str, combined_output_str
-
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        return "", "", ""
-
-async def read_stream(stream, identifier, combined_output, individual_output, stop_event):
-    """Read from a stream and append outputs to the respective buffers."""
-    while not stream.at_eof() and not stop_event.is_set():
-        try:
-            data = await asyncio.wait_for(stream.read(1024), timeout=0.1)
-            if data:
-                decoded = data.decode('utf-8').strip()
-                combined_output.append((identifier, decoded))
-                individual_output.append(decoded)
-                print(f"{identifier}: {decoded}")
-            else:
-                break  # No more data
-        except asyncio.TimeoutError:
-            continue  # Continue to check for stop condition
-
-def on_press(key, stop_event):
-    """Respond to 'q' key press to initiate termination."""
-    if hasattr(key, 'char') and key.char == 'q' or key == Key.esc:
-        print("Key 'q' pressed. Initiating termination...")
-        stop_event.set()
-        return False  # Return False to stop the listener
-
-def listen_for_termination(stop_event):
-    """Handle key presses in a separate thread."""
-    with Listener(on_press=lambda key: on_press(key, stop_event)) as listener:
-        listener.join()
-
-
+async def runner_cmd(cmd, cwd, timeout=RUN_TIMEOUT, idle_timeout=RUN_IDLE_TIMEOUT, on_line=None, stdin=None, handle_signals=True):
+    """
+    Runs a command in its own process group and returns its output.
 
-def flush_input():
-    """Flush all input from stdin buffer in a cross-platform manner."""
-    try:
-        fd = sys.stdin.fileno()
-        
-        if os.name == 'posix':
-            # Handling for Linux and macOS using termios and fcntl or select
-            import termios
-            import fcntl
-            import select
-            
-            # Save the old terminal settings and adjust the current settings
-            oldterm = termios.tcgetattr(fd)
-            newattr = termios.tcgetattr(fd)
-            newattr[3] = newattr[3] & ~termios.ICANON & ~termios.ECHO
-            termios.tcsetattr(fd, termios.TCSANOW, newattr)
-            
-            oldflags = fcntl.fcntl(fd, fcntl.F_GETFL)
-            fcntl.fcntl(fd, fcntl.F_SETFL, oldflags | os.O_NONBLOCK)
+    Output is printed line by line as it arrives and only the last PROCESS_OUTPUT_LINES lines of
+    each stream are kept. Ctrl+C (or SIGTERM) stops the command and its children instead of this
+    script.
 
-            try:
-                while select.select([sys.stdin], [], [], 0)[0]:
-                    sys.stdin.read(1)
-            finally:
-                # Restore the old terminal settings
-                termios.tcsetattr(fd, termios.TCSAFLUSH, oldterm)
-                fcntl.fcntl(fd, fcntl.F_SETFL, oldflags)
-        elif os.name == 'nt':
-            # Handling for Windows using msvcrt
-            import msvcrt
-            while msvcrt.kbhit():
-                msvcrt.getch()
-                
-    except Exception as e:
-        print(f"Failed to flush stdin: {e}")
+    Parameters:
+        cmd (list): The command and its arguments.
+        cwd (str): The working directory.
+        timeout (float): Wall-clock limit in seconds, None for no limit.
+        idle_timeout (float): Limit in seconds without output, None for no limit.
+        on_line (callable): Called with ("stdout" or "stderr", line) instead of printing.
+        stdin: The child's stdin, inherited by default; asyncio.subprocess.DEVNULL for unattended runs.
+        handle_signals (bool): Stop the command on Ctrl+C; False for background runs while a prompt is open.
 
-    
-async def runner_cmd(cmd, cwd):
-    """Manage subprocess execution and key listener."""
-    stop_event = asyncio.Event()
-    listener_thread = Thread(target=listen_for_termination, args=(stop_event,))
-    listener_thread.start()
-    stdout, stderr, combined_output = await async_process_simulator(cmd, cwd, stop_event)
-    print("Subprocess Standard Output:")
-    print(stdout)
-    print("Subprocess Error Output:")
-    print(stderr)
-    print("Combined Subprocess Output:")
-    print(combined_output)
-    # Wait for the listener thread to finish
-    listener_thread.join()
-    
-    flush_input()
-    return stdout, stderr, combined_output
+    Returns:
+        RunResult: The return code, stdout, stderr, combined output and why the run was stopped.
+    """
+    if on_line is None:
+        on_line = lambda name, line: print(f"{name.upper()}: {line.rstrip()}")
+    runner = ProcessRunner(cmd, cwd=cwd, timeout=timeout, idle_timeout=idle_timeout, max_lines=PROCESS_OUTPUT_LINES, on_line=on_line, stdin=stdin)
+    if handle_signals:
+        print("Subprocess started. Press Ctrl+C to terminate.")
+    result = await runner.run(handle_signals=handle_signals)
+    if result.stop_reason is not None:
+        print(colored(f"Process stopped ({result.stop_reason}) after {result.duration:.0f} seconds", "yellow"))
+    return result
 
 # Function to limit the number of requests to the API
+@traced(LLM_SPAN)
 async def rate_limited_request(*args, **kwargs):
     """
     Asynchronously makes a rate-limited request using the given arguments and keyword arguments.
 
+    Responses are served from the on-disk response cache when the same model, system, messages and
+    max_tokens were requested before, once per session: the same request sent again, such as a fix
+    round retried on unchanged files, goes to the model. Pass use_cache=False to bypass the cache for
+    a single call.
+
+    Pass stream_handler (an object with feed(text), reset() and rollback(), such as StreamingFileWriter)
+    to use the streaming messages api; each text chunk is fed to the handler as it arrives. Files the
+    handler completed in a failed attempt are rolled back before a retry and when the request fails.
+
     Args:
         *args: Positional arguments to be passed to the request.
         **kwargs: Keyword arguments to be passed to the request.
@@ -1677,53 +2256,87 @@ async def rate_limited_request(*args, **kwargs):
         Exception: If an unexpected error occurs.
 
     """
-    current_time = time.time()
+    ws = current_workspace()
+    use_cache = kwargs.pop("use_cache", True)
+    stream_handler = kwargs.pop("stream_handler", None)
+    span = current_span()
+    span.set(model=kwargs.get("model"), max_tokens=kwargs.get("max_tokens"), retries=0, rate_limited=0, queue_wait=0.0)
+    if use_cache:
+        cached_response = await ws.response_cache.get(kwargs)
+        if cached_response is not None:
+            print(colored(f"Using cached response ({ws.response_cache.hits} cache hits)", "cyan"))
+            span.set(response_cache=True)
+            response = Message.model_validate(cached_response)
+            if stream_handler is not None:
+                stream_handler.feed("".join(block.text for block in response.content if hasattr(block, "text")))
+            return response
+
     # print **kwargs for message limit to first 30 characters
     if "message" in kwargs and len(kwargs["message"]) > 30:
         #kwargs["message"] = kwargs["message"][:30] + "..."
         print(kwargs["message"][:30] + "...")
-    global request_counter
-    
-    request_timestamps = deque() # Initialize request timestamps deque
-    # Remove timestamps older than TIME_WINDOW
-    while request_timestamps and current_time - request_timestamps[0] > TIME_WINDOW:
-        request_timestamps.popleft()
-
-    # If we've reached the limit, wait until enough time has passed
-    if len(request_timestamps) >= REQUEST_LIMIT:
-        sleep_time = TIME_WINDOW - (current_time - request_timestamps[0])
-        if sleep_time > 0:
-            print(f"Rate limit reached. Waiting for {sleep_time:.2f} seconds...")
-            await asyncio.sleep(sleep_time)
 
+    cacheable = uses_cache_control(kwargs)
+    if cacheable:
+        kwargs["extra_headers"] = {**kwargs.get("extra_headers", {}), "anthropic-beta": PROMPT_CACHING_BETA}
+    input_tokens = estimate_request_tokens(kwargs)
     for request_attempt in range(MAX_RETRIES):
         try:
-            # Make the request
-            response = await client.messages.create(*args, **kwargs)
-            print(f"made {request_counter} requests")
-            request_counter += 1
-            # Add the current timestamp to our list
-            request_timestamps.append(time.time())
+            # Wait for our turn in the shared request and token budget
+            waiting_since = time.monotonic()
+            reservation = await ws.rate_limiter.reserve(input_tokens, kwargs.get("max_tokens", 0))
+            span.add("queue_wait", round(time.monotonic() - waiting_since, 3))
+            async with reservation:
+                if stream_handler is None:
+                    response = await client.messages.create(*args, **kwargs)
+                else:
+                    stream_handler.reset()
+                    async with client.messages.stream(*args, **kwargs) as stream:
+                        async for text in stream.text_stream:
+                            stream_handler.feed(text)
+                        response = await stream.get_final_message()
+                reservation.settle(getattr(response, "usage", None))
+            ws.prompt_cache_stats.record(getattr(response, "usage", None), cacheable)
+            span.record_usage(getattr(response, "usage", None))
+            print(f"made {ws.request_counter} requests")
+            ws.request_counter += 1
+            if use_cache:
+                await ws.response_cache.put(kwargs, response.model_dump(mode="json"))
             return response
 
         except RateLimitError as e:
+            span.add("rate_limited")
             if request_attempt < MAX_RETRIES - 1:
-                delay = BASE_DELAY * (request_attempt)
+                span.add("retries")
+                delay = get_retry_after(e, default=min(BASE_DELAY, 2 ** request_attempt))
+                # hold back every queued request, not just this one
+                ws.rate_limiter.pause(delay)
                 print(f"Rate limit exceeded. Retrying in {delay} seconds... (Attempt {request_attempt + 1}/{MAX_RETRIES})")
                 print(f"Error: {str(e)}")
-                await asyncio.sleep(delay)
             else:
                 print(f"Max retries reached. Last error: {str(e)}")
+                span.set(failed=True)
+                if stream_handler is not None:
+                    stream_handler.rollback()
                 return None
 
         except APIError as e:
             print(f"API Error occurred: {str(e)}")
+            span.add("retries")
             if "credit balance is too low to access the Claude API. Please go to Plans & Billing to upgrade or purchase credits." in str(e):
-                input("TOP UP and press Enter")
+                if ws.headless_policy is not None:
+                    if stream_handler is not None:
+                        stream_handler.rollback()
+                    return None
+                await ainput("TOP UP and press Enter")
         except Exception as e:
             print(f"An unexpected error occurred: {str(e)}")
+            span.add("retries")
             # return None
     print("Max retries reached without successful request")
+    span.set(failed=True)
+    if stream_handler is not None:
+        stream_handler.rollback()
     return None
 
 
@@ -1748,6 +2361,34 @@ def get_project_name(project_plan):
 
 # Run the application creation process
 if __name__ == "__main__":
+    ws = current_workspace()
+    if "--no-cache" in sys.argv:
+        sys.argv.remove("--no-cache")
+        RESPONSE_CACHE_ENABLED = False
+        ws.response_cache.enabled = False
+        print(colored("Response cache disabled.", "yellow"))
+    if "--all-tests" in sys.argv:
+        sys.argv.remove("--all-tests")
+        RUN_ALL_TESTS = True
+    if len(sys.argv) == 3 and sys.argv[1] == "--batch-job":
+        # one job of a --batch run, started by batch_runner in the job workspace
+        asyncio.run(run_batch_job(sys.argv[2]))
+        sys.exit(0)
+    if len(sys.argv) >= 3 and sys.argv[1] == "--batch":
+        # --batch FILE.jsonl [WORKERS]: build every application of the file without prompts
+        jobs_file = os.path.abspath(sys.argv[2])
+        workers = int(sys.argv[3]) if len(sys.argv) > 3 else BATCH_WORKERS
+        output_folder = os.path.join(THIS_DIRECTORY, BATCH_FOLDER, os.path.splitext(os.path.basename(jobs_file))[0])
+        try:
+            # in-process jobs print into their batch_worker.log instead of the terminal
+            with route_output():
+                asyncio.run(run_batch(jobs_file, output_folder, os.path.abspath(__file__), max_workers=workers,
+                                      defaults={"planning_iterations": default_number_of_iterations, "max_fix_attempts": max_attempts},
+                                      job_runner=run_job_in_process if BATCH_IN_PROCESS else None,
+                                      shared_files=[f"{THIS_DIRECTORY}/additional_info.txt"]))
+        except KeyboardInterrupt:
+            print(colored("Batch stopped.", "yellow"))
+        sys.exit(0)
     # if args --fix then coding_phase = True else coding_phase = false
     if len(sys.argv) == 2 and sys.argv[1] == "--fix":
         coding_phase = "fix"
@@ -1761,6 +2402,13 @@ if __name__ == "__main__":
         print(f"{coding_phase} ./{DEV_FOLDER}")
         # print(sys.argv[1])
         # print(len(sys.argv))
+    elif len(sys.argv) == 2 and sys.argv[1] == "--resume":
+        if not ws.pipeline_state.resumable():
+            print(colored(f"No unfinished session to resume in {ws.pipeline_state_file}", "yellow"))
+            sys.exit(0)
+        coding_phase = "resume"
+    elif ws.pipeline_state.resumable() and input(colored(f"An unfinished session was found ({ws.pipeline_state.summary()}). Resume it? (y/n): ", "green")).strip().lower() != "n":
+        coding_phase = "resume"
     else:
         coding_phase = "create"
 
@@ -1780,7 +2428,7 @@ if __name__ == "__main__":
         # move the app Directory and its contents if it exists
         try:
             if os.path.exists(f"{DEV_FOLDER}"):
-                if os.path.exists(f"{PROJECT_SYSTEM_FOLDER}/application_plan.xml"):
+                if os.path.exists(ws.plan_file):
                     plan = asyncio.run(load_application_plan())
                     project_name = get_project_name(plan)
                 # rename f"{DEV_FOLDER}" folder to the current time/date and move to "projects" folder
@@ -1796,7 +2444,11 @@ if __name__ == "__main__":
 
     try:
         asyncio.run(create_application(coding_phase))
-        print(f"made {request_counter} requests")
+        print(f"made {ws.request_counter} requests")
+        print(ws.prompt_cache_stats.summary())
+        print(ws.speculation.summary())
+        if ws.tracer.enabled and os.path.exists(ws.trace_file):
+            print(f"Timings: python tracing.py {ws.trace_file}")
 
     except (KeyboardInterrupt, SystemExit):
         print(colored("Create Application exited.", "yellow"))
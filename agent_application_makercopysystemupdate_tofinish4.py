@@ -6,7 +6,6 @@ import time
 import xml.etree.ElementTree as ET
 from typing import List, Dict, Tuple, Optional, Any
 import subprocess
-import unittest
 import logging
 import shutil
 from dataclasses import dataclass
@@ -25,6 +24,7 @@ from termcolor import colored
 # Import custom modules
 from file_selector import FileTreeSelector
 from requirements_manager import RequirementsManager
+from suite_runner import run_test_suite
 
 @dataclass
 class Config:
@@ -466,31 +466,27 @@ import unittest
         print(colored(f"Created unit test file: {test_file_name}", "green"))
 
     async def run_unit_tests(self) -> None:
-        """Run all unit tests in the project."""
+        """Run the project's unit tests sharded across worker processes, outside this process."""
         self.logger.info("Running unit tests")
-        test_loader = unittest.TestLoader()
-        test_suite = test_loader.discover(self.config.dev_folder)
-        test_runner = unittest.TextTestRunner(verbosity=2)
-        
         print(colored("Running unit tests...", "yellow"))
-        test_result = test_runner.run(test_suite)
-        
-        if test_result.wasSuccessful():
-            self.logger.info("All unit tests passed successfully")
+        suite = await run_test_suite(
+            self.config.dev_folder,
+            exclude_dirs=[os.path.basename(self.config.backup_folder), "venv", ".venv", "__pycache__"],
+            junit_path=os.path.join(self.config.logs_folder, "junit.xml"),
+        )
+        counts = suite.counts()
+
+        if suite.passed:
+            self.logger.info(f"All unit tests passed successfully in {suite.wall_time:.1f}s")
             print(colored("All unit tests passed successfully!", "green"))
         else:
-            self.logger.warning(f"Some unit tests failed. Failures: {len(test_result.failures)}, Errors: {len(test_result.errors)}")
-            print(colored(f"Some unit tests failed. Failures: {len(test_result.failures)}, Errors: {len(test_result.errors)}", "red"))
-            
-            for failure in test_result.failures:
-                self.logger.error(f"Test case failure: {failure[0]}\nFailure: {failure[1]}")
-                print(colored(f"\nTest case: {failure[0]}", "yellow"))
-                print(colored(f"Failure: {failure[1]}", "red"))
-            
-            for error in test_result.errors:
-                self.logger.error(f"Test case error: {error[0]}\nError: {error[1]}")
-                print(colored(f"\nTest case: {error[0]}", "yellow"))
-                print(colored(f"Error: {error[1]}", "red"))
+            self.logger.warning(f"Some unit tests failed. Failures: {counts.get('failed', 0)}, Errors: {counts.get('error', 0)}, Timeouts: {counts.get('timeout', 0)}")
+            print(colored(f"Some unit tests failed. Failures: {counts.get('failed', 0)}, Errors: {counts.get('error', 0)}, Timeouts: {counts.get('timeout', 0)}", "red"))
+
+            for result in suite.failures:
+                self.logger.error(f"Test case {result.outcome}: {result.test_id} ({result.duration:.2f}s)\n{result.message}")
+                print(colored(f"\nTest case: {result.test_id} ({result.duration:.2f}s)", "yellow"))
+                print(colored(f"{result.outcome.capitalize()}: {result.message}", "red"))
 
     async def create_file(self, file_name: str, file_description: str, plan: str) -> None:
         """
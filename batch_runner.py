@@ -0,0 +1,250 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import asyncio
+
+from termcolor import colored
+
+from process_runner import ProcessRunner
+
+JOB_FILE = "batch_job.json"
+RESULT_FILE = "batch_result.json"
+LOG_FILE = "batch_worker.log"
+RESULTS_FILE = "results.jsonl"
+DEFAULT_WORKERS = 4
+DEFAULT_JOB_TIMEOUT = 60 * 60  # seconds per job, planning and fixing included
+MAX_ERROR_CHARS = 4000  # tail of the last error kept in a result record
+FRESH_RETRY_STATUSES = ("failed", "error")  # retried in a new workspace, the old one is kept aside
+
+
+class HeadlessPolicy:
+    """
+    Answers the prompts of an unattended run.
+
+    Every prompt gets its default answer unless `answers` maps a substring of the prompt message to
+    another answer. The feedback loop is fed from `feedback`, one round per entry, and ends with 'q'.
+    """
+
+    def __init__(self, description, planning_iterations=2, max_fix_attempts=5, feedback=(), run_timeout=60, answers=None):
+        """
+        Args:
+            description (str): The application to create.
+            planning_iterations (int, optional): Planning rounds.
+            max_fix_attempts (int, optional): Fix rounds before the job gives up.
+            feedback (Iterable[str], optional): Feedback rounds applied once the application runs.
+            run_timeout (float, optional): Seconds the application may run; an application that is
+                still running without errors after that counts as working (servers, GUIs).
+            answers (Dict[str, str], optional): {prompt substring: answer} overriding defaults.
+        """
+        self.description = description
+        self.planning_iterations = planning_iterations
+        self.max_fix_attempts = max_fix_attempts
+        self.feedback = list(feedback)
+        self.run_timeout = run_timeout
+        self.answers = dict(answers or {})
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["description"], data.get("planning_iterations", 2), data.get("max_fix_attempts", 5),
+                   data.get("feedback", ()), data.get("run_timeout", 60), data.get("answers"))
+
+    def to_dict(self):
+        return {"description": self.description, "planning_iterations": self.planning_iterations,
+                "max_fix_attempts": self.max_fix_attempts, "feedback": self.feedback,
+                "run_timeout": self.run_timeout, "answers": self.answers}
+
+    def answer(self, message, default):
+        for pattern, answer in self.answers.items():
+            if pattern.lower() in str(message).lower():
+                return answer
+        return default
+
+    def next_feedback(self):
+        """Returns the next feedback round, or 'q' when there is none left."""
+        return self.feedback.pop(0) if self.feedback else "q"
+
+
+def job_id(value, line_number):
+    """Turns a job id into a folder name; jobs without an id are numbered by their line."""
+    text = str(value) if value not in (None, "") else f"job-{line_number:04d}"
+    return re.sub(r'[^\w.-]+', '_', text).strip("._") or f"job-{line_number:04d}"
+
+
+def load_jobs(path, defaults=None):
+    """
+    Reads the jobs of a batch file.
+
+    Each line is a JSON object with a "description" (or a "title" and "body") and optionally an
+    "id" (or "request_id") and any HeadlessPolicy setting: planning_iterations, max_fix_attempts,
+    feedback, run_timeout and answers. Blank lines and lines starting with # are skipped.
+
+    Args:
+        path (str): The JSONL file.
+        defaults (dict, optional): Policy settings applied to jobs that do not set them.
+
+    Returns:
+        List[Tuple[str, HeadlessPolicy]]: (job id, policy) pairs in file order.
+
+    Raises:
+        ValueError: If a line is not valid JSON, has no description or repeats an id.
+    """
+    jobs = []
+    seen = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON: {e}") from e
+            description = data.get("description") or "\n\n".join(filter(None, [data.get("title"), data.get("body")]))
+            if not description:
+                raise ValueError(f"{path}:{line_number}: job has no description")
+            identifier = job_id(data.get("id", data.get("request_id")), line_number)
+            if identifier in seen:
+                raise ValueError(f"{path}:{line_number}: duplicate job id {identifier}")
+            seen.add(identifier)
+            settings = dict(defaults or {})
+            settings.update({key: value for key, value in data.items() if key not in ("id", "request_id", "title", "body")})
+            settings["description"] = description
+            jobs.append((identifier, HeadlessPolicy.from_dict(settings)))
+    return jobs
+
+
+def write_json(path, data):
+    """Writes JSON through a temporary file so readers never see half a record."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+async def run_job(identifier, policy, workspace, script, job_timeout=DEFAULT_JOB_TIMEOUT, rate_share=1.0):
+    """
+    Builds one application in its own workspace with a worker process.
+
+    The worker runs `script --batch-job JOB_FILE` with the workspace as working directory, so its
+    devfolder, logs, caches and virtualenv stay inside the workspace. The worker writes RESULT_FILE;
+    if it crashes or runs past `job_timeout` the record is written here instead.
+
+    Args:
+        identifier (str): The job id.
+        policy (HeadlessPolicy): The answers of the job.
+        workspace (str): The job folder, created if needed.
+        script (str): The orchestrator script.
+        job_timeout (float, optional): Seconds the job may take.
+        rate_share (float, optional): Fraction of the api rate limits the worker may use.
+
+    Returns:
+        dict: The result record of the job.
+    """
+    os.makedirs(workspace, exist_ok=True)
+    job = dict(policy.to_dict(), id=identifier, rate_share=rate_share)
+    write_json(os.path.join(workspace, JOB_FILE), job)
+    result_path = os.path.join(workspace, RESULT_FILE)
+    if os.path.exists(result_path):
+        os.remove(result_path)
+    started = time.time()
+    log_path = os.path.join(workspace, LOG_FILE)
+    with open(log_path, "w", encoding="utf-8", errors="replace") as log:
+        def on_line(name, line):
+            log.write(line if name == "stdout" else f"[stderr] {line}")
+
+        runner = ProcessRunner([sys.executable, script, "--batch-job", JOB_FILE], cwd=workspace, timeout=job_timeout,
+                               max_lines=200, on_line=on_line, stdin=asyncio.subprocess.DEVNULL)
+        run = await runner.run(handle_signals=False)
+    result = read_json(result_path)
+    if result is None:
+        if run.stop_reason == "timeout":
+            result = {"status": "timeout", "error": f"stopped after {job_timeout} seconds\n{run.stderr[-MAX_ERROR_CHARS:]}"}
+        else:
+            result = {"status": "error", "error": run.stderr[-MAX_ERROR_CHARS:] or f"worker exited with {run.returncode}"}
+    result.update(id=identifier, workspace=workspace, duration=round(time.time() - started, 1), returncode=run.returncode, log=log_path)
+    write_json(result_path, result)
+    return result
+
+
+async def run_batch(jobs_path, output_folder, script, max_workers=DEFAULT_WORKERS, job_timeout=DEFAULT_JOB_TIMEOUT, defaults=None, rerun=False, job_runner=None, shared_files=()):
+    """
+    Builds every application of a batch file with up to `max_workers` jobs at once.
+
+    Each job gets the workspace output_folder/<job id> and its result record is appended to
+    output_folder/results.jsonl as soon as it finishes. Worker processes split the api rate limits
+    evenly; a `job_runner` building the jobs in this process shares them between the running jobs.
+    Jobs that already succeeded in an earlier run are skipped unless `rerun`. A job that failed is
+    retried in a fresh workspace, since its response cache would replay the failed build; the old
+    workspace is renamed to <job id>.<status>-<time>. A job that timed out resumes from its checkpoint.
+
+    Args:
+        jobs_path (str): The JSONL file of jobs, see load_jobs.
+        output_folder (str): Folder of the job workspaces and results.jsonl.
+        script (str): The orchestrator script started by each worker.
+        max_workers (int, optional): Jobs run at once.
+        job_timeout (float, optional): Seconds each job may take.
+        defaults (dict, optional): Policy settings for jobs that do not set them.
+        rerun (bool, optional): Run jobs again even when they succeeded before.
+        job_runner (Callable, optional): Coroutine function (identifier, policy, workspace, job_timeout)
+            returning the result record of a job, used instead of a worker process per job.
+        shared_files (Iterable[str], optional): Files copied into every job workspace before the job
+            runs, such as the additional_info.txt references an interactive build reads from its root.
+
+    Returns:
+        List[dict]: The result records in job order.
+    """
+    jobs = load_jobs(jobs_path, defaults)
+    os.makedirs(output_folder, exist_ok=True)
+    results_path = os.path.join(output_folder, RESULTS_FILE)
+    max_workers = max(1, min(max_workers, len(jobs) or 1))
+    semaphore = asyncio.Semaphore(max_workers)
+    write_lock = asyncio.Lock()
+    print(colored(f"Batch of {len(jobs)} jobs with {max_workers} workers, results in {results_path}", "cyan"))
+
+    async def run_one(identifier, policy):
+        workspace = os.path.join(output_folder, identifier)
+        previous = read_json(os.path.join(workspace, RESULT_FILE))
+        if previous is not None and previous.get("status") == "success" and not rerun:
+            print(colored(f"[{identifier}] already done", "yellow"))
+            return previous
+        if previous is not None and previous.get("status") in FRESH_RETRY_STATUSES:
+            kept = f"{workspace}.{previous['status']}-{time.strftime('%Y%m%d-%H%M%S')}"
+            os.replace(workspace, kept)
+            print(colored(f"[{identifier}] previous {previous['status']} attempt moved to {kept}", "yellow"))
+        async with semaphore:
+            print(colored(f"[{identifier}] started", "yellow"))
+            os.makedirs(workspace, exist_ok=True)
+            for path in shared_files:
+                if os.path.isfile(path):
+                    shutil.copy2(path, os.path.join(workspace, os.path.basename(path)))
+            try:
+                if job_runner is not None:
+                    result = await job_runner(identifier, policy, workspace, job_timeout)
+                else:
+                    result = await run_job(identifier, policy, workspace, script, job_timeout, rate_share=1.0 / max_workers)
+            except Exception as e:
+                result = {"id": identifier, "status": "error", "error": f"could not run the job: {e}", "workspace": workspace}
+        async with write_lock:
+            with open(results_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(result) + "\n")
+        color = "green" if result.get("status") == "success" else "red"
+        print(colored(f"[{identifier}] {result.get('status')} in {result.get('duration', 0):.0f}s", color))
+        return result
+
+    started = time.time()
+    results = await asyncio.gather(*(run_one(identifier, policy) for identifier, policy in jobs))
+    counts = {}
+    for result in results:
+        counts[result.get("status")] = counts.get(result.get("status"), 0) + 1
+    print(colored(f"Batch finished in {time.time() - started:.0f}s: " + ", ".join(f"{count} {status}" for status, count in sorted(counts.items(), key=str)), "cyan"))
+    return results
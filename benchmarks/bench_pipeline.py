@@ -0,0 +1,157 @@
+"""
+End-to-end benchmark of the orchestrator against the offline fake Anthropic backend.
+
+Times create_plan (planning and file generation), the run and fix loop of create_application on
+an injected error until the application runs, and one feedback round for synthetic plans of 10, 50
+and 200 files. The fixed pauses of the orchestrator (FIX_SEND_DELAY, WRITE_SETTLE_DELAY and
+READ_BACK_DELAY) are set to 0, so the timings show the work of the loop rather than its waiting. Each size runs in a fresh process and a temporary working
+directory, so module state and files never leak between sizes. No network or API key is needed.
+
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --files 10 50 --latency 0.2 --tokens-per-second 80 --rate-limit 0.05
+    python benchmarks/bench_pipeline.py --output bench.json --baseline previous.json --max-regression 0.25
+
+With --baseline the script exits with status 1 when a phase got slower than the baseline by more
+than --max-regression, so it can gate CI.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import importlib
+import contextlib
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT_MODULE = "agent_application_makercopysystemupdate"
+DEFAULT_SIZES = (10, 50, 200)
+PHASES = ("plan", "fix", "feedback")
+FIXED_DELAYS = ("FIX_SEND_DELAY", "WRITE_SETTLE_DELAY", "READ_BACK_DELAY")
+RESULT_PREFIX = "BENCHMARK_RESULT "
+
+
+async def run_phases(module, file_count):
+    timings = {}
+    started = time.perf_counter()
+    await module.create_plan("create")
+    timings["plan"] = time.perf_counter() - started
+
+    # main calls value_000, so the run fails with a NameError until the loop has fixed the module
+    broken_module = os.path.join(module.current_workspace().dev_folder, "pkg", "mod_000.py")
+    with open(broken_module, "r", encoding="utf-8") as f:
+        source = f.read()
+    with open(broken_module, "w", encoding="utf-8") as f:
+        f.write(source.replace("return 1", "return undefined + 1"))
+    started = time.perf_counter()
+    timings["fix_error"] = await module.create_application("fix")
+    timings["fix"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await module.get_application_update("Print a label in front of the result.")
+    timings["feedback"] = time.perf_counter() - started
+    return timings
+
+
+def run_child(args):
+    """Runs every phase for one plan size in this process and prints the result as one JSON line."""
+    workdir = tempfile.mkdtemp(prefix=f"bench_{args.child}_")
+    os.chdir(workdir)
+    os.environ.update({
+        "FAKE_ANTHROPIC": "synthetic",
+        "FAKE_ANTHROPIC_FILES": str(args.child),
+        "FAKE_ANTHROPIC_LATENCY": str(args.latency),
+        "FAKE_ANTHROPIC_RATE_LIMIT": str(args.rate_limit),
+    })
+    if args.tokens_per_second:
+        os.environ["FAKE_ANTHROPIC_TOKENS_PER_SECOND"] = str(args.tokens_per_second)
+    sys.path.insert(0, REPO_ROOT)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        module = importlib.import_module(SCRIPT_MODULE)
+        module.PRINT_RESPONSE = False
+        for name in FIXED_DELAYS:
+            setattr(module, name, 0)
+        ws = module.current_workspace()
+        ws.headless_policy = module.HeadlessPolicy("A synthetic benchmark application", planning_iterations=2, max_fix_attempts=2, run_timeout=30)
+        ws.max_attempts = ws.headless_policy.max_fix_attempts
+        ws.response_cache.enabled = False
+        ws.dependency_environment.use_venv = False
+        if not args.real_limits:
+            # measure the pipeline, not the quota; --real-limits keeps the production limits
+            ws.rate_limiter = module.RateLimiter(10 ** 6, 10 ** 9, 10 ** 9, max_concurrency=module.MAX_CONCURRENT_REQUESTS, period=module.TIME_WINDOW)
+        started = time.perf_counter()
+        timings = asyncio.run(run_phases(module, args.child))
+        total = time.perf_counter() - started
+    result = {"files": args.child, "total": total, **timings, "requests": ws.request_counter,
+              "fake": module.client.stats.to_dict(), "prompt_cache": ws.prompt_cache_stats.to_dict(), "workdir": workdir}
+    print(RESULT_PREFIX + json.dumps(result))
+
+
+def run_size(file_count, args):
+    command = [sys.executable, os.path.abspath(__file__), "--child", str(file_count), "--latency", str(args.latency),
+               "--tokens-per-second", str(args.tokens_per_second or 0), "--rate-limit", str(args.rate_limit)]
+    if args.real_limits:
+        command.append("--real-limits")
+    process = subprocess.run(command, capture_output=True, text=True, stdin=subprocess.DEVNULL, timeout=args.timeout)
+    for line in reversed(process.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError(f"benchmark for {file_count} files failed:\n{process.stderr[-4000:]}")
+
+
+def compare(results, baseline, max_regression):
+    """Returns the phases that got slower than the baseline by more than max_regression."""
+    previous = {result["files"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(result["files"])
+        if before is None:
+            continue
+        for phase in PHASES + ("total",):
+            if before.get(phase) and result[phase] > before[phase] * (1 + max_regression):
+                regressions.append(f"{result['files']} files, {phase}: {before[phase]:.2f}s -> {result[phase]:.2f}s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--files", type=int, nargs="+", default=list(DEFAULT_SIZES), help="plan sizes to benchmark")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before the first token of each response")
+    parser.add_argument("--tokens-per-second", type=float, default=0, help="output token rate, 0 for instant")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="share of requests answered with a 429")
+    parser.add_argument("--real-limits", action="store_true", help="keep the production request and token limits")
+    parser.add_argument("--timeout", type=float, default=1800, help="seconds allowed per plan size")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="allowed slowdown against the baseline")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args)
+        return
+
+    results = []
+    print(f"{'files':>6} {'plan':>8} {'fix':>8} {'feedback':>9} {'total':>8} {'requests':>9} {'429s':>5}")
+    for file_count in args.files:
+        result = run_size(file_count, args)
+        results.append(result)
+        print(f"{file_count:>6} {result['plan']:>7.2f}s {result['fix']:>7.2f}s {result['feedback']:>8.2f}s "
+              f"{result['total']:>7.2f}s {result['requests']:>9} {result['fake']['rate_limited']:>5}")
+        if result["fix_error"]:
+            print(f"       the fix loop gave up on: {result['fix_error'].strip().splitlines()[-1]}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
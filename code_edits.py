@@ -0,0 +1,216 @@
+import re
+import difflib
+
+EDIT_BLOCK = re.compile(r'<edit name="(.*?)">(.*?)</edit>', re.DOTALL)
+SEARCH_REPLACE = re.compile(r'^<{5,} ?SEARCH[^\n]*\n(.*?)^={5,}[^\n]*\n(.*?)^>{5,} ?REPLACE[^\n]*$', re.DOTALL | re.MULTILINE)
+HUNK_HEADER = re.compile(r'^@@ -(\d+)(?:,\d+)? \+\d+(?:,\d+)? @@')
+FUZZY_THRESHOLD = 0.9  # minimum similarity of a block matched by fuzzy_find
+FUZZY_MIN_LINES = 3  # shorter blocks must match at least up to indentation
+
+
+class Hunk:
+    """One edit: replace `old` lines by `new` lines, preferably near line `hint` (0-based)."""
+
+    __slots__ = ("old", "new", "hint")
+
+    def __init__(self, old, new, hint=None):
+        self.old = old
+        self.new = new
+        self.hint = hint
+
+    def __repr__(self):
+        return f"Hunk(-{len(self.old)} +{len(self.new)} @ {self.hint})"
+
+    def render(self):
+        """Returns the hunk as a search/replace block, e.g. to show it to the model again."""
+        return "<<<<<<< SEARCH\n" + "".join(line + "\n" for line in self.old) + "=======\n" + "".join(line + "\n" for line in self.new) + ">>>>>>> REPLACE"
+
+
+def parse_unified_diff(diff):
+    """
+    Parses a unified diff of a single file into hunks.
+
+    Hunks without line numbers (a bare `@@`) are accepted and located by their context alone.
+
+    Args:
+        diff (str): The diff text, with or without the ---/+++ header.
+
+    Returns:
+        List[Hunk]: The hunks, in file order.
+    """
+    hunks = []
+    old, new, hint = [], [], None
+    in_hunk = False
+
+    def close():
+        if in_hunk and (old or new):
+            hunks.append(Hunk(old, new, hint))
+
+    for line in diff.splitlines():
+        if line.startswith('---') or line.startswith('+++'):
+            continue
+        if line.startswith('@@'):
+            close()
+            match = HUNK_HEADER.match(line)
+            old, new, hint = [], [], int(match.group(1)) - 1 if match else None
+            in_hunk = True
+        elif not in_hunk:
+            continue
+        elif line.startswith('+'):
+            new.append(line[1:])
+        elif line.startswith('-'):
+            old.append(line[1:])
+        elif line.startswith('\\'):
+            continue  # "\ No newline at end of file"
+        else:
+            # context line; models often drop the leading space of empty lines
+            old.append(line[1:] if line.startswith(' ') else line)
+            new.append(line[1:] if line.startswith(' ') else line)
+    close()
+    return hunks
+
+
+def parse_search_replace(text):
+    """
+    Parses SEARCH/REPLACE blocks into hunks.
+
+    Args:
+        text (str): Text containing one or more `<<<<<<< SEARCH ... ======= ... >>>>>>> REPLACE` blocks.
+
+    Returns:
+        List[Hunk]: The hunks, in order.
+    """
+    return [Hunk(search.splitlines(), replace.splitlines()) for search, replace in SEARCH_REPLACE.findall(text)]
+
+
+def parse_edits(response_text):
+    """
+    Extracts the edits of a model response.
+
+    Each `<edit name="path">` block holds either SEARCH/REPLACE blocks or a unified diff.
+
+    Args:
+        response_text (str): The model response.
+
+    Returns:
+        Dict[str, List[Hunk]]: The hunks per file name, in response order.
+    """
+    edits = {}
+    for name, body in EDIT_BLOCK.findall(response_text):
+        hunks = parse_search_replace(body) if SEARCH_REPLACE.search(body) else parse_unified_diff(body)
+        edits.setdefault(name.strip(), []).extend(hunks)
+    return edits
+
+
+def _indent(line):
+    return line[:len(line) - len(line.lstrip())]
+
+
+def _candidates(lines, block, key):
+    keyed_block = [key(line) for line in block]
+    keyed_lines = [key(line) for line in lines]
+    size = len(block)
+    return [i for i in range(len(lines) - size + 1) if keyed_lines[i:i + size] == keyed_block]
+
+
+def _closest(candidates, hint):
+    if hint is None:
+        return candidates[0]
+    return min(candidates, key=lambda i: abs(i - hint))
+
+
+def fuzzy_find(lines, block, hint=None):
+    """
+    Locates a block of lines in a file, tolerating the usual drift of model output.
+
+    Tries an exact match, then ignoring trailing whitespace, then ignoring indentation, and finally,
+    for blocks of FUZZY_MIN_LINES or more, a difflib similarity of at least FUZZY_THRESHOLD. Among
+    several matches the one closest to `hint` wins.
+
+    Args:
+        lines (List[str]): The file lines.
+        block (List[str]): The lines to find.
+        hint (int, optional): The expected 0-based start line.
+
+    Returns:
+        Tuple[int, str] or None: The start index and the kind of match ("exact", "rstrip",
+        "indent" or "fuzzy"), or None if the block was not found.
+    """
+    for kind, key in (("exact", lambda s: s), ("rstrip", str.rstrip), ("indent", str.strip)):
+        candidates = _candidates(lines, block, key)
+        if candidates:
+            return _closest(candidates, hint), kind
+    size = len(block)
+    if size < FUZZY_MIN_LINES or size > len(lines):
+        return None
+    target = "\n".join(line.strip() for line in block)
+    stripped = [line.strip() for line in lines]
+    best, best_ratio = None, FUZZY_THRESHOLD
+    for i in range(len(lines) - size + 1):
+        matcher = difflib.SequenceMatcher(None, target, "\n".join(stripped[i:i + size]), autojunk=False)
+        if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+            continue
+        ratio = matcher.ratio()
+        if ratio > best_ratio or (ratio == best_ratio and best is not None and hint is not None and abs(i - hint) < abs(best - hint)):
+            best, best_ratio = i, ratio
+    return (best, "fuzzy") if best is not None else None
+
+
+def _reindent(found, old, new):
+    """Shifts the replacement lines by the indentation difference between the found and expected block."""
+    found_first = next((line for line in found if line.strip()), None)
+    old_first = next((line for line in old if line.strip()), None)
+    if found_first is None or old_first is None:
+        return new
+    found_indent, old_indent = _indent(found_first), _indent(old_first)
+    if found_indent == old_indent:
+        return new
+    result = []
+    for line in new:
+        if not line.strip():
+            result.append(line)
+        elif line.startswith(old_indent):
+            result.append(found_indent + line[len(old_indent):])
+        else:
+            result.append(line)
+    return result
+
+
+def apply_hunks(content, hunks, exact=False):
+    """
+    Applies hunks to a file, each located with fuzzy_find in the already patched text.
+
+    Args:
+        content (str): The current file contents ("" for a new file).
+        hunks (List[Hunk]): The hunks to apply, in order.
+        exact (bool, optional): Only apply hunks whose old lines match exactly, e.g. for a patch
+            replayed without the model.
+
+    Returns:
+        Tuple[str, List[Hunk]]: The patched contents and the hunks that could not be applied.
+    """
+    lines = content.splitlines()
+    trailing_newline = content.endswith("\n") or not content
+    failed = []
+    offset = 0
+    for hunk in hunks:
+        if not hunk.old:
+            # pure insertion: at the hinted line, or appended for a new file
+            position = len(lines) if hunk.hint is None else min(max(hunk.hint + offset, 0), len(lines))
+            lines[position:position] = hunk.new
+            offset += len(hunk.new)
+            continue
+        hint = None if hunk.hint is None else hunk.hint + offset
+        found = fuzzy_find(lines, hunk.old, hint)
+        if found is None or (exact and found[1] != "exact"):
+            failed.append(hunk)
+            continue
+        start, kind = found
+        end = start + len(hunk.old)
+        new = _reindent(lines[start:end], hunk.old, hunk.new) if kind in ("indent", "fuzzy") else hunk.new
+        lines[start:end] = new
+        offset += len(new) - len(hunk.old)
+    result = "\n".join(lines)
+    if trailing_newline and lines:
+        result += "\n"
+    return result, failed
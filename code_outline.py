@@ -0,0 +1,67 @@
+import ast
+
+
+def _first_doc_line(node):
+    docstring = ast.get_docstring(node)
+    if docstring:
+        return docstring.strip().splitlines()[0]
+    return ""
+
+
+def _function_signature(node, indent=""):
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns is not None else ""
+    decorators = "".join(f"{indent}@{ast.unparse(d)}\n" for d in node.decorator_list)
+    line = f"{decorators}{indent}{prefix} {node.name}({ast.unparse(node.args)}){returns}: ..."
+    doc = _first_doc_line(node)
+    if doc:
+        line += f"  # {doc}"
+    return line
+
+
+def extract_outline(source, include_docstrings=True):
+    """
+    Reduces python source to its public interface: imports, module constants, classes,
+    function and method signatures and the first line of each docstring.
+
+    Args:
+        source (str): The python source code.
+        include_docstrings (bool, optional): Keep the module docstring. Defaults to True.
+
+    Returns:
+        str or None: The outline, or None if the source does not parse.
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+    lines = []
+    module_doc = _first_doc_line(tree) if include_docstrings else ""
+    if module_doc:
+        lines.append(f'"""{module_doc}"""')
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            lines.append(ast.unparse(node))
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            names = [t.id for t in targets if isinstance(t, ast.Name)]
+            if names and all(name.isupper() for name in names):
+                lines.append(ast.unparse(node).splitlines()[0][:120])
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            lines.append(_function_signature(node))
+        elif isinstance(node, ast.ClassDef):
+            bases = ", ".join(ast.unparse(b) for b in node.bases)
+            header = f"class {node.name}({bases}):" if bases else f"class {node.name}:"
+            doc = _first_doc_line(node)
+            lines.append(f"{header}  # {doc}" if doc else header)
+            members = 0
+            for child in node.body:
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    lines.append(_function_signature(child, indent="    "))
+                    members += 1
+                elif isinstance(child, (ast.Assign, ast.AnnAssign)):
+                    lines.append("    " + ast.unparse(child).splitlines()[0][:120])
+                    members += 1
+            if not members:
+                lines.append("    ...")
+    return "\n".join(lines)
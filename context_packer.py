@@ -0,0 +1,198 @@
+import os
+import re
+import ast
+from collections import defaultdict
+
+from code_outline import extract_outline
+from rate_limiter import CHARS_PER_TOKEN
+
+FRAME_PATTERN = re.compile(r'File "([^"]+)", line (\d+)')
+PATH_PATTERN = re.compile(r'[\w./\\-]+\.\w+')
+# relevance scores used by rank_files
+TRACEBACK_SCORE = 10.0
+MENTION_SCORE = 5.0
+PINNED_SCORE = 8.0
+NEIGHBOUR_FACTOR = 0.3
+
+
+def estimate_tokens(text):
+    """Roughly estimates the number of tokens of a text."""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def module_name(relative_path):
+    """Returns the dotted module name of a python file relative to the project root."""
+    stem, _ = os.path.splitext(relative_path.replace("\\", "/"))
+    parts = stem.split("/")
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+def build_import_graph(files):
+    """
+    Builds the graph of imports between project python files.
+
+    Args:
+        files (Dict[str, str]): {path relative to the project root: source}.
+
+    Returns:
+        Dict[str, Set[str]]: Maps each python file to the project files it imports.
+    """
+    modules = {module_name(path): path for path in files if path.endswith(".py")}
+    graph = {}
+    for path, source in files.items():
+        if not path.endswith(".py"):
+            continue
+        try:
+            tree = ast.parse(source)
+        except (SyntaxError, ValueError):
+            graph[path] = set()
+            continue
+        package = module_name(path).split(".")
+        if not path.endswith("__init__.py"):
+            package = package[:-1]
+        imported = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                imported.update(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                if node.level:
+                    base = package[:len(package) - node.level + 1] if node.level > 1 else package
+                    base_name = ".".join(base + ([node.module] if node.module else []))
+                else:
+                    base_name = node.module or ""
+                imported.add(base_name)
+                # `from package import module` imports a submodule
+                imported.update(f"{base_name}.{alias.name}" if base_name else alias.name for alias in node.names)
+        deps = set()
+        for name in imported:
+            # an import of a.b.c also runs a and a.b
+            parts = name.split(".")
+            for i in range(len(parts), 0, -1):
+                target = modules.get(".".join(parts[:i]))
+                if target is not None:
+                    deps.add(target)
+                    break
+        deps.discard(path)
+        graph[path] = deps
+    return graph
+
+
+def referenced_files(text, known_files):
+    """
+    Finds the project files referenced in a traceback or free text.
+
+    Args:
+        text (str): Error output or user feedback.
+        known_files (Iterable[str]): Project paths relative to the project root.
+
+    Returns:
+        Dict[str, float]: {path: weight}; frames later in a traceback (closer to the error) weigh more.
+    """
+    known = {path.replace("\\", "/"): path for path in known_files}
+    by_basename = defaultdict(list)
+    for normalized, path in known.items():
+        by_basename[os.path.basename(normalized)].append(path)
+
+    def resolve(candidate):
+        candidate = candidate.replace("\\", "/")
+        for normalized, path in known.items():
+            if candidate == normalized or candidate.endswith("/" + normalized):
+                return path
+        matches = by_basename.get(os.path.basename(candidate), [])
+        return matches[0] if len(matches) == 1 else None
+
+    weights = {}
+    frames = FRAME_PATTERN.findall(text or "")
+    for position, (frame_file, _) in enumerate(frames):
+        path = resolve(frame_file)
+        if path is not None:
+            weights[path] = max(weights.get(path, 0), TRACEBACK_SCORE * (1 + position / max(1, len(frames))))
+    for match in PATH_PATTERN.finditer(text or ""):
+        path = resolve(match.group(0))
+        if path is not None:
+            weights[path] = max(weights.get(path, 0), MENTION_SCORE)
+    return weights
+
+
+def rank_files(files, text="", pinned=()):
+    """
+    Orders project files by relevance to an error or feedback text.
+
+    Files named in traceback frames rank highest, then pinned files (e.g. selected by the model or
+    the user) and files mentioned in the text; files importing or imported by those inherit part of
+    their score through the import graph.
+
+    Args:
+        files (Dict[str, str]): {path: contents}.
+        text (str, optional): Traceback, error message or feedback.
+        pinned (Iterable[str], optional): Paths that should be considered relevant.
+
+    Returns:
+        List[Tuple[str, float]]: (path, score) pairs, most relevant first.
+    """
+    scores = defaultdict(float, referenced_files(text, files))
+    for path in pinned:
+        path = path.replace("\\", "/")
+        if path in files:
+            scores[path] = max(scores[path], PINNED_SCORE)
+    graph = build_import_graph(files)
+    importers = defaultdict(set)
+    for path, deps in graph.items():
+        for dep in deps:
+            importers[dep].add(path)
+    seeds = dict(scores)
+    for path, score in seeds.items():
+        for neighbour in graph.get(path, set()) | importers.get(path, set()):
+            scores[neighbour] = max(scores[neighbour], score * NEIGHBOUR_FACTOR)
+    # keep the walk order of the project for ties
+    order = {path: i for i, path in enumerate(files)}
+    return sorted(((path, scores[path]) for path in files), key=lambda item: (-item[1], order[item[0]]))
+
+
+def pack_context(files, text="", budget_tokens=60000, pinned=(), relevant_only=False):
+    """
+    Packs project files into a prompt section that fits a token budget.
+
+    Files are taken in rank order. Each one is included verbatim if it still fits, otherwise it is
+    reduced to its signatures and docstrings (python files) and, failing that, listed by name only.
+
+    Args:
+        files (Dict[str, str]): {path: contents}.
+        text (str, optional): Traceback, error message or feedback used for ranking.
+        budget_tokens (int, optional): Token budget of the packed section. Defaults to 60000.
+        pinned (Iterable[str], optional): Paths that should be considered relevant.
+        relevant_only (bool, optional): Only include files with a relevance score verbatim; unrelated
+            files are at most summarized. Defaults to False.
+
+    Returns:
+        Tuple[str, List[str], List[str]]: The packed text, the paths included verbatim and the paths summarized.
+    """
+    sections = []
+    verbatim = []
+    summarized = []
+    omitted = []
+    used = 0
+    for path, score in rank_files(files, text, pinned):
+        content = files[path]
+        section = f"File: {path}\n\n{content}"
+        cost = estimate_tokens(section)
+        if (score > 0 or not relevant_only) and used + cost <= budget_tokens:
+            sections.append(section)
+            verbatim.append(path)
+            used += cost
+            continue
+        outline = extract_outline(content) if path.endswith(".py") else None
+        if outline is not None:
+            section = f"File: {path} (signatures only, full content omitted)\n\n{outline}"
+            cost = estimate_tokens(section)
+            if used + cost <= budget_tokens:
+                sections.append(section)
+                summarized.append(path)
+                used += cost
+                continue
+        omitted.append(path)
+    if omitted:
+        sections.append("Other project files (content omitted): " + ", ".join(omitted))
+    return "\n\n".join(sections), verbatim, summarized
@@ -0,0 +1,155 @@
+import os
+import re
+import sys
+import json
+import asyncio
+import hashlib
+import venv
+
+from termcolor import colored
+
+STATE_FILE = "dependency_state.json"
+VENV_FOLDER = "venv"
+
+
+def normalize_requirements(requirements_file):
+    """
+    Reads a requirements file into a sorted list of normalized requirement lines.
+
+    Comments, blank lines and pip options are dropped, and project names are lowercased with runs
+    of "-", "_" and "." collapsed to "-", so formatting changes do not change the fingerprint.
+
+    Args:
+        requirements_file (str): Path to requirements.txt.
+
+    Returns:
+        List[str]: The normalized requirements.
+    """
+    if not os.path.exists(requirements_file):
+        return []
+    requirements = set()
+    with open(requirements_file, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line or line.startswith("-"):
+                continue
+            match = re.match(r"^([A-Za-z0-9][A-Za-z0-9._-]*)(.*)$", line)
+            if match:
+                name = re.sub(r"[-_.]+", "-", match.group(1)).lower()
+                line = name + match.group(2).replace(" ", "")
+            requirements.add(line)
+    return sorted(requirements)
+
+
+def dependency_fingerprint(requirements, interpreter):
+    """
+    Hashes a normalized requirement list together with the interpreter it is installed for.
+
+    Args:
+        requirements (List[str]): Normalized requirements.
+        interpreter (str): The base interpreter path.
+
+    Returns:
+        str: A sha256 hex digest.
+    """
+    payload = json.dumps({"requirements": requirements, "interpreter": interpreter, "version": sys.version}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def venv_python(venv_folder):
+    """Returns the python executable inside a virtual environment folder."""
+    if os.name == "nt":
+        return os.path.join(venv_folder, "Scripts", "python.exe")
+    return os.path.join(venv_folder, "bin", "python")
+
+
+class DependencyEnvironment:
+    """
+    Keeps the dependencies of a generated project installed with as little pip work as possible.
+
+    The installed requirement set and its fingerprint are stored in the project's .system folder.
+    When the fingerprint of requirements.txt matches, nothing is run at all; otherwise only the
+    requirements that were not installed before are passed to pip. With `use_venv` the project
+    gets its own reusable virtual environment, created once in .system/venv.
+    """
+
+    def __init__(self, project_folder, system_folder, use_venv=True, pip_timeout=300):
+        self.project_folder = project_folder
+        self.system_folder = system_folder
+        self.use_venv = use_venv
+        self.pip_timeout = pip_timeout
+        self.state_path = os.path.join(system_folder, STATE_FILE)
+        self.venv_folder = os.path.join(system_folder, VENV_FOLDER)
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state):
+        os.makedirs(self.system_folder, exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=1)
+        os.replace(tmp_path, self.state_path)
+
+    @property
+    def python(self):
+        """The interpreter the project runs with."""
+        if self.use_venv and os.path.exists(venv_python(self.venv_folder)):
+            return os.path.abspath(venv_python(self.venv_folder))
+        return sys.executable
+
+    async def _create_venv(self):
+        print(colored(f"Creating project virtual environment in {self.venv_folder} ...", "yellow"))
+        builder = venv.EnvBuilder(with_pip=True, clear=True)
+        await asyncio.to_thread(builder.create, self.venv_folder)
+
+    async def _pip_install(self, python, requirements):
+        process = await asyncio.create_subprocess_exec(python, "-m", "pip", "install", *requirements)
+        try:
+            return_code = await asyncio.wait_for(process.wait(), timeout=self.pip_timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise TimeoutError(f"pip install timed out after {self.pip_timeout} seconds")
+        if return_code != 0:
+            raise RuntimeError(f"pip install exited with return code {return_code}")
+
+    async def ensure(self):
+        """
+        Installs whatever requirements changed since the last call.
+
+        Returns:
+            str: The python executable to run the project with.
+
+        Raises:
+            RuntimeError, TimeoutError: If pip fails.
+        """
+        requirements = normalize_requirements(os.path.join(self.project_folder, "requirements.txt"))
+        interpreter = os.path.realpath(sys.executable)
+        fingerprint = dependency_fingerprint(requirements, interpreter)
+        state = self._load_state()
+        venv_ready = not self.use_venv or os.path.exists(venv_python(self.venv_folder))
+        if state.get("fingerprint") == fingerprint and venv_ready:
+            print(colored("Requirements unchanged, skipping pip install.", "green"))
+            return self.python
+
+        installed = set(state.get("requirements", []))
+        if self.use_venv and (not venv_ready or state.get("interpreter") != interpreter):
+            try:
+                await self._create_venv()
+                installed = set()
+            except Exception as e:
+                print(colored(f"Unable to create virtual environment, using {sys.executable}: {e}", "red"))
+                self.use_venv = False
+
+        delta = [req for req in requirements if req not in installed]
+        if delta:
+            print(colored(f"Installing requirements: {', '.join(delta)}", "yellow"))
+            await self._pip_install(self.python, delta)
+            print(colored("Requirements installed.", "yellow"))
+        self._save_state({"fingerprint": fingerprint, "interpreter": interpreter, "requirements": sorted(installed | set(requirements))})
+        return self.python
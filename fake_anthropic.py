@@ -0,0 +1,309 @@
+import os
+import re
+import json
+import random
+import asyncio
+import hashlib
+
+import httpx
+from anthropic import RateLimitError
+from anthropic.types import Message
+
+from rate_limiter import CHARS_PER_TOKEN
+from response_cache import ResponseCache
+
+STREAM_CHUNK_CHARS = 64  # characters per streamed text chunk
+DEFAULT_FILE_COUNT = 10
+
+
+def _text_of(content):
+    if isinstance(content, str):
+        return content
+    return "\n".join(block.get("text", "") for block in content or [] if isinstance(block, dict))
+
+
+def request_text(request):
+    """Returns the system prompt and all messages of a request as one string."""
+    return "\n".join([_text_of(request.get("system"))] + [_text_of(message.get("content")) for message in request.get("messages") or []])
+
+
+def last_user_message(request):
+    for message in reversed(request.get("messages") or []):
+        if message.get("role") == "user":
+            return _text_of(message.get("content"))
+    return ""
+
+
+class ScriptedResponder:
+    """
+    Answers requests from a script: a list of (pattern, text) rules matched against the request
+    text in order, or a plain list of texts returned one after another.
+    """
+
+    def __init__(self, script, default="OK"):
+        self.rules = [rule if isinstance(rule, tuple) else (None, rule) for rule in script]
+        self.default = default
+        self._next = 0
+
+    async def __call__(self, request):
+        text = request_text(request)
+        for pattern, answer in self.rules:
+            if pattern is not None and re.search(pattern, text, re.DOTALL):
+                return answer
+        sequential = [answer for pattern, answer in self.rules if pattern is None]
+        if self._next < len(sequential):
+            self._next += 1
+            return sequential[self._next - 1]
+        return self.default
+
+
+class RecordedResponder:
+    """Replays the responses recorded in a response cache folder, falling back to another responder."""
+
+    def __init__(self, folder, fallback=None):
+        self.cache = ResponseCache(folder, ttl=float("inf"))
+        self.fallback = fallback
+
+    async def __call__(self, request):
+        recorded = await self.cache.get(request)
+        if recorded is not None:
+            return "".join(block.get("text", "") for block in recorded.get("content", []))
+        if self.fallback is None:
+            raise KeyError("no recorded response for this request")
+        return await self.fallback(request)
+
+
+def synthetic_module(index):
+    """Returns the file name of module `index` of a synthetic plan and the modules it imports."""
+    deps = sorted({index // 2, index - 1} - {index}) if index else []
+    return f"pkg/mod_{index:03d}.py", deps
+
+
+class SyntheticResponder:
+    """
+    Answers the orchestrator's requests for a synthetic application of `file_count` modules.
+
+    The plan has main.py plus pkg/mod_NNN.py modules, each importing up to two earlier modules, so
+    file generation runs in dependency waves like a real plan. Generated files are valid python,
+    fixes rewrite the files named in the error and feedback rounds return search/replace edits.
+    """
+
+    def __init__(self, file_count=DEFAULT_FILE_COUNT):
+        self.file_count = file_count
+
+    def plan(self):
+        files = ['        <file>\n            <name>main.py</name>\n            <description>Entry point, def main() prints pkg.mod_000.value_000()\n'
+                 '            - from pkg.mod_000 import value_000</description>\n        </file>',
+                 '        <file>\n            <name>pkg/__init__.py</name>\n            <description>Package marker</description>\n        </file>']
+        for index in range(self.file_count):
+            name, deps = synthetic_module(index)
+            imports = "".join(f"\n            - from pkg.mod_{dep:03d} import value_{dep:03d}" for dep in deps)
+            files.append(f'        <file>\n            <name>{name}</name>\n            <description>Module {index} computing value_{index:03d}(){imports}</description>\n        </file>')
+        return ("<application_plan>\n    <overview>Synthetic benchmark application</overview>\n    <mechanics>Each module adds one to its dependencies</mechanics>\n"
+                "    <components>\n        - pkg\n    </components>\n    <files>\n" + "\n".join(files) + "\n    </files>\n"
+                "    <logic>\n        - main runs the module chain\n    </logic>\n</application_plan>")
+
+    def module_source(self, file_name):
+        match = re.match(r'pkg/mod_(\d+)\.py$', file_name)
+        if file_name == "main.py":
+            return ("# main.py: entry point of the synthetic application\n# IMPORTANT: do not remove main function as automated test will fail IMPORTANT: do not remove this comment\n"
+                    "from pkg.mod_000 import value_000\n\n\ndef main():\n    print(value_000())\n\n\nif __name__ == \"__main__\":\n    main()\n")
+        if not match:
+            return "# package marker\n"
+        index = int(match.group(1))
+        _, deps = synthetic_module(index)
+        imports = "".join(f"from pkg.mod_{dep:03d} import value_{dep:03d}\n" for dep in deps)
+        total = " + ".join([f"value_{dep:03d}()" for dep in deps] + ["1"])
+        return f"# pkg/mod_{index:03d}.py: synthetic module {index}\n{imports}\n\ndef value_{index:03d}():\n    return {total}\n"
+
+    async def __call__(self, request):
+        system = _text_of(request.get("system"))
+        message = last_user_message(request)
+        if system.startswith("You are a prompt rewrite"):
+            return message
+        if "<application_plan>" in message and "XML format" in message:
+            return self.plan()
+        if "final iteration" in message or "please plan a python application" in message:
+            return "The application is a chain of modules under pkg/ started from main.py."
+        match = re.match(r"Create a file named '([^']+)'", message)
+        if match:
+            return f"<code>\n{self.module_source(match.group(1))}</code>"
+        if "fix errors in python application" in system:
+            names = sorted(set(re.findall(r'(pkg/mod_\d+\.py|main\.py)', message))) or ["main.py"]
+            return "<reasoning>rewrite the failing files</reasoning>\n" + "".join(
+                f'<file name="{name}">\n{self.module_source(name)}</file>\n' for name in names)
+        if "based on user feedback" in system:
+            return ('<edit name="main.py">\n<<<<<<< SEARCH\n    print(value_000())\n=======\n    print("result", value_000())\n>>>>>>> REPLACE\n</edit>\n'
+                    + self.plan())
+        if "Apply the requested changes" in system:
+            name = re.search(r'(pkg/mod_\d+\.py|main\.py)', message)
+            name = name.group(1) if name else "main.py"
+            return f'<file name="{name}">\n{self.module_source(name)}</file>'
+        if "<relevant_files>" in message:
+            return "<relevant_files>\n<file>main.py</file>\n<file>pkg/mod_000.py</file>\n</relevant_files>"
+        if "diagnostic_report.py" in message:
+            return '<file name="diagnostic_report.py">\ndef main():\n    print("all tests passed")\n\n\nif __name__ == "__main__":\n    main()\n</file>'
+        return "OK"
+
+
+class FakeStats:
+    """Counts the requests served by a FakeAnthropic client."""
+
+    def __init__(self):
+        self.requests = 0
+        self.rate_limited = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cache_read_tokens = 0
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+class _FakeStream:
+    def __init__(self, client, request):
+        self.client = client
+        self.request = request
+        self._message = None
+        self._text = None
+
+    async def __aenter__(self):
+        self._text, self._message = await self.client._respond(self.request, stream=True)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    @property
+    async def text_stream(self):
+        # yields as the tokens "arrive" at the configured output rate
+        for start in range(0, len(self._text), STREAM_CHUNK_CHARS):
+            chunk = self._text[start:start + STREAM_CHUNK_CHARS]
+            await self.client._generate(chunk)
+            yield chunk
+
+    async def get_final_message(self):
+        return self._message
+
+
+class _FakeMessages:
+    def __init__(self, client):
+        self.client = client
+
+    async def create(self, **request):
+        text, message = await self.client._respond(request)
+        await self.client._generate(text)
+        return message
+
+    def stream(self, **request):
+        return _FakeStream(self.client, request)
+
+
+class FakeAnthropic:
+    """
+    Stand-in for AsyncAnthropic serving scripted, recorded or synthetic responses without a network.
+
+    Only the parts of the client the orchestrator uses are provided: messages.create and
+    messages.stream. Latency is modelled as `latency` seconds before the first token, input
+    processing at `input_tokens_per_second` and output at `output_tokens_per_second` (None for
+    instant). A share `rate_limit_rate` of requests, or every `rate_limit_every`th request, fails
+    with a 429 RateLimitError carrying a retry-after header. Prompt cache breakpoints are honoured:
+    a system prefix that was sent before is reported as cache_read_input_tokens.
+    """
+
+    def __init__(self, responder=None, latency=0.0, input_tokens_per_second=None, output_tokens_per_second=None,
+                 rate_limit_rate=0.0, rate_limit_every=0, retry_after=1, seed=None):
+        self.responder = responder or SyntheticResponder()
+        self.latency = latency
+        self.input_tokens_per_second = input_tokens_per_second
+        self.output_tokens_per_second = output_tokens_per_second
+        self.rate_limit_rate = rate_limit_rate
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.stats = FakeStats()
+        self.messages = _FakeMessages(self)
+        self._cached_prefixes = set()
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        """
+        Builds a fake client from FAKE_ANTHROPIC ("synthetic", "recorded:FOLDER" or a JSON script file)
+        and the optional FAKE_ANTHROPIC_FILES, _LATENCY, _TOKENS_PER_SECOND and _RATE_LIMIT settings.
+
+        Returns:
+            FakeAnthropic or None: None when FAKE_ANTHROPIC is not set.
+        """
+        spec = environ.get("FAKE_ANTHROPIC")
+        if not spec:
+            return None
+        synthetic = SyntheticResponder(int(environ.get("FAKE_ANTHROPIC_FILES", DEFAULT_FILE_COUNT)))
+        if spec.startswith("recorded:"):
+            responder = RecordedResponder(spec.split(":", 1)[1], fallback=synthetic)
+        elif spec.endswith(".json"):
+            with open(spec, "r", encoding="utf-8") as f:
+                responder = ScriptedResponder([tuple(rule) if isinstance(rule, list) else rule for rule in json.load(f)])
+        else:
+            responder = synthetic
+        tokens_per_second = environ.get("FAKE_ANTHROPIC_TOKENS_PER_SECOND")
+        return cls(responder, latency=float(environ.get("FAKE_ANTHROPIC_LATENCY", 0)),
+                   output_tokens_per_second=float(tokens_per_second) if tokens_per_second else None,
+                   rate_limit_rate=float(environ.get("FAKE_ANTHROPIC_RATE_LIMIT", 0)))
+
+    def _rate_limited(self):
+        if self.rate_limit_every and self.stats.requests % self.rate_limit_every == 0:
+            return True
+        return self.rate_limit_rate > 0 and self.random.random() < self.rate_limit_rate
+
+    def _rate_limit_error(self):
+        request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+        response = httpx.Response(429, request=request, headers={"retry-after": str(self.retry_after)})
+        body = {"type": "error", "error": {"type": "rate_limit_error", "message": "fake rate limit"}}
+        return RateLimitError("Error code: 429 - fake rate limit", response=response, body=body)
+
+    def _cache_usage(self, request, input_tokens):
+        system = request.get("system")
+        if not isinstance(system, list):
+            return 0, 0
+        cached = [i for i, block in enumerate(system) if isinstance(block, dict) and "cache_control" in block]
+        if not cached:
+            return 0, 0
+        prefix = json.dumps(system[:cached[-1] + 1], sort_keys=True)
+        tokens = min(input_tokens, len(prefix) // CHARS_PER_TOKEN)
+        key = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        if key in self._cached_prefixes:
+            return tokens, 0
+        self._cached_prefixes.add(key)
+        return 0, tokens
+
+    async def _generate(self, text):
+        if self.output_tokens_per_second:
+            await asyncio.sleep(len(text) / CHARS_PER_TOKEN / self.output_tokens_per_second)
+
+    async def _respond(self, request, stream=False):
+        self.stats.requests += 1
+        await asyncio.sleep(self.latency)
+        if self._rate_limited():
+            self.stats.rate_limited += 1
+            raise self._rate_limit_error()
+        input_tokens = max(1, len(request_text(request)) // CHARS_PER_TOKEN)
+        cache_read, cache_write = self._cache_usage(request, input_tokens)
+        if self.input_tokens_per_second:
+            await asyncio.sleep((input_tokens - cache_read) / self.input_tokens_per_second)
+        text = await self.responder(request)
+        output_tokens = max(1, len(text) // CHARS_PER_TOKEN)
+        self.stats.input_tokens += input_tokens
+        self.stats.output_tokens += output_tokens
+        self.stats.cache_read_tokens += cache_read
+        message = Message.model_validate({
+            "id": f"msg_fake_{self.stats.requests:06d}",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model", "fake"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens - cache_read - cache_write, "output_tokens": output_tokens,
+                      "cache_read_input_tokens": cache_read, "cache_creation_input_tokens": cache_write},
+        })
+        return text, message
@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import difflib
+import threading
+from contextlib import contextmanager
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+from code_edits import parse_unified_diff, apply_hunks
+
+DEFAULT_MAX_ENTRIES = 500
+
+
+def _contains(lines, block):
+    size = len(block)
+    return any(lines[i:i + size] == block for i in range(len(lines) - size + 1))
+
+
+@contextmanager
+def _file_lock(path):
+    """Holds an exclusive lock on `path` (created if needed) across processes."""
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK gives up after 10 seconds
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def make_patch(file_name, before, after):
+    """Returns a unified diff turning `before` into `after`."""
+    return "".join(difflib.unified_diff(before.splitlines(True), after.splitlines(True), f"a/{file_name}", f"b/{file_name}"))
+
+
+class FixMemo:
+    """
+    Remembers the patches that resolved an error, keyed by the error fingerprint.
+
+    The memo is one JSON file shared by every project (projects/fix_memo.json), so an error that
+    was fixed once can be fixed again by replaying the patch, or at least by showing the model how
+    it was fixed before. Only the `max_entries` most recently used fingerprints are kept. Saving
+    re-reads the file under a lock and merges into it, so concurrent --batch workers do not drop
+    each other's entries.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    def _save(self, fingerprint):
+        entry = self._load()[fingerprint]
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with _file_lock(f"{self.path}.lock"):
+            # other processes may have saved since this one loaded the memo
+            entries = self._read()
+            entries[fingerprint] = entry
+            if len(entries) > self.max_entries:
+                for stale in sorted(entries, key=lambda key: entries[key].get("used", 0))[:len(entries) - self.max_entries]:
+                    del entries[stale]
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, indent=1)
+            os.replace(tmp_path, self.path)
+        self._entries = entries
+
+    def get(self, fingerprint):
+        """Returns the memo entry of a fingerprint, or None."""
+        with self._lock:
+            return self._load().get(fingerprint)
+
+    def record(self, fingerprint, summary, changes):
+        """
+        Stores the patch that resolved an error.
+
+        Args:
+            fingerprint (str): ParsedError.fingerprint of the resolved error.
+            summary (str): ParsedError.summary(), kept for prompts and inspection.
+            changes (Dict[str, Tuple[str, str]]): {file name: (content before, content after)}.
+        """
+        patches = {name: make_patch(name, before, after) for name, (before, after) in changes.items() if before != after}
+        if not patches:
+            return
+        with self._lock:
+            entries = self._load()
+            entries[fingerprint] = {"summary": summary, "patches": patches, "created": time.time(), "used": time.time(), "replays": 0}
+            self._save(fingerprint)
+
+    def replay(self, fingerprint, files):
+        """
+        Applies a remembered fix to the current files.
+
+        Only exact context matches are applied, and hunks whose result is already in the file are
+        skipped, so replaying a patch twice does not apply it twice.
+
+        Args:
+            fingerprint (str): The error fingerprint.
+            files (Dict[str, str]): {file name: current content}; missing files count as empty.
+
+        Returns:
+            Dict[str, str] or None: {file name: patched content}, or None if there is no memo entry,
+            any hunk of the patch no longer applies or the patch is already applied.
+        """
+        entry = self.get(fingerprint)
+        if entry is None:
+            return None
+        patched = {}
+        for name, patch in entry["patches"].items():
+            content = files.get(name, "")
+            lines = content.splitlines()
+            hunks = [hunk for hunk in parse_unified_diff(patch)
+                     if not (hunk.new and _contains(lines, hunk.new) and not (hunk.old and _contains(lines, hunk.old)))]
+            content, failed = apply_hunks(content, hunks, exact=True)
+            if failed:
+                return None
+            if content != files.get(name, ""):
+                patched[name] = content
+        if not patched:
+            return None
+        with self._lock:
+            entry = self._load().setdefault(fingerprint, entry)
+            entry["used"] = time.time()
+            entry["replays"] = entry.get("replays", 0) + 1
+            self._save(fingerprint)
+        return patched
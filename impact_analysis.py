@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+from context_packer import build_import_graph
+from suite_runner import TEST_FILE_PREFIX, TEST_FILE_SUFFIX
+
+# files every test depends on: a changed requirement can break any test
+GLOBAL_DEPENDENCIES = ("requirements.txt", "pyproject.toml", "setup.py", "setup.cfg", "conftest.py")
+PASSED_OUTCOMES = ("passed", "skipped")
+
+
+def is_test_module(relative_path):
+    name = os.path.basename(relative_path)
+    return name.endswith(".py") and (name.startswith(TEST_FILE_PREFIX) or name.endswith(TEST_FILE_SUFFIX))
+
+
+def dependency_closure(graph, start):
+    """
+    Returns every project file reachable from `start` through imports, `start` included.
+
+    Args:
+        graph (Dict[str, Set[str]]): The import graph from context_packer.build_import_graph.
+        start (str): A project file.
+
+    Returns:
+        Set[str]: The transitive dependencies of the file.
+    """
+    closure = {start}
+    stack = [start]
+    while stack:
+        for dep in graph.get(stack.pop(), ()):
+            if dep not in closure:
+                closure.add(dep)
+                stack.append(dep)
+    return closure
+
+
+def closure_hash(files, closure):
+    """Returns a sha256 over the paths and contents of the files in a closure; missing files hash as absent."""
+    digest = hashlib.sha256()
+    for path in sorted(closure):
+        content = files.get(path)
+        digest.update(path.encode("utf-8") + b"\0")
+        digest.update(hashlib.sha256(content.encode("utf-8")).digest() if content is not None else b"-")
+    return digest.hexdigest()
+
+
+class ImpactSelector:
+    """
+    Picks the test modules a change can affect and skips the ones whose inputs did not change.
+
+    A test module depends on the closure of its imports, on the files listed for it in an optional
+    coverage map (which catches data files and dynamic imports the import graph misses) and on the
+    GLOBAL_DEPENDENCIES. After a run, record() stores a hash of those files for every module; a module
+    that passed on the same hash is not run again. Modules that failed are always rerun, so the fix
+    loop keeps seeing the current failures.
+
+    The coverage map is a JSON file {test module: [project files]}, e.g. written from coverage.py
+    contexts; the state is a JSON file in the project's .system folder.
+    """
+
+    def __init__(self, state_path, coverage_map_path=None):
+        self.state_path = state_path
+        self.coverage_map_path = coverage_map_path
+        self._state = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._state is None:
+            try:
+                with open(self.state_path, "r", encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError):
+                self._state = {}
+        return self._state
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._load(), f, indent=1)
+        os.replace(tmp_path, self.state_path)
+
+    def coverage_map(self):
+        """Returns {test module: set of covered project files}, empty without a coverage map."""
+        if not self.coverage_map_path:
+            return {}
+        try:
+            with open(self.coverage_map_path, "r", encoding="utf-8") as f:
+                return {module.replace("\\", "/"): {path.replace("\\", "/") for path in paths} for module, paths in json.load(f).items()}
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def dependencies(self, files, test_modules=None):
+        """
+        Returns the files each test module depends on.
+
+        Args:
+            files (Dict[str, str]): {path relative to the project root: content}.
+            test_modules (List[str], optional): Defaults to every test module in `files`.
+
+        Returns:
+            Dict[str, Set[str]]: {test module: project files it depends on}.
+        """
+        graph = build_import_graph(files)
+        coverage = self.coverage_map()
+        if test_modules is None:
+            test_modules = [path for path in files if is_test_module(path)]
+        dependencies = {}
+        for module in test_modules:
+            closure = dependency_closure(graph, module) | coverage.get(module, set())
+            closure.update(path for path in files if os.path.basename(path) in GLOBAL_DEPENDENCIES)
+            dependencies[module] = closure
+        return dependencies
+
+    def select(self, files, changed=None, full=False, test_modules=None):
+        """
+        Chooses the test modules to run.
+
+        Args:
+            files (Dict[str, str]): {path relative to the project root: content}.
+            changed (Iterable[str], optional): Files written since the last run, only used to
+                explain why a module was selected; the dependency hash decides.
+            full (bool, optional): Select every module regardless of the recorded state.
+            test_modules (List[str], optional): Defaults to every test module in `files`.
+
+        Returns:
+            Tuple[Dict[str, str], List[str], Dict[str, str]]: {selected module: reason}, the skipped
+            modules and {module: dependency hash} to pass to record() after the run.
+        """
+        dependencies = self.dependencies(files, test_modules)
+        hashes = {module: closure_hash(files, closure) for module, closure in dependencies.items()}
+        changed = {path.replace("\\", "/") for path in changed or ()}
+        with self._lock:
+            state = self._load()
+        selected, skipped = {}, []
+        for module in sorted(dependencies):
+            record = state.get(module)
+            if full:
+                selected[module] = "full run"
+            elif record is None:
+                selected[module] = "not run yet"
+            elif not record.get("passed"):
+                selected[module] = "failed last run"
+            elif record.get("hash") == hashes[module]:
+                skipped.append(module)
+            elif dependencies[module] & changed:
+                selected[module] = "depends on " + ", ".join(sorted(dependencies[module] & changed))
+            else:
+                # the hash moved because of files this round did not write, e.g. an edit by hand
+                selected[module] = "dependencies changed"
+        return selected, skipped, hashes
+
+    def record(self, suite_result, hashes):
+        """
+        Stores the outcome of each module that ran, keyed by the hash it ran against.
+
+        Args:
+            suite_result (suite_runner.SuiteResult): The results of the run.
+            hashes (Dict[str, str]): {module: dependency hash} returned by select().
+        """
+        outcomes = {}
+        for result in suite_result.results:
+            outcomes.setdefault(result.module, []).append(result.outcome)
+        self.record_outcomes({module: all(outcome in PASSED_OUTCOMES for outcome in module_outcomes)
+                              for module, module_outcomes in outcomes.items()}, hashes)
+
+    def record_outcomes(self, passed, hashes):
+        """
+        Stores whether modules passed, for modules run outside the suite runner such as diagnostic_report.py.
+
+        Args:
+            passed (Dict[str, bool]): {module: True if it passed}.
+            hashes (Dict[str, str]): {module: dependency hash} returned by select().
+        """
+        with self._lock:
+            state = self._load()
+            for module, module_passed in passed.items():
+                if module in hashes:
+                    state[module] = {"hash": hashes[module], "passed": module_passed, "time": time.time()}
+            self._save()
+
+    def clear(self):
+        """Forgets every recorded run, so the next selection runs everything."""
+        with self._lock:
+            self._state = {}
+            self._save()
@@ -0,0 +1,153 @@
+import os
+import gzip
+import shutil
+import asyncio
+
+from termcolor import colored
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024  # a log file is rotated once it grows past this
+DEFAULT_BACKUPS = 3  # rotated, gzip compressed generations kept per log file
+MAX_BATCH = 256  # queued writes handled per batch
+
+
+def rotate(path, backups=DEFAULT_BACKUPS):
+    """
+    Moves a log file to path.1.gz, shifting older generations up and dropping the oldest.
+
+    Args:
+        path (str): The log file.
+        backups (int, optional): Compressed generations to keep, 0 to just delete the file.
+    """
+    if backups <= 0:
+        os.remove(path)
+        return
+    oldest = f"{path}.{backups}.gz"
+    if os.path.exists(oldest):
+        os.remove(oldest)
+    for generation in range(backups - 1, 0, -1):
+        if os.path.exists(f"{path}.{generation}.gz"):
+            os.replace(f"{path}.{generation}.gz", f"{path}.{generation + 1}.gz")
+    with open(path, "rb") as source, gzip.open(f"{path}.1.gz", "wb") as target:
+        shutil.copyfileobj(source, target)
+    os.remove(path)
+
+
+class LogSink:
+    """
+    Writes log files from one background task fed by a queue.
+
+    `write` only enqueues, so logging a prompt costs the caller nothing. The writer task takes
+    everything queued at once, merges the writes per file (a "w" write drops the pending content
+    of its file, "a" writes are concatenated) and writes each file once per batch in a worker
+    thread. Files growing past `max_bytes` are rotated into gzip compressed generations.
+
+    `flush` is a barrier: it returns once every write queued before it is on disk. When the event
+    loop shuts down, the writer drains the queue synchronously, so no log line is lost.
+    """
+
+    def __init__(self, folder, max_bytes=DEFAULT_MAX_BYTES, backups=DEFAULT_BACKUPS):
+        self.folder = os.path.abspath(folder)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.writes = 0
+        self.batches = 0
+        self.file_writes = 0
+        self._queue = None
+        self._task = None
+        self._loop = None
+
+    def handles(self, path):
+        """Returns True if `path` is inside the log folder."""
+        return os.path.abspath(path).startswith(self.folder + os.sep)
+
+    def _ensure_writer(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            # every asyncio.run gets its own queue and writer
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run(self._queue))
+            # the loop cancels the writer when it shuts down, possibly before it ever ran
+            self._task.add_done_callback(lambda _, queue=self._queue: self._drain(queue))
+
+    def write(self, path, content, mode="w", encoding="utf-8"):
+        """
+        Queues a write of `content` to `path`.
+
+        Args:
+            path (str): The log file, its folder is created when needed.
+            content (str): The text to write.
+            mode (str, optional): "w" to replace the file, "a" to append. Defaults to "w".
+            encoding (str, optional): Defaults to "utf-8".
+        """
+        self._ensure_writer()
+        self.writes += 1
+        self._queue.put_nowait((os.path.abspath(path), content, mode, encoding))
+
+    async def flush(self):
+        """Waits until every write queued so far is on disk."""
+        if self._task is None or self._task.done() or self._loop is not asyncio.get_running_loop():
+            return
+        done = self._loop.create_future()
+        self._queue.put_nowait(done)
+        await done
+
+    async def close(self):
+        """Flushes and stops the writer task."""
+        await self.flush()
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _run(self, queue):
+        while True:
+            batch = [await queue.get()]
+            while not queue.empty() and len(batch) < MAX_BATCH:
+                batch.append(queue.get_nowait())
+            writes = [item for item in batch if not isinstance(item, asyncio.Future)]
+            if writes:
+                await asyncio.to_thread(self._write_batch, writes)
+            for item in batch:
+                if isinstance(item, asyncio.Future) and not item.done():
+                    item.set_result(None)
+
+    def _drain(self, queue):
+        """Writes what is left in the queue of a stopped writer, synchronously."""
+        remaining = []
+        while not queue.empty():
+            item = queue.get_nowait()
+            if isinstance(item, asyncio.Future):
+                if not item.done():
+                    item.set_result(None)
+            else:
+                remaining.append(item)
+        if remaining:
+            self._write_batch(remaining)
+
+    def _write_batch(self, writes):
+        pending = {}
+        for path, content, mode, encoding in writes:
+            if mode.startswith("w") or path not in pending:
+                pending[path] = [mode, encoding, [content]]
+            else:
+                pending[path][2].append(content)
+        for path, (mode, encoding, chunks) in pending.items():
+            try:
+                try:
+                    f = open(path, mode, encoding=encoding)
+                except FileNotFoundError:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    f = open(path, mode, encoding=encoding)
+                with f:
+                    f.write("".join(chunks))
+                    size = f.tell()
+                self.file_writes += 1
+                if self.max_bytes and size > self.max_bytes:
+                    rotate(path, self.backups)
+            except OSError as e:
+                print(colored(f"Could not write log file {path}: {e}", "red"))
+        self.batches += 1
@@ -0,0 +1,96 @@
+import os
+import json
+import time
+
+from snapshot_store import hash_file
+
+# Stages of a session, in order; a resumed session skips every stage it already finished
+STAGES = ("started", "described", "planned", "generated", "fixing", "feedback", "done")
+
+
+class PipelineState:
+    """
+    Checkpoint of a create/fix/feedback session, persisted in .system/pipeline_state.json.
+
+    The state records the furthest stage reached, the rewritten description and planning iterations,
+    the content hash of every generated file, the fix attempt counters and the error waiting to be
+    fixed. It is written through a temporary file after every step, so a crash at any point leaves
+    the last completed step on disk and `--resume` only redoes the unfinished work.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._state = None
+
+    def _load(self):
+        if self._state is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError):
+                self._state = {}
+        return self._state
+
+    def _save(self):
+        state = self._load()
+        state["updated"] = time.time()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def get(self, key, default=None):
+        return self._load().get(key, default)
+
+    @property
+    def stage(self):
+        return self._load().get("stage")
+
+    def reached(self, stage):
+        """Returns True if the session finished `stage` or a later one."""
+        return self.stage in STAGES and STAGES.index(self.stage) >= STAGES.index(stage)
+
+    def resumable(self):
+        """Returns True if a session was checkpointed and did not finish."""
+        return self.stage in STAGES and self.stage != "done"
+
+    def start(self, stage="started"):
+        """Begins a new session, forgetting the checkpoint of the previous one."""
+        self._state = {"stage": stage, "started": time.time(), "files": {}, "attempt": 0, "attempt_to_fix": 0, "pending_error": None}
+        self._save()
+
+    def update(self, stage=None, **values):
+        """Records the end of a step and moves the session to `stage`."""
+        state = self._load()
+        if stage is not None:
+            state["stage"] = stage
+        state.update(values)
+        self._save()
+
+    def file_done(self, file_name, file_path):
+        """Records a generated file with the hash of its content."""
+        if os.path.exists(file_path):
+            self._load().setdefault("files", {})[file_name] = hash_file(file_path)
+            self._save()
+
+    def is_file_done(self, file_name, file_path):
+        """Returns True if the file was generated and is still the content that was recorded."""
+        digest = self._load().get("files", {}).get(file_name)
+        return digest is not None and os.path.exists(file_path) and hash_file(file_path) == digest
+
+    def record_error(self, error_message, attempt, attempt_to_fix):
+        """Records an error before it is handled, with the counters it was detected with."""
+        self.update("fixing", pending_error=error_message, attempt=attempt, attempt_to_fix=attempt_to_fix)
+
+    def error_handled(self, attempt, attempt_to_fix):
+        self.update("fixing", pending_error=None, attempt=attempt, attempt_to_fix=attempt_to_fix)
+
+    def summary(self):
+        state = self._load()
+        text = f"stage '{state.get('stage')}', {len(state.get('files', {}))} files generated"
+        if state.get("attempt"):
+            text += f", {state['attempt']} fix attempts"
+        if state.get("pending_error"):
+            text += ", an error waiting to be fixed"
+        return text
@@ -0,0 +1,129 @@
+import os
+import re
+import asyncio
+from collections import defaultdict
+
+IMPORT_HINT = re.compile(r'^\s*(?:-\s*)?(?:from\s+([\w.]+)\s+import|import\s+([\w.]+(?:\s*,\s*[\w.]+)*))', re.MULTILINE)
+PATH_HINT = re.compile(r'[\w./-]+\.\w+')
+# stems too generic to be matched on a bare word in a description
+GENERIC_STEMS = {"__init__", "main", "app", "config", "utils", "models", "routes", "views", "index", "base"}
+
+
+def _normalize(path):
+    return re.sub(r'^(\./)+', '', os.path.normpath(path).replace("\\", "/"))
+
+
+def _module_names(file_name):
+    """Returns the dotted module names a plan file could be imported as, longest first."""
+    path = _normalize(file_name)
+    stem, _ = os.path.splitext(path)
+    parts = [p for p in stem.split("/") if p]
+    if parts and parts[-1] == "__init__":
+        parts = parts[:-1]
+    return [".".join(parts[i:]) for i in range(len(parts))]
+
+
+def build_dependency_graph(file_structure):
+    """
+    Builds a dependency graph of plan files from the import hints in their descriptions.
+
+    A file depends on another plan file when its description contains an import statement
+    (`from x.y import z` / `import x.y`) or a path that resolves to that file.
+
+    Args:
+        file_structure (List[Tuple[str, str]]): (file name, description) pairs from parse_file_structure_xml.
+
+    Returns:
+        Dict[str, Set[str]]: Maps each file name to the set of plan files it depends on.
+    """
+    by_module = defaultdict(set)
+    by_path = {}
+    by_basename = defaultdict(set)
+    for name, _ in file_structure:
+        normalized = _normalize(name)
+        by_path[normalized] = name
+        by_basename[os.path.basename(normalized)].add(name)
+        for module in _module_names(name):
+            by_module[module].add(name)
+
+    def resolve_module(module):
+        parts = module.split(".")
+        # try the full dotted name first, then drop leading packages
+        for i in range(len(parts)):
+            suffix = ".".join(parts[i:])
+            if i > 0 and len(parts) - i == 1 and suffix in GENERIC_STEMS:
+                break
+            candidates = by_module.get(suffix, set())
+            if len(candidates) == 1:
+                return next(iter(candidates))
+        return None
+
+    def resolve_path(path):
+        path = re.sub(r'^(\./)+', '', path)
+        if path in by_path:
+            return by_path[path]
+        basename = os.path.basename(path)
+        candidates = by_basename.get(basename, set())
+        if len(candidates) == 1 and os.path.splitext(basename)[0] not in GENERIC_STEMS:
+            return next(iter(candidates))
+        return None
+
+    graph = {}
+    for name, description in file_structure:
+        description = description or ""
+        found = set()
+        for match in IMPORT_HINT.finditer(description):
+            modules = [match.group(1)] if match.group(1) else [m.strip() for m in match.group(2).split(",")]
+            found.update(resolve_module(module) for module in modules)
+        found.update(resolve_path(match.group(0)) for match in PATH_HINT.finditer(description))
+        found.discard(None)
+        found.discard(name)
+        graph[name] = found
+    return graph
+
+
+def topological_waves(graph):
+    """
+    Groups files into waves so that every file comes after the files it depends on.
+
+    Cycles are broken by releasing the remaining files with the fewest unmet dependencies.
+
+    Args:
+        graph (Dict[str, Set[str]]): Maps each file to the files it depends on.
+
+    Returns:
+        List[List[str]]: The waves, in generation order.
+    """
+    remaining = {name: set(deps) & graph.keys() for name, deps in graph.items()}
+    order = list(graph)
+    waves = []
+    while remaining:
+        wave = [name for name in order if name in remaining and not remaining[name]]
+        if not wave:
+            fewest = min(len(deps) for deps in remaining.values())
+            wave = [name for name in order if name in remaining and len(remaining[name]) == fewest]
+        for name in wave:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(wave)
+        waves.append(wave)
+    return waves
+
+
+async def run_waves(waves, worker, max_parallel=4):
+    """
+    Runs `worker(name)` for every file, one wave after another, with at most `max_parallel` at once.
+
+    Args:
+        waves (List[List[str]]): Waves from topological_waves.
+        worker (Callable[[str], Awaitable]): The coroutine function to run per file.
+        max_parallel (int, optional): Concurrency bound within a wave. Defaults to 4.
+    """
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def bounded(name):
+        async with semaphore:
+            return await worker(name)
+
+    for wave in waves:
+        await asyncio.gather(*(bounded(name) for name in wave))
@@ -0,0 +1,226 @@
+import os
+import time
+import signal
+import asyncio
+from collections import deque
+
+DEFAULT_MAX_LINES = 2000  # lines kept per stream
+DEFAULT_MAX_LINE_LENGTH = 4000  # characters kept per line
+STREAM_LIMIT = 1024 * 1024  # bytes asyncio buffers while looking for a newline
+KILL_GRACE_PERIOD = 3  # seconds between terminate and kill
+
+
+class RingBuffer:
+    """Keeps the last `max_lines` lines of a stream, each cut to `max_line_length` characters."""
+
+    def __init__(self, max_lines=DEFAULT_MAX_LINES, max_line_length=DEFAULT_MAX_LINE_LENGTH):
+        self.lines = deque(maxlen=max_lines)
+        self.max_line_length = max_line_length
+        self.total = 0
+
+    def append(self, line):
+        if len(line) > self.max_line_length:
+            line = line[:self.max_line_length] + " ...[truncated]"
+        self.lines.append(line)
+        self.total += 1
+
+    @property
+    def dropped(self):
+        """Number of lines that fell out of the buffer."""
+        return self.total - len(self.lines)
+
+    def text(self):
+        prefix = f"...[{self.dropped} earlier lines dropped]\n" if self.dropped else ""
+        return prefix + "".join(line if line.endswith("\n") else line + "\n" for line in self.lines)
+
+
+class RunResult:
+    """Outcome of a ProcessRunner run."""
+
+    __slots__ = ("returncode", "stdout", "stderr", "combined", "stop_reason", "duration")
+
+    def __init__(self, returncode, stdout, stderr, combined, stop_reason, duration):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.combined = combined
+        self.stop_reason = stop_reason  # None, "stopped", "signal", "timeout" or "idle timeout"
+        self.duration = duration
+
+    def __repr__(self):
+        return f"RunResult(returncode={self.returncode}, stop_reason={self.stop_reason!r}, duration={self.duration:.1f}s)"
+
+
+class ProcessRunner:
+    """
+    Runs a command in its own process group and collects its output line by line.
+
+    Output is read with readline as it arrives, so nothing polls while the process is quiet, and
+    each stream keeps only its last `max_lines` lines, so a long-running server cannot grow the
+    orchestrator's memory. The run ends when the process exits, when `timeout` seconds have passed,
+    when no output arrived for `idle_timeout` seconds, or when stop() is called, e.g. from a
+    SIGINT/SIGTERM handler installed by run(). The whole process group is terminated, so children
+    spawned by the program (reloaders, worker processes) go down with it.
+    """
+
+    def __init__(self, cmd, cwd=None, env=None, timeout=None, idle_timeout=None, max_lines=DEFAULT_MAX_LINES,
+                 max_line_length=DEFAULT_MAX_LINE_LENGTH, on_line=None, stdin=None):
+        """
+        Args:
+            cmd (List[str]): The command and its arguments.
+            cwd (str, optional): The working directory.
+            env (dict, optional): The environment, defaults to the current one.
+            timeout (float, optional): Wall-clock limit in seconds.
+            idle_timeout (float, optional): Limit in seconds without any output.
+            max_lines (int, optional): Lines kept per stream.
+            max_line_length (int, optional): Characters kept per line.
+            on_line (Callable[[str, str], None], optional): Called with ("stdout" or "stderr", line)
+                for every line as it arrives.
+            stdin (optional): The child's stdin, inherited by default so console programs stay
+                interactive; pass asyncio.subprocess.DEVNULL for unattended runs.
+        """
+        self.cmd = cmd
+        self.cwd = cwd
+        self.env = env
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.on_line = on_line
+        self.stdin = stdin
+        self.buffers = {"stdout": RingBuffer(max_lines, max_line_length), "stderr": RingBuffer(max_lines, max_line_length)}
+        self.combined = RingBuffer(max_lines, max_line_length)
+        self.process = None
+        self.stop_reason = None
+        self._stop_event = asyncio.Event()
+        self._last_output = time.monotonic()
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.returncode is None
+
+    def stop(self, reason="stopped"):
+        """Asks the run to end; the process group is terminated by the running wait loop."""
+        if self.stop_reason is None:
+            self.stop_reason = reason
+        self._stop_event.set()
+
+    async def _read(self, name, stream):
+        while True:
+            try:
+                data = await stream.readline()
+            except ValueError:
+                # a line longer than STREAM_LIMIT; asyncio has dropped the buffered part
+                data = b"...[line too long]\n"
+            if not data:
+                break
+            self._last_output = time.monotonic()
+            line = data.decode("utf-8", errors="replace")
+            self.buffers[name].append(line)
+            self.combined.append(f"{name} {line}")
+            if self.on_line is not None:
+                self.on_line(name, line)
+
+    def _signal_group(self, sig):
+        if not self.running:
+            return
+        try:
+            if os.name == "posix":
+                os.killpg(self.process.pid, sig)
+            elif sig == signal.SIGTERM:
+                self.process.send_signal(signal.CTRL_BREAK_EVENT)
+            else:
+                self.process.kill()
+        except (ProcessLookupError, PermissionError, OSError):
+            pass
+
+    async def _terminate(self):
+        self._signal_group(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout=KILL_GRACE_PERIOD)
+        except asyncio.TimeoutError:
+            self._signal_group(signal.SIGKILL if os.name == "posix" else signal.SIGTERM)
+            await self.process.wait()
+
+    async def start(self):
+        """Starts the process in a new process group."""
+        kwargs = {"start_new_session": True} if os.name == "posix" else {"creationflags": 0x00000200}  # CREATE_NEW_PROCESS_GROUP
+        self.process = await asyncio.create_subprocess_exec(
+            *self.cmd,
+            cwd=self.cwd,
+            env=self.env,
+            stdin=self.stdin,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=STREAM_LIMIT,
+            **kwargs,
+        )
+        self._last_output = time.monotonic()
+
+    async def wait(self):
+        """
+        Waits for the run to end, enforcing the timeouts and stop requests.
+
+        Returns:
+            RunResult: The exit code and the buffered output.
+        """
+        started = time.monotonic()
+        readers = [asyncio.create_task(self._read(name, getattr(self.process, name))) for name in ("stdout", "stderr")]
+        exit_task = asyncio.create_task(self.process.wait())
+        stop_task = asyncio.create_task(self._stop_event.wait())
+        try:
+            while not exit_task.done():
+                now = time.monotonic()
+                deadlines = []
+                if self.timeout is not None:
+                    deadlines.append(started + self.timeout - now)
+                if self.idle_timeout is not None:
+                    deadlines.append(self._last_output + self.idle_timeout - now)
+                wait_for = max(0, min(deadlines)) if deadlines else None
+                await asyncio.wait([exit_task, stop_task], timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                if exit_task.done():
+                    break
+                now = time.monotonic()
+                if stop_task.done():
+                    pass
+                elif self.timeout is not None and now - started >= self.timeout:
+                    self.stop("timeout")
+                elif self.idle_timeout is not None and now - self._last_output >= self.idle_timeout:
+                    self.stop("idle timeout")
+                else:
+                    continue
+                await self._terminate()
+                break
+            await exit_task
+            # the pipes close once every process holding them is gone
+            await asyncio.wait(readers, timeout=KILL_GRACE_PERIOD)
+        finally:
+            stop_task.cancel()
+            for reader in readers:
+                reader.cancel()
+            if self.running:
+                await self._terminate()
+        return RunResult(self.process.returncode, self.buffers["stdout"].text(), self.buffers["stderr"].text(),
+                         self.combined.text(), self.stop_reason, time.monotonic() - started)
+
+    async def run(self, handle_signals=True):
+        """
+        Starts the process and waits for it. With `handle_signals`, Ctrl+C and SIGTERM stop the
+        process group instead of the orchestrator while the run lasts (posix event loops only).
+
+        Returns:
+            RunResult: The exit code and the buffered output.
+        """
+        await self.start()
+        loop = asyncio.get_running_loop()
+        installed = []
+        if handle_signals:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.add_signal_handler(sig, self.stop, "signal")
+                    installed.append(sig)
+                except (NotImplementedError, RuntimeError, ValueError):
+                    pass
+        try:
+            return await self.wait()
+        finally:
+            for sig in installed:
+                loop.remove_signal_handler(sig)
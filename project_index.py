@@ -0,0 +1,194 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_ENCODINGS = ('utf-8', 'latin-1', 'ascii')
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024  # bytes of decoded file contents kept in memory
+
+
+class IndexEntry:
+    """Metadata of one indexed file. `content` is None until the file is read or after eviction."""
+
+    __slots__ = ("mtime_ns", "size", "sha256", "content")
+
+    def __init__(self, mtime_ns, size):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.sha256 = None
+        self.content = None
+
+
+class ProjectIndex:
+    """
+    In-memory index of the project files, keyed by path relative to the project root.
+
+    Each entry keeps the modification time, size and content hash of a file along with its decoded
+    contents. Entries are revalidated with a single stat call, so looking up selected files costs
+    O(selected) instead of a walk of the whole tree, and a full scan only reads files whose mtime or
+    size changed. Decoded contents are held under `memory_budget` bytes, least recently used first out.
+    """
+
+    def __init__(self, root, extensions, exclude_dirs=(), exclude_files=(), memory_budget=DEFAULT_MEMORY_BUDGET, encodings=DEFAULT_ENCODINGS):
+        self.root = root
+        self.extensions = tuple(extensions)
+        self.exclude_dirs = set(exclude_dirs)
+        self.exclude_files = set(exclude_files)
+        self.memory_budget = memory_budget
+        self.encodings = encodings
+        self.entries = {}
+        self._contents = OrderedDict()  # relative path -> size in bytes, in LRU order
+        self._memory_used = 0
+        self._lock = threading.RLock()
+
+    def relative_path(self, file_path):
+        """Returns the index key of a path, or None if it is outside the project root."""
+        relative = os.path.relpath(os.path.abspath(file_path), os.path.abspath(self.root))
+        if relative.startswith(".."):
+            return None
+        return relative.replace("\\", "/")
+
+    def _decode(self, data, relative_path):
+        for encoding in self.encodings:
+            try:
+                return data.decode(encoding)
+            except UnicodeDecodeError:
+                continue
+        print(f"Error: Unable to read {relative_path} with any of the attempted ENCODINGS")
+        return None
+
+    def _drop_content(self, relative_path):
+        size = self._contents.pop(relative_path, None)
+        if size is not None:
+            self._memory_used -= size
+            entry = self.entries.get(relative_path)
+            if entry is not None:
+                entry.content = None
+
+    def _remember_content(self, relative_path, entry, content):
+        self._drop_content(relative_path)
+        entry.content = content
+        size = len(content)
+        self._contents[relative_path] = size
+        self._memory_used += size
+        while self._memory_used > self.memory_budget and len(self._contents) > 1:
+            oldest = next(iter(self._contents))
+            self._drop_content(oldest)
+
+    def _load(self, relative_path, stat):
+        with open(os.path.join(self.root, relative_path), "rb") as f:
+            data = f.read()
+        entry = IndexEntry(stat.st_mtime_ns, stat.st_size)
+        entry.sha256 = hashlib.sha256(data).hexdigest()
+        self.entries[relative_path] = entry
+        content = self._decode(data, relative_path)
+        if content is not None:
+            self._remember_content(relative_path, entry, content)
+        return content
+
+    def get(self, relative_path):
+        """
+        Returns the decoded contents of one file, reading it only if it changed since it was indexed.
+
+        Args:
+            relative_path (str): Path relative to the project root.
+
+        Returns:
+            str or None: The contents, or None if the file is missing or cannot be decoded.
+        """
+        relative_path = relative_path.replace("\\", "/")
+        with self._lock:
+            try:
+                stat = os.stat(os.path.join(self.root, relative_path))
+            except (FileNotFoundError, NotADirectoryError):
+                self.invalidate(relative_path)
+                return None
+            entry = self.entries.get(relative_path)
+            if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size and entry.content is not None:
+                self._contents.move_to_end(relative_path)
+                return entry.content
+            try:
+                return self._load(relative_path, stat)
+            except OSError as e:
+                print(f"get_project_files_contents Error reading {relative_path}: {str(e)}")
+                return None
+
+    def is_indexed(self, relative_path):
+        """Returns True if the path has an indexed extension and is not inside an excluded folder."""
+        parts = relative_path.replace("\\", "/").split("/")
+        return (relative_path.endswith(self.extensions)
+                and parts[-1] not in self.exclude_files
+                and not any(part in self.exclude_dirs for part in parts[:-1]))
+
+    def get_many(self, relative_paths):
+        """
+        Returns {relative path: contents} for the given files that are indexed, exist and decode.
+
+        Args:
+            relative_paths (Iterable[str]): Paths relative to the project root.
+        """
+        result = {}
+        for relative_path in relative_paths:
+            relative_path = os.path.normpath(relative_path).replace("\\", "/")
+            if not self.is_indexed(relative_path):
+                continue
+            content = self.get(relative_path)
+            if content is not None:
+                result[relative_path] = content
+        return result
+
+    def scan(self):
+        """
+        Walks the project and brings the index up to date using mtime and size.
+
+        Returns:
+            List[str]: All indexed paths, in walk order.
+        """
+        seen = []
+        with self._lock:
+            for root, dirs, files in os.walk(self.root):
+                dirs[:] = [d for d in dirs if d not in self.exclude_dirs]
+                for filename in files:
+                    if not filename.endswith(self.extensions) or filename in self.exclude_files:
+                        continue
+                    relative_path = os.path.relpath(os.path.join(root, filename), self.root).replace("\\", "/")
+                    seen.append(relative_path)
+                    try:
+                        stat = os.stat(os.path.join(root, filename))
+                    except FileNotFoundError:
+                        continue
+                    entry = self.entries.get(relative_path)
+                    if entry is None or entry.mtime_ns != stat.st_mtime_ns or entry.size != stat.st_size:
+                        self._drop_content(relative_path)
+                        self.entries[relative_path] = IndexEntry(stat.st_mtime_ns, stat.st_size)
+            for relative_path in set(self.entries) - set(seen):
+                self.invalidate(relative_path)
+        return seen
+
+    def get_all(self):
+        """Scans the project and returns {relative path: contents} for every indexed file."""
+        return self.get_many(self.scan())
+
+    def invalidate(self, relative_path):
+        """
+        Forgets a file so the next lookup reads it again.
+
+        Args:
+            relative_path (str): Path relative to the project root.
+        """
+        relative_path = relative_path.replace("\\", "/")
+        with self._lock:
+            self._drop_content(relative_path)
+            self.entries.pop(relative_path, None)
+
+    def invalidate_path(self, file_path):
+        """
+        Forgets a file given by its filesystem path, e.g. right after it was written. Paths outside
+        the project root are ignored.
+
+        Args:
+            file_path (str): Absolute path or path relative to the working directory.
+        """
+        relative_path = self.relative_path(file_path)
+        if relative_path is not None:
+            self.invalidate(relative_path)
@@ -0,0 +1,99 @@
+PROMPT_CACHING_BETA = "prompt-caching-2024-07-31"
+MAX_CACHE_BREAKPOINTS = 4  # cache_control blocks the api accepts per request
+CACHE_WRITE_COST = 1.25  # price of cache writes relative to regular input tokens
+CACHE_READ_COST = 0.1  # price of cache reads relative to regular input tokens
+
+
+def text_block(text, cache=False):
+    """Returns a text content block, marked as a cache breakpoint when `cache` is set."""
+    block = {"type": "text", "text": text}
+    if cache:
+        block["cache_control"] = {"type": "ephemeral"}
+    return block
+
+
+def build_system(stable, instructions="", enabled=True):
+    """
+    Lays out a system prompt with the content shared by many requests first.
+
+    The api caches the prompt prefix up to each block marked with cache_control, so the stable
+    blocks (project references, the application plan) come first and in the same order for every
+    kind of request, followed by the instructions of the request. A later request with the same
+    stable blocks reads them from the cache even when its instructions differ.
+
+    Args:
+        stable (Iterable[str]): Texts that stay the same across requests, most stable first.
+        instructions (str, optional): The system message of this kind of request.
+        enabled (bool, optional): Return a plain string without breakpoints when False.
+
+    Returns:
+        list or str: System content blocks, or the joined text when caching is disabled.
+    """
+    texts = [text for text in stable if text and text.strip()]
+    if instructions and instructions.strip():
+        texts.append(instructions)
+    if not enabled:
+        return "\n\n".join(texts)
+    # the last breakpoints matter most: each one caches everything before it
+    first_cached = max(0, len(texts) - MAX_CACHE_BREAKPOINTS)
+    return [text_block(text, cache=i >= first_cached) for i, text in enumerate(texts)]
+
+
+def uses_cache_control(request):
+    """Returns True if any system or message block of a request is a cache breakpoint."""
+    blocks = list(request.get("system") or []) if isinstance(request.get("system"), list) else []
+    for message in request.get("messages") or []:
+        if isinstance(message.get("content"), list):
+            blocks.extend(message["content"])
+    return any(isinstance(block, dict) and "cache_control" in block for block in blocks)
+
+
+class CacheStats:
+    """Counts prompt cache hits and misses from the `usage` of api responses."""
+
+    def __init__(self):
+        self.requests = 0
+        self.hits = 0
+        self.misses = 0
+        self.input_tokens = 0
+        self.cache_read_tokens = 0
+        self.cache_write_tokens = 0
+
+    def record(self, usage, cacheable=True):
+        """
+        Adds the usage of one response.
+
+        Args:
+            usage: The `usage` of a response; the cache fields are absent on older api versions.
+            cacheable (bool, optional): Whether the request had cache breakpoints.
+        """
+        if usage is None:
+            return
+        read = getattr(usage, "cache_read_input_tokens", None) or 0
+        written = getattr(usage, "cache_creation_input_tokens", None) or 0
+        self.requests += 1
+        self.input_tokens += getattr(usage, "input_tokens", None) or 0
+        self.cache_read_tokens += read
+        self.cache_write_tokens += written
+        if read:
+            self.hits += 1
+        elif cacheable:
+            self.misses += 1
+
+    @property
+    def saved_fraction(self):
+        """The share of the input token cost saved by the cache, negative while it is being filled."""
+        total = self.input_tokens + self.cache_read_tokens + self.cache_write_tokens
+        if not total:
+            return 0.0
+        cost = self.input_tokens + self.cache_read_tokens * CACHE_READ_COST + self.cache_write_tokens * CACHE_WRITE_COST
+        return 1 - cost / total
+
+    def summary(self):
+        return (f"Prompt cache: {self.hits} hits, {self.misses} misses in {self.requests} requests, "
+                f"{self.cache_read_tokens} tokens read and {self.cache_write_tokens} written, "
+                f"{self.input_tokens} uncached input tokens ({self.saved_fraction:.0%} of input cost saved)")
+
+    def to_dict(self):
+        return {"requests": self.requests, "hits": self.hits, "misses": self.misses, "input_tokens": self.input_tokens,
+                "cache_read_tokens": self.cache_read_tokens, "cache_write_tokens": self.cache_write_tokens}
@@ -0,0 +1,170 @@
+import time
+import json
+import asyncio
+
+from termcolor import colored
+
+CHARS_PER_TOKEN = 4  # rough estimate used before the api reports real usage
+
+
+def estimate_request_tokens(request):
+    """
+    Roughly estimates the number of input tokens of a model request.
+
+    Args:
+        request (dict): The keyword arguments that would be passed to client.messages.create.
+
+    Returns:
+        int: The estimated number of input tokens.
+    """
+    text = json.dumps([request.get("system", ""), request.get("messages", [])], ensure_ascii=False, default=str)
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def get_retry_after(error, default=None):
+    """
+    Reads the retry-after header (in seconds) from an api error response.
+
+    Args:
+        error (Exception): The error raised by the api client.
+        default (float, optional): Value returned when the header is missing or invalid.
+
+    Returns:
+        float or None: The number of seconds the server asked us to wait.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return default
+    try:
+        return max(0.0, float(headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return default
+
+
+class TokenBucket:
+    """A bucket holding up to `capacity` units that refills at `capacity` units per `period` seconds."""
+
+    def __init__(self, capacity, period=60):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Returns the number of seconds until `amount` units are available."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def give(self, amount):
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class Reservation:
+    """Budget held by one in-flight request, settled against the real usage once the response arrives."""
+
+    def __init__(self, limiter, input_tokens, output_tokens):
+        self.limiter = limiter
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+
+    def settle(self, usage):
+        """
+        Corrects the reserved token budget with the usage reported by the api.
+
+        Args:
+            usage: The `usage` object of a response, with input_tokens and output_tokens.
+        """
+        if usage is None:
+            return
+        actual_input = getattr(usage, "input_tokens", None)
+        actual_output = getattr(usage, "output_tokens", None)
+        if actual_input is not None:
+            self.limiter._adjust(self.limiter.input_bucket, self.input_tokens - actual_input)
+            self.input_tokens = actual_input
+        if actual_output is not None:
+            self.limiter._adjust(self.limiter.output_bucket, self.output_tokens - actual_output)
+            self.output_tokens = actual_output
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.limiter.semaphore.release()
+        return False
+
+
+class RateLimiter:
+    """
+    Process-wide limiter shared by every concurrent model request.
+
+    Requests wait in first-come first-served order until the requests-per-minute, input
+    tokens-per-minute and output tokens-per-minute budgets all have room, and at most
+    `max_concurrency` requests are in flight at once. When the server answers with a rate
+    limit error, `pause` stops every waiting request until the retry-after time has passed.
+    """
+
+    def __init__(self, requests_per_minute, input_tokens_per_minute, output_tokens_per_minute, max_concurrency=8, period=60):
+        self.request_bucket = TokenBucket(requests_per_minute, period)
+        self.input_bucket = TokenBucket(input_tokens_per_minute, period)
+        self.output_bucket = TokenBucket(output_tokens_per_minute, period)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self._queue = asyncio.Lock()  # asyncio.Lock wakes waiters in FIFO order
+        self._paused_until = 0.0
+
+    def pause(self, seconds):
+        """Holds back every request for at least `seconds` seconds."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _adjust(self, bucket, amount):
+        if amount > 0:
+            bucket.give(amount)
+        elif amount < 0:
+            bucket.take(-amount)
+
+    async def reserve(self, input_tokens, output_tokens):
+        """
+        Waits for a turn and reserves budget for one request.
+
+        Args:
+            input_tokens (int): Estimated input tokens of the request.
+            output_tokens (int): Maximum output tokens of the request (max_tokens).
+
+        Returns:
+            Reservation: Use as `async with` around the api call and call `settle` with the response usage.
+        """
+        async with self._queue:
+            await self.semaphore.acquire()
+            try:
+                while True:
+                    wait = max(
+                        self._paused_until - time.monotonic(),
+                        self.request_bucket.wait_time(1),
+                        self.input_bucket.wait_time(input_tokens),
+                        self.output_bucket.wait_time(output_tokens),
+                    )
+                    if wait <= 0:
+                        break
+                    if wait > 1:
+                        print(colored(f"Rate limit budget reached. Waiting for {wait:.2f} seconds...", "yellow"))
+                    await asyncio.sleep(wait)
+                self.request_bucket.take(1)
+                self.input_bucket.take(input_tokens)
+                self.output_bucket.take(output_tokens)
+            except BaseException:
+                self.semaphore.release()
+                raise
+        return Reservation(self, input_tokens, output_tokens)
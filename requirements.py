@@ -1,46 +1,258 @@
 import os
+import sys
 import ast
+import json
+import time
+import hashlib
+import threading
 import requests
+import importlib.metadata
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import shutil
 
+# json api of the package index, point at a local stand-in index for offline runs and tests
+PYPI_INDEX_URL = os.environ.get("PYPI_INDEX_URL", "https://pypi.org/pypi")
+PYPI_CACHE_FILE = os.environ.get("PYPI_CACHE_FILE", os.path.join(os.getcwd(), ".system", "pypi_cache.json"))
+PYPI_POSITIVE_TTL = 30 * 24 * 60 * 60  # seconds
+PYPI_NEGATIVE_TTL = 24 * 60 * 60  # seconds
+PYPI_TIMEOUT = 5  # seconds per lookup
+PYPI_MAX_WORKERS = 16
+IMPORT_CACHE_FILE = os.path.join(".system", "import_cache.json")  # relative to the scanned folder
 
-from stdlib_list import stdlib_list
+MANUAL_CONVERSIONS = {
+    'cv2': 'opencv-python',
+    'PIL': 'pillow',
+    'sklearn': 'scikit-learn',
+    'yaml': 'PyYAML',
+    'np': 'numpy',
+    'pd': 'pandas',
+    'plt': 'matplotlib',
+    'scipy': 'scipy',
+    'tf': 'tensorflow',
+    'torch': 'torch',
+    'keras': 'keras',
+    'sklearn': 'scikit-learn',
+    'skimage': 'scikit-image',
+    'bs4': 'beautifulsoup4',
+    'nx': 'networkx',
+    'sns': 'seaborn',
+    'nltk': 'nltk',
+    'gensim': 'gensim',
+    'sympy': 'sympy',
+    'pypdf2': 'PyPDF2',
+    'openpyxl': 'openpyxl',
+    'xlrd': 'xlrd',
+    'xlwt': 'xlwt',
+    'lxml': 'lxml',
+    'scrapy': 'Scrapy',
+    'flask': 'Flask',
+    'django': 'Django',
+    'sqlalchemy': 'SQLAlchemy',
+    'psycopg2': 'psycopg2-binary',
+    'pymongo': 'pymongo',
+    'redis': 'redis',
+    'pika': 'pika',
+    'celery': 'celery',
+    'pytest': 'pytest',
+    'unittest': 'unittest2',
+    'selenium': 'selenium',
+    'requests_html': 'requests-html',
+    'dash': 'dash',
+    'plotly': 'plotly',
+    'bokeh': 'bokeh',
+    'pydot': 'pydot',
+    'graphviz': 'graphviz',
+    'pyyaml': 'PyYAML',
+    'ujson': 'ujson',
+    'fastapi': 'fastapi',
+    'pydantic': 'pydantic',
+    'uvicorn': 'uvicorn',
+    'gunicorn': 'gunicorn',
+    'aiohttp': 'aiohttp',
+    'asyncio': 'asyncio',
+    'cython': 'Cython',
+    'numba': 'numba',
+    'joblib': 'joblib',
+    'dask': 'dask',
+    'xgboost': 'xgboost',
+    'lightgbm': 'lightgbm',
+    'catboost': 'catboost',
+    'spacy': 'spacy',
+    'gym': 'gym',
+    'pyqt5': 'PyQt5',
+    'pyspark': 'pyspark',
+    'boto3': 'boto3',
+    'paramiko': 'paramiko',
+    'cryptography': 'cryptography',
+    'pycrypto': 'pycrypto',
+    'bcrypt': 'bcrypt',
+    'jwt': 'PyJWT',
+    'faker': 'Faker',
+    'tqdm': 'tqdm',
+    'ipython': 'ipython',
+    'jupyter': 'jupyter',
+    'click': 'click',
+    'typer': 'typer',
+    'streamlit': 'streamlit',
+    'pynput': 'pynput',
+    'pyautogui': 'PyAutoGUI',
+    'pendulum': 'pendulum',
+    'arrow': 'arrow',
+    'loguru': 'loguru',
+}
 
-def get_imports(file_path):
+def parse_imports(source):
     """
-    Extracts all unique external import statements from a Python file.
-    
+    Extracts the top-level names of absolute imports from python source.
+
+    Args:
+    source (str): The python source code.
+
+    Returns:
+    set: A set of unique imports.
+    """
+    tree = ast.parse(source)
+    imports = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imports.add(alias.name.split('.')[0])
+        elif isinstance(node, ast.ImportFrom):
+            if node.module and node.level == 0:
+                imports.add(node.module.split('.')[0])
+    return imports
+
+def read_imports(file_path, known=None):
+    """
+    Reads a python file and extracts its imports along with the hash of its content.
+
     Args:
     file_path (str): The path to the Python file to scan.
-    
+    known (tuple, optional): (sha256, imports) of an earlier parse, returned without parsing if the content still matches.
+
     Returns:
-    set: A set of unique imports from the file.
+    tuple: (sha256 of the file, sorted list of imports), or (None, []) if the file could not be read or parsed.
     """
-    encodings = ['utf-8', 'latin-1', 'ascii']
-    for encoding in encodings:
+    try:
+        with open(file_path, 'rb') as file:
+            data = file.read()
+    except OSError as e:
+        print(f"Error processing file {file_path}: {str(e)}")
+        return None, []
+    digest = hashlib.sha256(data).hexdigest()
+    if known is not None and known[0] == digest:
+        return digest, known[1]
+    for encoding in ['utf-8', 'latin-1', 'ascii']:
         try:
-            with open(file_path, 'r', encoding=encoding) as file:
-                tree = ast.parse(file.read())
-            
-            imports = set()
-            for node in ast.walk(tree):
-                if isinstance(node, ast.Import):
-                    for alias in node.names:
-                        imports.add(alias.name.split('.')[0])
-                elif isinstance(node, ast.ImportFrom):
-                    if node.module and node.level == 0:
-                        imports.add(node.module.split('.')[0])
-            
-            return imports
+            source = data.decode(encoding)
         except UnicodeDecodeError:
             continue
+        try:
+            return digest, sorted(parse_imports(source))
         except Exception as e:
             print(f"Error processing file {file_path}: {str(e)}")
-            return set()
-    
+            return digest, []
     print(f"Warning: Unable to read file {file_path} with any of the attempted encodings.")
-    return set()
+    return digest, []
+
+def get_imports(file_path):
+    """
+    Extracts all unique external import statements from a Python file.
+    
+    Args:
+    file_path (str): The path to the Python file to scan.
+    
+    Returns:
+    set: A set of unique imports from the file.
+    """
+    return set(read_imports(file_path)[1])
+
+def python_stdlib_modules():
+    """
+    Returns the names of the standard library modules of the running interpreter.
+    """
+    names = getattr(sys, 'stdlib_module_names', None)
+    if names:
+        return set(names)
+    from stdlib_list import stdlib_list
+    return set(stdlib_list(f"{sys.version_info.major}.{sys.version_info.minor}"))
+
+class ImportCache:
+    """
+    Persistent cache of the imports found in each python file of a project.
+
+    Entries are keyed by relative path and validated by the file modification time and size, so
+    unchanged files are not even re-read. When those differ the file is read and its sha256 compared
+    with the stored one, so a touched but unchanged file is not parsed again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Warning: Ignoring unreadable import cache {path}: {e}")
+
+    def get(self, relative_path, stat):
+        entry = self.entries.get(relative_path)
+        if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return entry["imports"]
+        return None
+
+    def known(self, relative_path):
+        """Returns (sha256, imports) of the last parse of a file, or None."""
+        entry = self.entries.get(relative_path)
+        return (entry.get("sha256"), entry["imports"]) if entry else None
+
+    def set(self, relative_path, stat, digest, imports):
+        self.entries[relative_path] = {"sha256": digest, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "imports": imports}
+        self.dirty = True
+
+    def prune(self, keep):
+        for relative_path in set(self.entries) - set(keep):
+            del self.entries[relative_path]
+            self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except OSError as e:
+            print(f"Warning: Unable to save import cache {self.path}: {e}")
+
+def lookup_pypi(package, index_url=None):
+    """
+    Looks a package up on the package index json api.
+
+    Args:
+    package (str): The package name to check.
+    index_url (str, optional): Base url of the json api. Defaults to PYPI_INDEX_URL.
+
+    Returns:
+    bool or None: True if the package exists, False if the index does not know it, None if the index could not be reached.
+    """
+    index_url = (index_url or PYPI_INDEX_URL).rstrip("/")
+    try:
+        response = requests.get(f"{index_url}/{package}/json", timeout=PYPI_TIMEOUT)
+    except requests.RequestException:
+        return None
+    if response.status_code == 200:
+        return True
+    if response.status_code == 404:
+        return False
+    return None
 
 def check_pypi(package):
     """
@@ -52,16 +264,104 @@ def check_pypi(package):
     Returns:
     bool: True if the package exists, False otherwise.
     """
-    try:
-        response = requests.get(f"https://pypi.org/pypi/{package}/json")
-        return response.status_code == 200
-    except requests.RequestException:
+    exists = lookup_pypi(package)
+    if exists is None:
         print(f"Warning: Unable to check PyPI for package {package}. Assuming it exists.")
         return True
+    return exists
+
+def installed_distributions():
+    """
+    Maps top-level module names to the distribution that provides them in the current environment.
+
+    Returns:
+    dict: {module name: distribution name}, using the first distribution when several provide a module.
+    """
+    try:
+        return {module: dists[0] for module, dists in importlib.metadata.packages_distributions().items() if dists}
+    except Exception as e:
+        print(f"Warning: Unable to read installed distributions: {e}")
+        return {}
+
+class PypiCache:
+    """
+    Persistent cache of package index lookups.
+
+    Positive results are kept for PYPI_POSITIVE_TTL seconds and negative results for
+    PYPI_NEGATIVE_TTL seconds. Lookups that failed to reach the index are never cached.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Warning: Ignoring unreadable PyPI cache {path}: {e}")
+
+    def get(self, package):
+        entry = self.entries.get(package.lower())
+        if entry is None:
+            return None
+        ttl = PYPI_POSITIVE_TTL if entry["exists"] else PYPI_NEGATIVE_TTL
+        if time.time() - entry["checked"] > ttl:
+            return None
+        return entry["exists"]
+
+    def set(self, package, exists):
+        self.entries[package.lower()] = {"exists": exists, "checked": time.time()}
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # the cache is shared by the workspaces of a process, which scan their projects in threads
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+def local_modules(folder_path, FOLDERS_TO_EXCLUDE=None):
+    """
+    Returns the names the project itself provides at its top level: python files and folders holding python files.
+
+    Args:
+    folder_path (str): The project folder.
+    FOLDERS_TO_EXCLUDE (list, optional): Directory names that are not part of the project.
+
+    Returns:
+    set: Importable top-level module and package names.
+    """
+    names = set()
+    try:
+        entries = list(os.scandir(folder_path))
+    except OSError:
+        return names
+    for entry in entries:
+        if entry.is_file() and entry.name.endswith('.py'):
+            names.add(entry.name[:-3])
+        elif entry.is_dir() and entry.name not in (FOLDERS_TO_EXCLUDE or ()) and not entry.name.startswith('.'):
+            try:
+                if any(name.endswith('.py') for name in os.listdir(entry.path)):
+                    names.add(entry.name)
+            except OSError:
+                continue
+    return names
 
 def scan_folder(folder_path, FOLDERS_TO_EXCLUDE=None):
     """
     Scans a folder for Python files and extracts all unique imports.
+
+    Imports are cached per file in .system/import_cache.json inside the folder, so only new or changed
+    files are parsed; a file whose mtime changed but whose content hash did not is only re-read. Parsing stays in the calling thread: the orchestrator scans from asyncio.to_thread,
+    and a process pool would fork a multithreaded process. Imports of the project's own modules and
+    packages are left out.
     
     Args:
     folder_path (str): The path to the folder to scan.
@@ -71,8 +371,12 @@ def scan_folder(folder_path, FOLDERS_TO_EXCLUDE=None):
     defaultdict(set): A dictionary with keys as package names and values as sets of file paths.
     """
     all_imports = defaultdict(set)
-    python_std_lib = set(stdlib_list('3.8'))  # Change '3.8' to your Python version as necessary
-    
+    python_std_lib = python_stdlib_modules()
+    project_modules = local_modules(folder_path, FOLDERS_TO_EXCLUDE)
+    cache = ImportCache(os.path.join(folder_path, IMPORT_CACHE_FILE))
+
+    file_imports = {}
+    to_parse = []
     for root, dirs, files in os.walk(folder_path):
         if FOLDERS_TO_EXCLUDE is not None:
             dirs[:] = [d for d in dirs if d not in FOLDERS_TO_EXCLUDE]
@@ -80,13 +384,81 @@ def scan_folder(folder_path, FOLDERS_TO_EXCLUDE=None):
         for file in files:
             if file.endswith('.py'):
                 file_path = os.path.join(root, file)
-                imports = get_imports(file_path)
-                filtered_imports = {imp for imp in imports if imp not in python_std_lib}
-                for imp in filtered_imports:
-                    all_imports[imp].add(file_path)
+                relative_path = os.path.relpath(file_path, folder_path).replace('\\', '/')
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                imports = cache.get(relative_path, stat)
+                if imports is None:
+                    to_parse.append((relative_path, file_path, stat))
+                else:
+                    file_imports[file_path] = imports
+
+    for relative_path, file_path, stat in to_parse:
+        digest, imports = read_imports(file_path, cache.known(relative_path))
+        file_imports[file_path] = imports
+        if digest is not None:
+            cache.set(relative_path, stat, digest, imports)
+
+    cache.prune(os.path.relpath(file_path, folder_path).replace('\\', '/') for file_path in file_imports)
+    cache.save()
+
+    for file_path, imports in file_imports.items():
+        filtered_imports = {imp for imp in imports if imp not in python_std_lib and imp not in project_modules}
+        for imp in filtered_imports:
+            all_imports[imp].add(file_path)
     
     return all_imports
 
+def resolve_requirements(imports, cache=None, index_url=None):
+    """
+    Maps imported module names to distribution names without touching the network where possible.
+
+    Imports are resolved in order through the installed distributions
+    (importlib.metadata.packages_distributions), the MANUAL_CONVERSIONS table and the on-disk
+    PyPI lookup cache. Only the remaining names are checked against the package index, concurrently.
+
+    Args:
+    imports (Iterable[str]): Top-level module names.
+    cache (PypiCache, optional): Lookup cache. Defaults to one at PYPI_CACHE_FILE.
+    index_url (str, optional): Package index json api base url. Defaults to PYPI_INDEX_URL.
+
+    Returns:
+    list: A sorted list of distribution names.
+    """
+    cache = cache if cache is not None else PypiCache(PYPI_CACHE_FILE)
+    installed = installed_distributions()
+    requirements = set()
+    to_check = {}
+    for imp in imports:
+        if imp in MANUAL_CONVERSIONS:
+            package = MANUAL_CONVERSIONS[imp]
+        elif imp in installed:
+            requirements.add(installed[imp])
+            continue
+        else:
+            package = imp
+        exists = cache.get(package)
+        if exists is None:
+            to_check[package] = imp
+        elif exists:
+            requirements.add(package)
+
+    if to_check:
+        with ThreadPoolExecutor(max_workers=min(PYPI_MAX_WORKERS, len(to_check))) as executor:
+            results = executor.map(lambda package: (package, lookup_pypi(package, index_url)), to_check)
+            for package, exists in results:
+                if exists is None:
+                    print(f"Warning: Unable to check PyPI for package {package}. Assuming it exists.")
+                    requirements.add(package)
+                    continue
+                cache.set(package, exists)
+                if exists:
+                    requirements.add(package)
+        cache.save()
+    return sorted(requirements)
+
 def create_requirements(imports):
     """
     Creates a list of requirements from a set of imports, checking against PyPI.
@@ -97,108 +469,7 @@ def create_requirements(imports):
     Returns:
     list: A sorted list of packages that exist on PyPI.
     """
-    requirements = []
-    manual_conversions = { ... }  # Keep existing mappings as is
-    
-    for imp, files in imports.items():
-        package = manual_conversions.get(imp, imp)
-        if check_pypi(package):
-            requirements.append(package)
-    
-    return sorted(set(requirements))
-
-def create_requirements(imports):
-    requirements = []
-    manual_conversions = {
-        'cv2': 'opencv-python',
-        'PIL': 'pillow',
-        'sklearn': 'scikit-learn',
-        'yaml': 'PyYAML',
-        'np': 'numpy',
-        'pd': 'pandas',
-        'plt': 'matplotlib',
-        'scipy': 'scipy',
-        'tf': 'tensorflow',
-        'torch': 'torch',
-        'keras': 'keras',
-        'sklearn': 'scikit-learn',
-        'skimage': 'scikit-image',
-        'bs4': 'beautifulsoup4',
-        'nx': 'networkx',
-        'sns': 'seaborn',
-        'nltk': 'nltk',
-        'gensim': 'gensim',
-        'sympy': 'sympy',
-        'pypdf2': 'PyPDF2',
-        'openpyxl': 'openpyxl',
-        'xlrd': 'xlrd',
-        'xlwt': 'xlwt',
-        'lxml': 'lxml',
-        'scrapy': 'Scrapy',
-        'flask': 'Flask',
-        'django': 'Django',
-        'sqlalchemy': 'SQLAlchemy',
-        'psycopg2': 'psycopg2-binary',
-        'pymongo': 'pymongo',
-        'redis': 'redis',
-        'pika': 'pika',
-        'celery': 'celery',
-        'pytest': 'pytest',
-        'unittest': 'unittest2',
-        'selenium': 'selenium',
-        'requests_html': 'requests-html',
-        'dash': 'dash',
-        'plotly': 'plotly',
-        'bokeh': 'bokeh',
-        'pydot': 'pydot',
-        'graphviz': 'graphviz',
-        'pyyaml': 'PyYAML',
-        'ujson': 'ujson',
-        'fastapi': 'fastapi',
-        'pydantic': 'pydantic',
-        'uvicorn': 'uvicorn',
-        'gunicorn': 'gunicorn',
-        'aiohttp': 'aiohttp',
-        'asyncio': 'asyncio',
-        'cython': 'Cython',
-        'numba': 'numba',
-        'joblib': 'joblib',
-        'dask': 'dask',
-        'xgboost': 'xgboost',
-        'lightgbm': 'lightgbm',
-        'catboost': 'catboost',
-        'spacy': 'spacy',
-        'gym': 'gym',
-        'pyqt5': 'PyQt5',
-        'pyspark': 'pyspark',
-        'boto3': 'boto3',
-        'paramiko': 'paramiko',
-        'cryptography': 'cryptography',
-        'pycrypto': 'pycrypto',
-        'bcrypt': 'bcrypt',
-        'jwt': 'PyJWT',
-        'faker': 'Faker',
-        'tqdm': 'tqdm',
-        'ipython': 'ipython',
-        'jupyter': 'jupyter',
-        'click': 'click',
-        'typer': 'typer',
-        'streamlit': 'streamlit',
-        'pynput': 'pynput',
-        'pyautogui': 'PyAutoGUI',
-        'pendulum': 'pendulum',
-        'arrow': 'arrow',
-        'loguru': 'loguru',
-    }
-    
-    for imp, files in imports.items():
-        package = manual_conversions.get(imp, imp)
-        if check_pypi(package):
-            requirements.append(package)
-        # else:
-        #     print(f"Warning: {package} not found on PyPI. Used in: {', '.join(files)}")
-    
-    return requirements
+    return resolve_requirements(imports.keys())
 
 def do_requirements(folder_path, FOLDERS_TO_EXCLUDE=None):
     if os.path.exists(os.path.join(folder_path, '.venv')):
@@ -206,11 +477,18 @@ def do_requirements(folder_path, FOLDERS_TO_EXCLUDE=None):
     # folder_path = input("Enter the folder path to scan: ")
     imports = scan_folder(folder_path, FOLDERS_TO_EXCLUDE)
     requirements = create_requirements(imports)
-    
-    with open(folder_path + '/requirements.txt', 'w') as f:
-        for req in sorted(requirements):
-            f.write(f"{req}\n")
-            print(req)
+    content = "".join(f"{req}\n" for req in sorted(requirements))
+    for req in sorted(requirements):
+        print(req)
+
+    requirements_file = folder_path + '/requirements.txt'
+    if os.path.exists(requirements_file):
+        with open(requirements_file, 'r', encoding='utf-8') as f:
+            if f.read() == content:
+                print("requirements.txt is up to date.")
+                return
+    with open(requirements_file, 'w', encoding='utf-8') as f:
+        f.write(content)
     
     print("requirements.txt has been created.")
     
@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+
+from termcolor import colored
+
+# Request fields that change what the model returns, and so belong in the cache key
+CACHE_KEY_FIELDS = ("model", "system", "messages", "max_tokens", "temperature", "top_p", "top_k", "stop_sequences", "tools")
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024  # 200 MB
+DEFAULT_TTL = 7 * 24 * 60 * 60  # seconds
+
+
+def make_cache_key(request):
+    """
+    Builds a content-addressed key for a model request.
+
+    Args:
+        request (dict): The keyword arguments that would be passed to client.messages.create.
+
+    Returns:
+        str: A sha256 hex digest of the fields that affect the response.
+    """
+    payload = {field: request[field] for field in CACHE_KEY_FIELDS if field in request}
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    On-disk cache of model responses keyed by a hash of the request.
+
+    Each entry is one JSON file holding the request and the response, so the cache folder
+    doubles as a transcript of the session that can be replayed offline. Entries older than
+    `ttl` seconds are ignored and removed, and the least recently used entries are evicted
+    once the folder grows past `max_bytes`.
+
+    Each key is answered from the cache at most once per session: a request sent again in the same
+    session means the previous answer did not work (a fix whose edits failed, a retried fix round),
+    so it goes to the model and the new response replaces the cached one.
+    """
+
+    def __init__(self, folder, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL, enabled=True):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = None
+        self._answered = set()  # keys returned or stored in this session
+
+    def _entry_path(self, key):
+        return os.path.join(self.folder, key[:2], f"{key}.json")
+
+    def _iter_entries(self):
+        if not os.path.isdir(self.folder):
+            return
+        for root, _, files in os.walk(self.folder):
+            for filename in files:
+                if filename.endswith(".json"):
+                    path = os.path.join(root, filename)
+                    try:
+                        yield path, os.stat(path)
+                    except FileNotFoundError:
+                        continue
+
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            if self._total_bytes is not None:
+                self._total_bytes -= size
+        except FileNotFoundError:
+            pass
+
+    def _get(self, key):
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(colored(f"Discarding unreadable cache entry {path}: {e}", "red"))
+            self._remove(path)
+            return None
+        if self.ttl is not None and time.time() - entry.get("created", 0) > self.ttl:
+            self._remove(path)
+            return None
+        # bump the modification time so eviction sees this entry as recently used
+        os.utime(path, None)
+        return entry["response"]
+
+    def _put(self, key, request, response):
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {"key": key, "created": time.time(), "request": request, "response": response}
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, default=str)
+        if os.path.exists(path):
+            self._remove(path)
+        os.replace(tmp_path, path)
+        if self._total_bytes is None:
+            self._total_bytes = sum(stat.st_size for _, stat in self._iter_entries())
+        else:
+            self._total_bytes += os.path.getsize(path)
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        entries = sorted(self._iter_entries(), key=lambda item: item[1].st_mtime)
+        self._total_bytes = sum(stat.st_size for _, stat in entries)
+        for path, stat in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._remove(path)
+
+    async def get(self, request):
+        """
+        Looks up a cached response for a request.
+
+        Args:
+            request (dict): The request keyword arguments.
+
+        Returns:
+            dict or None: The cached response, or None on a miss, for a key already answered in this
+            session, or when the cache is disabled.
+        """
+        if not self.enabled:
+            return None
+        key = make_cache_key(request)
+        response = None if key in self._answered else await asyncio.to_thread(self._get, key)
+        if response is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._answered.add(key)
+        return response
+
+    async def put(self, request, response):
+        """
+        Stores a response for a request, evicting old entries if the cache is over budget.
+
+        Args:
+            request (dict): The request keyword arguments.
+            response (dict): The JSON-serializable response.
+        """
+        if not self.enabled:
+            return
+        key = make_cache_key(request)
+        self._answered.add(key)
+        try:
+            await asyncio.to_thread(self._put, key, request, response)
+        except OSError as e:
+            print(colored(f"Error writing response cache entry: {e}", "red"))
+
+    def clear(self):
+        """Removes every entry from the cache."""
+        for path, _ in list(self._iter_entries()):
+            self._remove(path)
+        self._total_bytes = 0
@@ -0,0 +1,207 @@
+import re
+import math
+import threading
+from collections import Counter, defaultdict
+
+from context_packer import referenced_files
+
+CAMEL_CASE = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+')
+STOP_WORDS = {
+    "the", "and", "for", "that", "this", "with", "from", "import", "def", "class", "self", "return",
+    "none", "true", "false", "not", "are", "was", "but", "you", "can", "should", "when", "into",
+    "file", "files", "please", "make", "use", "also", "has", "have", "its", "all", "any", "add",
+}
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+DESCRIPTION_WEIGHT = 2  # plan descriptions count this many times the file text
+PATH_WEIGHT = 3  # path components count this many times the file text
+REFERENCE_BOOST = 100.0  # added to files named in a traceback or in the query
+RELATIVE_CUTOFF = 0.5  # files scoring at least this fraction of the best one are selected
+
+
+def tokenize(text):
+    """
+    Splits text and identifiers into lowercase terms.
+
+    snake_case and CamelCase identifiers yield their parts as well as the whole identifier, so a
+    query for "high score" matches `HighScoreTable` and `high_score`.
+
+    Args:
+        text (str): Source code or prose.
+
+    Returns:
+        List[str]: The terms, stop words and single letters removed.
+    """
+    terms = []
+    for identifier in re.findall(r'[A-Za-z_][A-Za-z0-9_]*', text or ""):
+        parts = [part for word in identifier.split("_") for part in CAMEL_CASE.findall(word)]
+        if len(parts) > 1:
+            terms.append(identifier.lower().replace("_", ""))
+        terms.extend(part.lower() for part in parts)
+    return [term for term in terms if len(term) > 1 and term not in STOP_WORDS]
+
+
+def path_terms(path):
+    """Returns the terms of a file path, e.g. app/high_score.py -> app, highscore, high, score, py."""
+    return tokenize(re.sub(r'[/\\.-]', ' ', path))
+
+
+class RetrievalIndex:
+    """
+    BM25 index over project files and their plan descriptions.
+
+    Each document is a file: its contents, its `<description>` from the application plan and its
+    path. Documents are updated one at a time, so keeping the index current after a write costs
+    one tokenization of that file rather than a rebuild.
+    """
+
+    def __init__(self):
+        self.contents = {}  # path -> contents the document was built from
+        self.descriptions = {}  # path -> plan description
+        self.lengths = {}  # path -> number of terms
+        self.terms = {}  # path -> distinct terms, to drop its postings without a vocabulary scan
+        self.postings = defaultdict(dict)  # term -> {path: term frequency}
+        self.total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def _remove_postings(self, path):
+        length = self.lengths.pop(path, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for term in self.terms.pop(path, ()):
+            postings = self.postings[term]
+            postings.pop(path, None)
+            if not postings:
+                del self.postings[term]
+
+    def _rebuild(self, path):
+        self._remove_postings(path)
+        counts = Counter(tokenize(self.contents.get(path, "")))
+        for _ in range(DESCRIPTION_WEIGHT):
+            counts.update(tokenize(self.descriptions.get(path, "")))
+        for _ in range(PATH_WEIGHT):
+            counts.update(path_terms(path))
+        for term, frequency in counts.items():
+            self.postings[term][path] = frequency
+        self.terms[path] = list(counts)
+        length = sum(counts.values())
+        self.lengths[path] = length
+        self.total_length += length
+
+    def update(self, path, content):
+        """
+        Adds or refreshes the document of one file.
+
+        Args:
+            path (str): Path relative to the project root.
+            content (str): The file contents.
+        """
+        path = path.replace("\\", "/")
+        with self._lock:
+            if path in self.lengths and self.contents.get(path) == content:
+                return
+            self.contents[path] = content
+            self._rebuild(path)
+
+    def set_description(self, path, description):
+        """
+        Sets the plan description of a file. Planned files that do not exist yet are indexed too.
+
+        Args:
+            path (str): Path relative to the project root.
+            description (str): The `<description>` text.
+        """
+        path = path.replace("\\", "/")
+        with self._lock:
+            if self.descriptions.get(path) == description and path in self.lengths:
+                return
+            self.descriptions[path] = description or ""
+            self._rebuild(path)
+
+    def remove(self, path):
+        """Removes a file from the index."""
+        path = path.replace("\\", "/")
+        with self._lock:
+            self._remove_postings(path)
+            self.contents.pop(path, None)
+            self.descriptions.pop(path, None)
+
+    def sync(self, files):
+        """
+        Brings the index in line with the current project files, updating only changed documents.
+
+        Args:
+            files (Dict[str, str]): {path: contents} of every project file.
+        """
+        with self._lock:
+            for path in set(self.contents) - set(files):
+                if path in self.descriptions:
+                    self.contents.pop(path)
+                    self._rebuild(path)
+                else:
+                    self.remove(path)
+            for path, content in files.items():
+                self.update(path, content)
+
+    def search(self, query):
+        """
+        Scores every document against a query with BM25.
+
+        Args:
+            query (str): Free text, e.g. user feedback or an error message.
+
+        Returns:
+            List[Tuple[str, float]]: (path, score) pairs with a positive score, best first.
+        """
+        with self._lock:
+            documents = len(self.lengths)
+            if not documents:
+                return []
+            average_length = self.total_length / documents
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+                for path, frequency in postings.items():
+                    norm = K1 * (1 - B + B * self.lengths[path] / average_length)
+                    scores[path] += idf * frequency * (K1 + 1) / (frequency + norm)
+        return sorted(scores.items(), key=lambda item: -item[1])
+
+    def select(self, query, limit=8):
+        """
+        Picks the files most likely to be involved in an error or affected by feedback.
+
+        Files named in traceback frames or in the query always come first; the rest of the selection
+        are the files scoring at least RELATIVE_CUTOFF of the best BM25 score.
+
+        Args:
+            query (str): Error message or user feedback.
+            limit (int, optional): Maximum number of files. Defaults to 8.
+
+        Returns:
+            Tuple[List[str], float]: The selected paths and a confidence between 0 and 1. The
+            confidence is 1 when files were named explicitly, otherwise the margin between the last
+            selected file and the best file that was left out.
+        """
+        with self._lock:
+            known = list(self.lengths)
+        scores = defaultdict(float, self.search(query))
+        references = referenced_files(query, known)
+        for path, weight in references.items():
+            scores[path] += REFERENCE_BOOST + weight
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        if not ranked:
+            return [], 0.0
+        best = ranked[0][1]
+        selected = [path for path, score in ranked if score >= best * RELATIVE_CUTOFF][:limit]
+        if references:
+            return selected, 1.0
+        left_out = ranked[len(selected)][1] if len(ranked) > len(selected) else 0.0
+        return selected, 1.0 - left_out / scores[selected[-1]]
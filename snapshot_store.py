@@ -0,0 +1,277 @@
+import os
+import sys
+import gzip
+import json
+import time
+import shutil
+import hashlib
+
+from termcolor import colored
+
+MANIFEST_PREFIX = "snapshot_"
+HASH_CHUNK_SIZE = 1024 * 1024
+SYSTEM_FOLDER = ".system"  # plan, logs, caches and usually the store itself; never removed by a clean restore
+# Same names the orchestrator keeps out of snapshots (FOLDERS_TO_EXCLUDE and FILES_TO_EXCLUDE), used by the CLI
+DEFAULT_EXCLUDE = ['node_modules', 'venv', '.venv', 'env', '.env', 'build',
+                   'dist', '.log', SYSTEM_FOLDER, '__pycache__', 'appmap.log']
+
+
+def hash_file(file_path):
+    """
+    Computes the sha256 hex digest of a file.
+
+    Args:
+        file_path (str): The file to hash.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SnapshotStore:
+    """
+    Content-addressed store of folder snapshots.
+
+    Every unique file content is written once to `objects/` under its sha256 (gzip compressed
+    when `compress` is set), and each snapshot is a small JSON manifest in `manifests/` mapping
+    relative paths to blob hashes. Files whose size and modification time match the previous
+    manifest are not re-hashed, so taking a snapshot costs O(changed files).
+    """
+
+    def __init__(self, folder, compress=True, keep=20):
+        """
+        Args:
+            folder (str): The store folder, e.g. devfolder/.system/snapshots.
+            compress (bool, optional): Gzip new blobs. Defaults to True.
+            keep (int, optional): Number of snapshots kept by prune. Defaults to 20.
+        """
+        self.folder = folder
+        self.objects_folder = os.path.join(folder, "objects")
+        self.manifests_folder = os.path.join(folder, "manifests")
+        self.compress = compress
+        self.keep = keep
+
+    # ----- blobs -----
+
+    def _blob_path(self, digest):
+        base = os.path.join(self.objects_folder, digest[:2], digest)
+        if os.path.exists(base + ".gz"):
+            return base + ".gz"
+        if os.path.exists(base):
+            return base
+        return None
+
+    def _store_blob(self, file_path, digest):
+        if self._blob_path(digest) is not None:
+            return
+        target = os.path.join(self.objects_folder, digest[:2], digest)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if self.compress:
+            target += ".gz"
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        with open(file_path, "rb") as src:
+            if self.compress:
+                with gzip.open(tmp_path, "wb", compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst)
+            else:
+                with open(tmp_path, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+        os.replace(tmp_path, target)
+
+    def read_blob(self, digest):
+        """Returns the bytes stored under `digest`."""
+        path = self._blob_path(digest)
+        if path is None:
+            raise FileNotFoundError(f"Missing snapshot object {digest}")
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rb") as f:
+            return f.read()
+
+    # ----- manifests -----
+
+    def list_snapshots(self):
+        """
+        Lists the stored snapshots, oldest first.
+
+        Returns:
+            List[str]: The snapshot ids.
+        """
+        if not os.path.isdir(self.manifests_folder):
+            return []
+        return sorted(f[:-5] for f in os.listdir(self.manifests_folder) if f.startswith(MANIFEST_PREFIX) and f.endswith(".json"))
+
+    def load_manifest(self, snapshot_id):
+        """Returns the manifest dict of a snapshot."""
+        with open(os.path.join(self.manifests_folder, f"{snapshot_id}.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _latest_manifest(self):
+        snapshots = self.list_snapshots()
+        if not snapshots:
+            return None, {}
+        return snapshots[-1], self.load_manifest(snapshots[-1])
+
+    def _walk(self, source, exclude):
+        for root, dirs, files in os.walk(source):
+            dirs[:] = [d for d in dirs if d not in exclude]
+            for filename in files:
+                if filename in exclude:
+                    continue
+                file_path = os.path.join(root, filename)
+                yield os.path.relpath(file_path, source).replace("\\", "/"), file_path
+
+    def snapshot(self, source, exclude=(), extra_files=None):
+        """
+        Records a snapshot of a folder.
+
+        Args:
+            source (str): The folder to snapshot.
+            exclude (Iterable[str], optional): Folder and file names to skip.
+            extra_files (Dict[str, str], optional): Additional files to include, as {name in snapshot: path}.
+
+        Returns:
+            str: The id of the new snapshot, or of the latest one if nothing changed.
+        """
+        exclude = set(exclude)
+        latest_id, latest = self._latest_manifest()
+        previous_files = latest.get("files", {})
+        files = {}
+        entries = list(self._walk(source, exclude))
+        entries += [(name, path) for name, path in (extra_files or {}).items() if os.path.isfile(path)]
+        for relative_path, file_path in entries:
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            previous = previous_files.get(relative_path)
+            if previous and previous["size"] == stat.st_size and previous["mtime_ns"] == stat.st_mtime_ns and self._blob_path(previous["hash"]):
+                digest = previous["hash"]
+            else:
+                digest = hash_file(file_path)
+                self._store_blob(file_path, digest)
+            files[relative_path] = {"hash": digest, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "mode": stat.st_mode & 0o777}
+
+        if latest_id is not None and {k: v["hash"] for k, v in files.items()} == {k: v["hash"] for k, v in previous_files.items()}:
+            return latest_id
+
+        os.makedirs(self.manifests_folder, exist_ok=True)
+        snapshot_id = f"{MANIFEST_PREFIX}{time.strftime('%Y%m%d-%H%M%S')}"
+        suffix = 0
+        while os.path.exists(os.path.join(self.manifests_folder, f"{snapshot_id}.json")):
+            suffix += 1
+            snapshot_id = f"{MANIFEST_PREFIX}{time.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+        manifest_path = os.path.join(self.manifests_folder, f"{snapshot_id}.json")
+        with open(f"{manifest_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "source": os.path.abspath(source), "files": files}, f, indent=1)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+        return snapshot_id
+
+    def diff(self, old_id, new_id):
+        """
+        Compares two snapshots.
+
+        Args:
+            old_id (str): The older snapshot id.
+            new_id (str): The newer snapshot id.
+
+        Returns:
+            Dict[str, List[str]]: Paths that were "added", "removed" and "modified".
+        """
+        old_files = self.load_manifest(old_id)["files"]
+        new_files = self.load_manifest(new_id)["files"]
+        return {
+            "added": sorted(set(new_files) - set(old_files)),
+            "removed": sorted(set(old_files) - set(new_files)),
+            "modified": sorted(p for p in set(old_files) & set(new_files) if old_files[p]["hash"] != new_files[p]["hash"]),
+        }
+
+    def restore(self, snapshot_id, target, exclude=(), clean=True):
+        """
+        Restores a snapshot into a folder. Unchanged files are left alone.
+
+        Args:
+            snapshot_id (str): The snapshot to restore.
+            target (str): The folder to restore into.
+            exclude (Iterable[str], optional): Folder and file names never touched by clean. The
+                .system folder and the store folder are always kept.
+            clean (bool, optional): Remove files that are not part of the snapshot. Defaults to True.
+
+        Returns:
+            List[str]: The paths that were written or removed.
+        """
+        files = self.load_manifest(snapshot_id)["files"]
+        changed = []
+        if clean and os.path.isdir(target):
+            store_folder = os.path.abspath(self.folder) + os.sep
+            for relative_path, file_path in list(self._walk(target, set(exclude) | {SYSTEM_FOLDER})):
+                if relative_path in files or os.path.abspath(file_path).startswith(store_folder):
+                    continue
+                os.remove(file_path)
+                changed.append(relative_path)
+        for relative_path, entry in files.items():
+            file_path = os.path.join(target, relative_path)
+            if os.path.isfile(file_path) and os.path.getsize(file_path) == entry["size"] and hash_file(file_path) == entry["hash"]:
+                continue
+            os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+            data = self.read_blob(entry["hash"])
+            if os.path.lexists(file_path):
+                os.remove(file_path)
+            with open(file_path, "wb") as f:
+                f.write(data)
+            os.chmod(file_path, entry.get("mode", 0o644))
+            changed.append(relative_path)
+        return changed
+
+    def prune(self, keep=None):
+        """
+        Deletes all but the `keep` newest snapshots and the objects no snapshot references.
+
+        Args:
+            keep (int, optional): Number of snapshots to keep. Defaults to the store setting.
+        """
+        keep = self.keep if keep is None else keep
+        snapshots = self.list_snapshots()
+        for snapshot_id in snapshots[:-keep] if keep else snapshots:
+            os.remove(os.path.join(self.manifests_folder, f"{snapshot_id}.json"))
+        referenced = set()
+        for snapshot_id in self.list_snapshots():
+            referenced.update(entry["hash"] for entry in self.load_manifest(snapshot_id)["files"].values())
+        if not os.path.isdir(self.objects_folder):
+            return
+        for root, _, files in os.walk(self.objects_folder):
+            for filename in files:
+                digest = filename[:-3] if filename.endswith(".gz") else filename
+                if digest not in referenced:
+                    os.remove(os.path.join(root, filename))
+
+
+def main():
+    usage = "usage: python snapshot_store.py <store folder> list | diff OLD NEW | restore ID TARGET"
+    if len(sys.argv) < 3:
+        print(usage)
+        sys.exit(1)
+    store = SnapshotStore(sys.argv[1])
+    command = sys.argv[2]
+    if command == "list":
+        for snapshot_id in store.list_snapshots():
+            files = store.load_manifest(snapshot_id)["files"]
+            print(f"{snapshot_id}  {len(files)} files  {sum(f['size'] for f in files.values())} bytes")
+    elif command == "diff" and len(sys.argv) == 5:
+        for kind, paths in store.diff(sys.argv[3], sys.argv[4]).items():
+            for path in paths:
+                print(colored(f"{kind}: {path}", {"added": "green", "removed": "red", "modified": "yellow"}[kind]))
+    elif command == "restore" and len(sys.argv) == 5:
+        changed = store.restore(sys.argv[3], sys.argv[4], exclude=DEFAULT_EXCLUDE)
+        print(f"Restored {sys.argv[3]} to {sys.argv[4]} ({len(changed)} files changed)")
+    else:
+        print(usage)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
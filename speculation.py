@@ -0,0 +1,88 @@
+import time
+import asyncio
+
+from termcolor import colored
+
+
+class Speculation:
+    """
+    Work started in the background while the user answers a prompt.
+
+    Each task runs under a key. Once the answer is known, `commit` returns the result of the task
+    (waiting only for what is left of it) and `discard` cancels the tasks the answer made useless.
+    Speculative work must not prompt and must be safe to throw away: local read-only analysis or
+    idempotent preparation such as installing requirements. Paid model requests wait for the answer.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self._finished = {}
+        self.committed = 0
+        self.discarded = 0
+        self.hidden_seconds = 0.0  # time the speculative tasks ran while nobody was waiting for them
+
+    def start(self, key, coroutine):
+        """
+        Starts `coroutine` as the speculative task of `key`, unless one is already running.
+
+        Returns:
+            bool: True if the task was started, False if the coroutine was closed unused.
+        """
+        if key in self._tasks:
+            coroutine.close()
+            return False
+        task = asyncio.create_task(coroutine)
+        self._tasks[key] = (task, time.monotonic())
+        task.add_done_callback(lambda _: self._finished.__setitem__(key, time.monotonic()))
+        return True
+
+    def pending(self, key):
+        return key in self._tasks
+
+    async def commit(self, key, fallback=None):
+        """
+        Returns the result of the speculative task of `key`.
+
+        Args:
+            key (str): The task key.
+            fallback (Callable[[], Awaitable], optional): Called instead when no task was started
+                or the task failed, so callers do not need to know whether speculation happened.
+
+        Returns:
+            The result of the task or of the fallback, None without either.
+        """
+        entry = self._tasks.pop(key, None)
+        if entry is not None:
+            task, started = entry
+            waited_since = time.monotonic()
+            try:
+                result = await task
+                self.committed += 1
+                self.hidden_seconds += max(0.0, min(waited_since, self._finished.pop(key, waited_since)) - started)
+                return result
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise
+            except Exception as e:
+                print(colored(f"Background {key} failed: {e}", "yellow"))
+            self._finished.pop(key, None)
+        return await fallback() if fallback is not None else None
+
+    async def discard(self, *keys):
+        """Cancels the speculative tasks of `keys`, or of every key when none is given."""
+        for key in list(keys or self._tasks):
+            entry = self._tasks.pop(key, None)
+            if entry is None:
+                continue
+            task, _ = entry
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._finished.pop(key, None)
+            self.discarded += 1
+
+    def summary(self):
+        return (f"Background work: {self.committed} results used, {self.discarded} discarded, "
+                f"{self.hidden_seconds:.1f}s done while waiting for answers")
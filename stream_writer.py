@@ -0,0 +1,137 @@
+import os
+import re
+
+CODE_TAG = re.compile(r'<code>')
+FILE_TAG = re.compile(r'<file name="(.*?)">')
+MAX_OPEN_TAG_LENGTH = 1024  # longest opening tag we expect, kept buffered while waiting for it to complete
+
+
+class StreamingFileWriter:
+    """
+    Writes tagged file bodies to disk while a model response is still streaming.
+
+    Text is fed in chunks as it arrives. The body following an opening tag (`<code>` or
+    `<file name="...">`) is appended to a `.partial` file next to the target, and when the
+    closing tag arrives the partial file is atomically renamed over the target. Tags split
+    across chunks are handled by holding back just enough text to recognise them. The content a
+    target had before the request is remembered, so the files of a failed attempt can be put back.
+    """
+
+    def __init__(self, resolve_path, open_tag=CODE_TAG, close_tag="</code>", single=False, on_complete=None, on_restore=None):
+        """
+        Args:
+            resolve_path (callable): Maps the first group of the opening tag (or None) to the target path.
+            open_tag (re.Pattern): Pattern of the opening tag.
+            close_tag (str): Closing tag.
+            single (bool): Stop after the first complete block, like code.split("<code>")[1].
+            on_complete (callable, optional): Called with the target path and its new content after
+                each block is finalized.
+            on_restore (callable, optional): Called with the target path and its restored content,
+                None if the file was removed, after rollback put a file back.
+        """
+        self.resolve_path = resolve_path
+        self.open_tag = open_tag
+        self.close_tag = close_tag
+        self.single = single
+        self.on_complete = on_complete
+        self.on_restore = on_restore
+        self.completed = {}
+        self._originals = {}  # target path: bytes before the request, None if it did not exist
+        self._file = None
+        self.reset()
+
+    def reset(self):
+        """Discards the blocks of an earlier attempt, e.g. before a request is retried."""
+        self.rollback()
+        self._buffer = ""
+        self._target = None
+        self._body = []
+        self._done = False
+
+    def rollback(self):
+        """Aborts the open block and puts back the files completed so far, e.g. when the request failed."""
+        self.abort()
+        for target in list(self.completed):
+            original = self._originals.get(target)
+            if original is None:
+                try:
+                    os.remove(target)
+                except FileNotFoundError:
+                    pass
+            else:
+                with open(f"{target}.partial", "wb") as f:
+                    f.write(original)
+                os.replace(f"{target}.partial", target)
+            if self.on_restore is not None:
+                self.on_restore(target, None if original is None else original.decode("utf-8", errors="replace"))
+        self.completed = {}
+
+    def _start(self, name):
+        self._target = self.resolve_path(name)
+        if self._target not in self._originals:
+            try:
+                with open(self._target, "rb") as f:
+                    self._originals[self._target] = f.read()
+            except OSError:
+                self._originals[self._target] = None
+        os.makedirs(os.path.dirname(self._target) or ".", exist_ok=True)
+        self._file = open(f"{self._target}.partial", "w", encoding="utf-8")
+        self._body = []
+
+    def _write(self, text):
+        if text:
+            self._file.write(text)
+            self._file.flush()
+            self._body.append(text)
+
+    def _finish(self):
+        self._file.close()
+        self._file = None
+        os.replace(f"{self._target}.partial", self._target)
+        self.completed[self._target] = "".join(self._body)
+        if self.on_complete is not None:
+            self.on_complete(self._target, self.completed[self._target])
+        if self.single:
+            self._done = True
+
+    def feed(self, text):
+        """
+        Consumes the next chunk of streamed text.
+
+        Args:
+            text (str): The chunk.
+        """
+        if self._done:
+            return
+        self._buffer += text
+        while self._buffer and not self._done:
+            if self._file is None:
+                match = self.open_tag.search(self._buffer)
+                if match is None:
+                    self._buffer = self._buffer[-MAX_OPEN_TAG_LENGTH:]
+                    return
+                self._start(match.group(1) if match.groups() else None)
+                self._buffer = self._buffer[match.end():]
+            else:
+                end = self._buffer.find(self.close_tag)
+                if end == -1:
+                    # keep back a possible prefix of the closing tag
+                    safe = len(self._buffer) - len(self.close_tag) + 1
+                    if safe > 0:
+                        self._write(self._buffer[:safe])
+                        self._buffer = self._buffer[safe:]
+                    return
+                self._write(self._buffer[:end])
+                self._buffer = self._buffer[end + len(self.close_tag):]
+                self._finish()
+
+    def abort(self):
+        """Removes the partial file of an unfinished block."""
+        file = getattr(self, "_file", None)
+        if file is not None:
+            file.close()
+            try:
+                os.remove(f"{self._target}.partial")
+            except FileNotFoundError:
+                pass
+            self._file = None
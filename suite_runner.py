@@ -0,0 +1,229 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import xml.etree.ElementTree as ET
+
+from process_runner import ProcessRunner
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "suite_worker.py")
+TEST_FILE_PREFIX = "test_"
+TEST_FILE_SUFFIX = "_test.py"
+DEFAULT_TEST_TIMEOUT = 60  # seconds per test
+MAX_MESSAGE_LINES = 15  # lines of each failure kept in the summary
+MAX_SUMMARY_FAILURES = 10
+FAILED_OUTCOMES = ("failed", "error", "timeout")
+
+
+class TestCaseResult:
+    """Outcome of one test: "passed", "failed", "error", "skipped" or "timeout"."""
+
+    __slots__ = ("module", "test_id", "outcome", "duration", "message")
+
+    def __init__(self, module, test_id, outcome, duration=0.0, message=""):
+        self.module = module
+        self.test_id = test_id
+        self.outcome = outcome
+        self.duration = duration
+        self.message = message
+
+    def __repr__(self):
+        return f"TestCaseResult({self.test_id!r}, {self.outcome}, {self.duration:.2f}s)"
+
+
+class SuiteResult:
+    """All test results of a run, with the wall time of the whole run."""
+
+    def __init__(self, results, wall_time):
+        self.results = results
+        self.wall_time = wall_time
+
+    @property
+    def failures(self):
+        return [result for result in self.results if result.outcome in FAILED_OUTCOMES]
+
+    @property
+    def passed(self):
+        return not self.failures
+
+    def counts(self):
+        counts = {}
+        for result in self.results:
+            counts[result.outcome] = counts.get(result.outcome, 0) + 1
+        return counts
+
+    def summary(self):
+        """
+        Returns a compact report: the counts, then the tail of each failure, slowest tests last.
+
+        Returns:
+            str: The summary, fit for the fix prompt.
+        """
+        counts = ", ".join(f"{count} {outcome}" for outcome, count in sorted(self.counts().items())) or "no tests"
+        test_time = sum(result.duration for result in self.results)
+        lines = [f"{counts} in {self.wall_time:.1f}s wall, {test_time:.1f}s of test time"]
+        failures = self.failures
+        for result in failures[:MAX_SUMMARY_FAILURES]:
+            lines.append(f"{result.outcome.upper()} {result.test_id} ({result.duration:.2f}s)")
+            message = result.message.strip().splitlines()[-MAX_MESSAGE_LINES:]
+            lines.extend(f"    {line}" for line in message)
+        if len(failures) > MAX_SUMMARY_FAILURES:
+            lines.append(f"... and {len(failures) - MAX_SUMMARY_FAILURES} more failing tests")
+        slowest = sorted(self.results, key=lambda result: -result.duration)[:3]
+        if slowest:
+            lines.append("Slowest: " + ", ".join(f"{result.test_id} ({result.duration:.2f}s)" for result in slowest))
+        return "\n".join(lines)
+
+    def write_junit(self, path):
+        """Writes the results as JUnit XML, one <testsuite> per module."""
+        suites = ET.Element("testsuites", tests=str(len(self.results)), time=f"{self.wall_time:.3f}")
+        by_module = {}
+        for result in self.results:
+            by_module.setdefault(result.module, []).append(result)
+        for module, results in by_module.items():
+            counts = {outcome: sum(1 for r in results if r.outcome == outcome) for outcome in ("failed", "error", "timeout", "skipped")}
+            suite = ET.SubElement(suites, "testsuite", name=module, tests=str(len(results)),
+                                  failures=str(counts["failed"]), errors=str(counts["error"] + counts["timeout"]),
+                                  skipped=str(counts["skipped"]), time=f"{sum(r.duration for r in results):.3f}")
+            for result in results:
+                classname, _, name = result.test_id.rpartition("::" if "::" in result.test_id else ".")
+                case = ET.SubElement(suite, "testcase", classname=classname or module, name=name or result.test_id, time=f"{result.duration:.3f}")
+                if result.outcome == "failed":
+                    ET.SubElement(case, "failure", message=result.message.strip().splitlines()[-1] if result.message.strip() else "").text = result.message
+                elif result.outcome in ("error", "timeout"):
+                    ET.SubElement(case, "error", type=result.outcome, message=result.outcome).text = result.message
+                elif result.outcome == "skipped":
+                    ET.SubElement(case, "skipped", message=result.message)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        ET.ElementTree(suites).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def discover_test_modules(root, exclude_dirs=()):
+    """
+    Finds the test modules of a project: test_*.py and *_test.py files.
+
+    Args:
+        root (str): The project folder.
+        exclude_dirs (Iterable[str], optional): Folder names to skip.
+
+    Returns:
+        List[str]: Module paths relative to root, sorted.
+    """
+    exclude_dirs = set(exclude_dirs)
+    modules = []
+    for folder, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if d not in exclude_dirs and not d.startswith(".")]
+        for filename in files:
+            if filename.endswith(".py") and (filename.startswith(TEST_FILE_PREFIX) or filename.endswith(TEST_FILE_SUFFIX)):
+                modules.append(os.path.relpath(os.path.join(folder, filename), root).replace("\\", "/"))
+    return sorted(modules)
+
+
+def _read_records(results_file, module, stderr, test_timeout):
+    """Returns the results recorded by a worker and whether a test was left unfinished."""
+    results = {}
+    started = []
+    try:
+        with open(results_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record["event"] == "start":
+                    started.append(record["id"])
+                else:
+                    results[record["id"]] = TestCaseResult(module, record["id"], record["outcome"], record["duration"], record.get("message", ""))
+    except OSError:
+        pass
+    # a test that started but never reported hung past its timeout or crashed the worker
+    unfinished = [test_id for test_id in started if test_id not in results]
+    for test_id in unfinished:
+        if "Timeout (" in stderr:
+            # faulthandler dumps the innermost frame first, so keep the head of the dump
+            dump = stderr[stderr.index("Timeout ("):].splitlines()[:MAX_MESSAGE_LINES]
+            results[test_id] = TestCaseResult(module, test_id, "timeout", test_timeout, "\n".join(dump[::-1]))
+        else:
+            results[test_id] = TestCaseResult(module, test_id, "error", 0.0, stderr)
+    return list(results.values()), bool(unfinished)
+
+
+async def run_module(module, root, python, test_timeout=DEFAULT_TEST_TIMEOUT, env=None):
+    """
+    Runs one test module in its own worker process. When a test hangs or crashes the worker, a new
+    worker carries on with the tests that have not reported yet.
+
+    Args:
+        module (str): Module path relative to root.
+        root (str): The project folder, used as working directory.
+        python (str): The interpreter to run the tests with.
+        test_timeout (float, optional): Seconds allowed per test.
+        env (dict, optional): The worker environment.
+
+    Returns:
+        List[TestCaseResult]: The results of the module's tests.
+    """
+    fd, results_file = tempfile.mkstemp(prefix="suite_", suffix=".jsonl")
+    os.close(fd)
+    results = {}
+    try:
+        while True:
+            # the worker's faulthandler ends hung imports and tests, so no timeout is needed here
+            runner = ProcessRunner([python, WORKER_SCRIPT, results_file, str(test_timeout), module, *results], cwd=root,
+                                   env=env, max_lines=200, stdin=asyncio.subprocess.DEVNULL)
+            started = time.perf_counter()
+            run = await runner.run(handle_signals=False)
+            records, interrupted = _read_records(results_file, module, run.stderr, test_timeout)
+            open(results_file, "w").close()
+            if not records and not results and run.returncode != 0:
+                # the worker died before any test started, e.g. an import error or a missing module
+                message = run.stderr or run.stdout or f"worker exited with {run.returncode}"
+                outcome = "timeout" if "Timeout (" in message else "error"
+                records = [TestCaseResult(module, module, outcome, time.perf_counter() - started, message)]
+            new_records = [record for record in records if record.test_id not in results]
+            results.update((record.test_id, record) for record in records)
+            if not interrupted or not new_records:
+                return list(results.values())
+    finally:
+        os.remove(results_file)
+
+
+async def run_test_suite(root, python=None, modules=None, max_workers=None, test_timeout=DEFAULT_TEST_TIMEOUT, exclude_dirs=(), junit_path=None):
+    """
+    Runs a project's tests, one worker process per module and up to `max_workers` at once.
+
+    Args:
+        root (str): The project folder.
+        python (str, optional): The interpreter to run the tests with. Defaults to this one.
+        modules (List[str], optional): Module paths relative to root. Defaults to all test modules.
+        max_workers (int, optional): Concurrent workers. Defaults to the number of cores.
+        test_timeout (float, optional): Seconds allowed per test.
+        exclude_dirs (Iterable[str], optional): Folder names skipped by discovery.
+        junit_path (str, optional): Where to write the JUnit XML report.
+
+    Returns:
+        SuiteResult: The results of every test.
+    """
+    root = os.path.abspath(root)
+    python = python or sys.executable
+    if modules is None:
+        modules = discover_test_modules(root, exclude_dirs)
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    # largest modules first, so a long module does not start last and stretch the wall time
+    modules = sorted(modules, key=lambda module: -os.path.getsize(os.path.join(root, module)) if os.path.exists(os.path.join(root, module)) else 0)
+    semaphore = asyncio.Semaphore(max_workers or os.cpu_count() or 1)
+
+    async def bounded(module):
+        async with semaphore:
+            return await run_module(module, root, python, test_timeout, env)
+
+    started = time.perf_counter()
+    shards = await asyncio.gather(*(bounded(module) for module in modules))
+    result = SuiteResult([test for shard in shards for test in shard], time.perf_counter() - started)
+    if junit_path:
+        result.write_junit(junit_path)
+    return result
@@ -0,0 +1,156 @@
+"""
+Runs the tests of one module and writes one JSON record per test event.
+
+Started by suite_runner in the project's interpreter, so it only depends on the standard library
+(and uses pytest when the project has it installed):
+
+    python suite_worker.py RESULTS_FILE TEST_TIMEOUT MODULE_PATH [SKIP_TEST_ID ...]
+
+Collection and each test arm faulthandler with TEST_TIMEOUT seconds; a test that hangs has its
+stack dumped to stderr and ends the worker, leaving a "start" record without a matching "result".
+The runner then starts a new worker with the tests that already reported as SKIP_TEST_IDs.
+"""
+import os
+import sys
+import json
+import time
+import unittest
+import faulthandler
+
+
+class RecordWriter:
+    """Appends JSON records to the results file, flushing each one so they survive a hard exit."""
+
+    def __init__(self, path, test_timeout):
+        self.file = open(path, "a", encoding="utf-8")
+        self.test_timeout = test_timeout
+        self.started = {}
+        # pytest redirects fd 2 while capturing output, so the timeout dump gets its own copy
+        self.stderr = os.fdopen(os.dup(sys.stderr.fileno()), "w")
+
+    def start(self, test_id):
+        self.started[test_id] = time.perf_counter()
+        self._write({"event": "start", "id": test_id})
+        self.arm_timeout()
+
+    def arm_timeout(self):
+        if self.test_timeout:
+            faulthandler.dump_traceback_later(self.test_timeout, exit=True, file=self.stderr)
+
+    def result(self, test_id, outcome, message=""):
+        faulthandler.cancel_dump_traceback_later()
+        duration = time.perf_counter() - self.started.pop(test_id, time.perf_counter())
+        self._write({"event": "result", "id": test_id, "outcome": outcome, "duration": round(duration, 4), "message": message})
+
+    def _write(self, record):
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+
+class PytestRecorder:
+    """pytest plugin forwarding test outcomes to a RecordWriter."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.outcomes = {}
+
+    def pytest_runtest_logstart(self, nodeid, location):
+        self.writer.start(nodeid)
+        self.outcomes[nodeid] = ("passed", "")
+
+    def pytest_runtest_logreport(self, report):
+        if report.failed:
+            outcome = "failed" if report.when == "call" else "error"
+            self.outcomes[report.nodeid] = (outcome, str(report.longrepr))
+        elif report.skipped and self.outcomes.get(report.nodeid, ("passed",))[0] == "passed":
+            reason = report.longrepr[-1] if isinstance(report.longrepr, tuple) else str(report.longrepr)
+            self.outcomes[report.nodeid] = ("skipped", reason)
+
+    def pytest_runtest_logfinish(self, nodeid, location):
+        outcome, message = self.outcomes.pop(nodeid, ("passed", ""))
+        self.writer.result(nodeid, outcome, message)
+
+    def pytest_collectreport(self, report):
+        if report.failed:
+            self.writer.start(report.nodeid)
+            self.writer.result(report.nodeid, "error", str(report.longrepr))
+
+
+class UnittestRecorder(unittest.TestResult):
+    """unittest result forwarding test outcomes to a RecordWriter."""
+
+    def __init__(self, writer):
+        super().__init__()
+        self.writer = writer
+
+    def startTest(self, test):
+        super().startTest(test)
+        self.writer.start(test.id())
+
+    def addSuccess(self, test):
+        super().addSuccess(test)
+        self.writer.result(test.id(), "passed")
+
+    def addFailure(self, test, err):
+        super().addFailure(test, err)
+        self.writer.result(test.id(), "failed", self.failures[-1][1])
+
+    def addError(self, test, err):
+        super().addError(test, err)
+        if test.id() not in self.writer.started:
+            self.writer.start(test.id())  # errors in setUpClass/setUpModule
+        self.writer.result(test.id(), "error", self.errors[-1][1])
+
+    def addSkip(self, test, reason):
+        super().addSkip(test, reason)
+        self.writer.result(test.id(), "skipped", reason)
+
+    def addExpectedFailure(self, test, err):
+        super().addExpectedFailure(test, err)
+        self.writer.result(test.id(), "passed")
+
+    def addUnexpectedSuccess(self, test):
+        super().addUnexpectedSuccess(test)
+        self.writer.result(test.id(), "failed", "unexpected success")
+
+
+def module_name(module_path):
+    """Returns the dotted module name of a test file relative to the working directory."""
+    return os.path.splitext(os.path.normpath(module_path))[0].replace(os.sep, ".").replace("/", ".")
+
+
+def skip_tests(suite, skip_ids):
+    """Returns a flat unittest suite without the tests in `skip_ids`."""
+    kept = unittest.TestSuite()
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            kept.addTests(skip_tests(test, skip_ids))
+        elif test.id() not in skip_ids:
+            kept.addTest(test)
+    return kept
+
+
+def main():
+    results_file, test_timeout, module_path = sys.argv[1], float(sys.argv[2]), sys.argv[3]
+    skip_ids = set(sys.argv[4:])
+    sys.path.insert(0, os.getcwd())
+    writer = RecordWriter(results_file, test_timeout)
+    writer.arm_timeout()  # covers importing and collecting the module; each test re-arms it
+    try:
+        import pytest
+    except ImportError:
+        pytest = None
+    if pytest is not None:
+        args = [module_path, "-q", "-p", "no:cacheprovider", "-p", "no:randomly"]
+        for test_id in skip_ids:
+            args += ["--deselect", test_id]
+        code = pytest.main(args, plugins=[PytestRecorder(writer)])
+        sys.exit(0 if code in (0, 5) else 1)  # 5: no tests collected
+    suite = skip_tests(unittest.defaultTestLoader.loadTestsFromName(module_name(module_path)), skip_ids)
+    result = UnittestRecorder(writer)
+    suite.run(result)
+    sys.exit(0 if result.wasSuccessful() else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import re
+import sys
+import hashlib
+from collections import namedtuple
+
+FRAME_LINE = re.compile(r'^\s*File "([^"]+)", line (\d+)(?:, in (.+))?$')
+EXCEPTION_LINE = re.compile(r'^([A-Za-z_][\w.]*)(?:: ?(.*))?$')
+LONE_EXCEPTION_LINE = re.compile(r'^\s*(?:\w+ )?([A-Za-z_][\w.]*(?:Error|Exception)): (.+)$')
+TRACEBACK_START = "Traceback (most recent call last):"
+# frames from these locations are not part of the project; a project package may well be called lib
+LIBRARY_MARKERS = ("site-packages", "dist-packages", "/lib/python", "venv/", "<frozen", "<string>")
+# the standard library of this interpreter, e.g. C:/Python312/Lib on Windows where no /lib/python marker applies
+INTERPRETER_PREFIXES = tuple({prefix.replace("\\", "/").rstrip("/") + "/" for prefix in (sys.base_prefix, sys.base_exec_prefix)
+                             if prefix.strip("/\\")})
+MAX_FINGERPRINT_FRAMES = 3
+
+Frame = namedtuple("Frame", "file line function code")
+
+
+class ParsedError:
+    """One distinct error from a run: the exception, its traceback frames and how often it occurred."""
+
+    __slots__ = ("exception_type", "message", "frames", "count")
+
+    def __init__(self, exception_type, message, frames=(), count=1):
+        self.exception_type = exception_type
+        self.message = message
+        self.frames = list(frames)
+        self.count = count
+
+    def __repr__(self):
+        return f"ParsedError({self.exception_type}: {self.message!r}, {len(self.frames)} frames, x{self.count})"
+
+    @property
+    def project_frames(self):
+        """The frames that point into project files, outermost first."""
+        return [frame for frame in self.frames if is_project_file(frame.file)]
+
+    @property
+    def fingerprint(self):
+        """
+        A hash that stays the same when the error recurs.
+
+        Line numbers, memory addresses, numbers and absolute path prefixes are left out, so edits
+        elsewhere in a file or a different checkout folder do not change the fingerprint.
+        """
+        frames = self.project_frames[-MAX_FINGERPRINT_FRAMES:]
+        payload = "\n".join([self.exception_type.rsplit(".", 1)[-1], normalize_message(self.message)]
+                            + [f"{normalize_path(frame.file)}:{frame.function}" for frame in frames])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def summary(self):
+        """Returns a compact description: the exception line and the project frames."""
+        lines = [f"{self.exception_type}: {self.message}" + (f" (x{self.count})" if self.count > 1 else "")]
+        for frame in self.project_frames[-MAX_FINGERPRINT_FRAMES:]:
+            lines.append(f"  at {frame.file}:{frame.line} in {frame.function}" + (f": {frame.code}" if frame.code else ""))
+        return "\n".join(lines)
+
+
+def is_project_file(file_path):
+    """Returns False for frames in the standard library, installed packages and generated code."""
+    normalized = file_path.replace("\\", "/")
+    if normalized.startswith(INTERPRETER_PREFIXES):
+        return False
+    return not any(marker in normalized for marker in LIBRARY_MARKERS)
+
+
+def normalize_path(file_path):
+    """Strips absolute prefixes so the same project file gives the same path in any checkout."""
+    normalized = file_path.replace("\\", "/")
+    for anchor in ("/devfolder/", "/projects/"):
+        if anchor in normalized:
+            normalized = normalized.split(anchor, 1)[1]
+            if anchor == "/projects/":
+                normalized = normalized.split("/", 1)[-1]  # drop the project folder name
+    return normalized.lstrip("/")
+
+
+def normalize_message(message):
+    """Removes the volatile parts of an exception message: addresses, numbers and absolute paths."""
+    message = re.sub(r'0x[0-9a-fA-F]+', '0x?', message or "")
+    message = re.sub(r'(?:[A-Za-z]:)?[/\\][^\s\'"]+[/\\]([^/\\\s\'"]+)', r'\1', message)
+    return re.sub(r'\d+', 'N', message).strip()
+
+
+def parse_errors(text):
+    """
+    Turns captured stdout/stderr into structured errors.
+
+    Python tracebacks (including SyntaxError reports and chained exceptions) become one ParsedError
+    each; `SomethingError: message` lines outside a traceback are kept as errors without frames.
+    Identical errors, e.g. the same exception raised in a loop, are collapsed into one entry with a
+    count.
+
+    Args:
+        text (str): The output of a run.
+
+    Returns:
+        List[ParsedError]: The distinct errors in order of first appearance.
+    """
+    errors = []
+    lines = (text or "").splitlines()
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.strip().endswith(TRACEBACK_START):
+            frames = []
+            i += 1
+            while i < len(lines):
+                match = FRAME_LINE.match(lines[i])
+                if match:
+                    code = ""
+                    if i + 1 < len(lines) and lines[i + 1].startswith("    ") and not FRAME_LINE.match(lines[i + 1]):
+                        code = lines[i + 1].strip()
+                        i += 1
+                    frames.append(Frame(match.group(1), int(match.group(2)), match.group(3) or "<module>", code))
+                    i += 1
+                    continue
+                if lines[i].strip() and not lines[i][0].isspace():
+                    # the first unindented line after the frames is the exception
+                    match = EXCEPTION_LINE.match(lines[i].strip())
+                    if match:
+                        errors.append(ParsedError(match.group(1), (match.group(2) or "").strip(), frames))
+                    else:
+                        errors.append(ParsedError("Error", lines[i].strip(), frames))
+                    break
+                i += 1  # code and carets of SyntaxError reports
+            i += 1
+            continue
+        match = LONE_EXCEPTION_LINE.match(line)
+        if match:
+            errors.append(ParsedError(match.group(1), match.group(2).strip()))
+        i += 1
+    return collapse_errors(errors)
+
+
+def collapse_errors(errors):
+    """Merges errors with the same fingerprint, summing their counts."""
+    collapsed = {}
+    for error in errors:
+        key = error.fingerprint
+        if key in collapsed:
+            collapsed[key].count += error.count
+        else:
+            collapsed[key] = error
+    return list(collapsed.values())
+
@@ -0,0 +1,334 @@
+import os
+import sys
+import json
+import time
+import uuid
+import inspect
+import functools
+import threading
+import contextvars
+
+from termcolor import colored
+
+from prompt_cache import CACHE_WRITE_COST, CACHE_READ_COST
+
+# $ per million input and output tokens, matched by model name prefix
+MODEL_PRICES = {
+    "claude-3-5-sonnet": (3.0, 15.0),
+    "claude-3-opus": (15.0, 75.0),
+    "claude-3-sonnet": (3.0, 15.0),
+    "claude-3-haiku": (0.25, 1.25),
+}
+DEFAULT_PRICE = (3.0, 15.0)
+LLM_SPAN = "llm_request"
+TOKEN_FIELDS = ("input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def request_cost(model, input_tokens=0, output_tokens=0, cache_read_tokens=0, cache_write_tokens=0):
+    """Returns the price in $ of one request from its token usage."""
+    input_price, output_price = next((price for prefix, price in MODEL_PRICES.items() if str(model).startswith(prefix)), DEFAULT_PRICE)
+    input_cost = input_tokens + cache_read_tokens * CACHE_READ_COST + cache_write_tokens * CACHE_WRITE_COST
+    return (input_cost * input_price + output_tokens * output_price) / 1_000_000
+
+
+class Span:
+    """One timed step of a session; `attrs` are written with the span when it ends."""
+
+    def __init__(self, tracer, name, parent, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.id = uuid.uuid4().hex[:12]
+        self.parent = parent.id if parent is not None else None
+        self.attrs = dict(attrs)
+        self.start = time.time()
+        self._started = time.monotonic()
+        self.status = "ok"
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, name, amount=1):
+        """Adds to a numeric attribute, such as a retry counter."""
+        self.attrs[name] = self.attrs.get(name, 0) + amount
+
+    def record_usage(self, usage):
+        """Copies the token counts of an api response `usage` into the span."""
+        if usage is None:
+            return
+        self.add("input_tokens", getattr(usage, "input_tokens", None) or 0)
+        self.add("output_tokens", getattr(usage, "output_tokens", None) or 0)
+        self.add("cache_read_tokens", getattr(usage, "cache_read_input_tokens", None) or 0)
+        self.add("cache_write_tokens", getattr(usage, "cache_creation_input_tokens", None) or 0)
+
+    def to_dict(self):
+        record = {"trace": self.tracer.trace_id, "id": self.id, "parent": self.parent, "name": self.name,
+                  "start": round(self.start, 4), "duration": round(time.monotonic() - self._started, 4), "status": self.status}
+        if self.error:
+            record["error"] = self.error
+        record.update(self.attrs)
+        return record
+
+
+class _NoSpan(Span):
+    """Stands in for the current span outside of any traced step, so callers never check for None."""
+
+    def __init__(self):
+        self.attrs = {}
+
+    def set(self, **attrs):
+        pass
+
+    def add(self, name, amount=1):
+        pass
+
+    def record_usage(self, usage):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+class Tracer:
+    """
+    Writes timing spans of a session as JSON lines.
+
+    Spans nest through a context variable, so steps started by asyncio tasks are children of the
+    span that was active when the task was created. Every session gets its own trace id and
+    appends to the same file; `python tracing.py TRACE_FILE` summarizes the latest session.
+    """
+
+    def __init__(self, path, enabled=True):
+        self.path = path
+        self.enabled = enabled
+        self.trace_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self._lock = threading.Lock()
+
+    def span(self, name, **attrs):
+        return _SpanContext(self, name, attrs)
+
+    def traced(self, name=None, args=()):
+        """
+        Decorates a function (sync or async) so every call is a span.
+
+        Args:
+            name (str, optional): Span name, the function name by default.
+            args (Iterable[str], optional): Parameters of the call recorded as span attributes.
+        """
+        return trace_calls(lambda: self, name, args)
+
+    def write(self, span):
+        if not self.enabled:
+            return
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+        except OSError as e:
+            print(colored(f"Could not write trace span: {e}", "red"))
+
+
+def trace_calls(get_tracer, name=None, args=()):
+    """
+    Like Tracer.traced, with the tracer looked up by `get_tracer` on every call, so one decorated
+    function can write to the tracer of whichever session calls it.
+    """
+    def decorator(function):
+        span_name = name or function.__name__
+        signature = inspect.signature(function)
+
+        def call_attrs(call_args, call_kwargs):
+            if not args:
+                return {}
+            bound = signature.bind_partial(*call_args, **call_kwargs)
+            return {arg: bound.arguments[arg] for arg in args if arg in bound.arguments}
+
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*call_args, **call_kwargs):
+                with get_tracer().span(span_name, **call_attrs(call_args, call_kwargs)):
+                    return await function(*call_args, **call_kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*call_args, **call_kwargs):
+            with get_tracer().span(span_name, **call_attrs(call_args, call_kwargs)):
+                return function(*call_args, **call_kwargs)
+        return wrapper
+    return decorator
+
+
+class _SpanContext:
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.span = Span(self.tracer, self.name, _current_span.get(), self.attrs)
+        self._token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.span.status = "cancelled" if exc_type.__name__ == "CancelledError" else "error"
+            self.span.error = f"{exc_type.__name__}: {exc}"[:500]
+        self.tracer.write(self.span)
+        return False
+
+
+def current_span():
+    """Returns the innermost active span, or a span that ignores attributes outside of any."""
+    return _current_span.get() or NO_SPAN
+
+
+def load_spans(path, trace_id=None):
+    """
+    Reads the spans of one session from a trace file.
+
+    Args:
+        path (str): The JSONL trace file.
+        trace_id (str, optional): The session, the latest one in the file by default.
+
+    Returns:
+        List[dict]: The span records of the session.
+    """
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                spans.append(json.loads(line))
+            except ValueError:
+                continue  # a line cut short by a crash
+    if trace_id is None and spans:
+        trace_id = max(spans, key=lambda span: span["start"])["trace"]
+    return [span for span in spans if span["trace"] == trace_id]
+
+
+def critical_path(spans):
+    """
+    Returns the chain of spans that determined the session's wall time.
+
+    Starting from the root that ended last, each step descends into the child that ended last, then
+    walks back through the children that ended before it started. Concurrent siblings that finished
+    earlier are left out: making them faster would not have shortened the session.
+
+    Returns:
+        List[Tuple[int, dict]]: (depth, span) pairs in start order.
+    """
+    children = {}
+    for span in spans:
+        children.setdefault(span.get("parent"), []).append(span)
+    end = lambda span: span["start"] + span["duration"]
+
+    def walk(span, depth):
+        path = [(depth, span)]
+        chain = []
+        cursor = end(span)
+        remaining = sorted(children.get(span["id"], []), key=end, reverse=True)
+        for child in remaining:
+            if end(child) <= cursor + 1e-3:
+                chain.append(child)
+                cursor = child["start"]
+        for child in reversed(chain):
+            path.extend(walk(child, depth + 1))
+        return path
+
+    ids = {span["id"] for span in spans}
+    roots = [span for span in spans if span.get("parent") not in ids]
+    if not roots:
+        return []
+    path = []
+    cursor = None
+    for root in sorted(roots, key=end, reverse=True):
+        if cursor is None or end(root) <= cursor + 1e-3:
+            path[:0] = walk(root, 0)
+            cursor = root["start"]
+    return path
+
+
+def summarize(spans):
+    """
+    Aggregates the spans of a session by name, with the api usage of each step.
+
+    The tokens and cost of each llm request are charged to the step that made it (its parent span).
+
+    Returns:
+        Dict[str, dict]: {span name: {"count", "total", "max", "errors", "retries", "rate_limited",
+            "llm_requests", token fields..., "cost"}}.
+    """
+    by_id = {span["id"]: span for span in spans}
+    steps = {}
+
+    def step(name):
+        return steps.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0, "errors": 0, "retries": 0, "rate_limited": 0,
+                                       "llm_requests": 0, **{field: 0 for field in TOKEN_FIELDS}, "cost": 0.0})
+
+    for span in spans:
+        entry = step(span["name"])
+        entry["count"] += 1
+        entry["total"] += span["duration"]
+        entry["max"] = max(entry["max"], span["duration"])
+        entry["errors"] += span["status"] != "ok"
+        if span["name"] != LLM_SPAN:
+            continue
+        parent = by_id.get(span.get("parent"))
+        owner = step(parent["name"] if parent else "(no step)")
+        owner["llm_requests"] += 1
+        owner["retries"] += span.get("retries", 0)
+        owner["rate_limited"] += span.get("rate_limited", 0)
+        for field in TOKEN_FIELDS:
+            owner[field] += span.get(field, 0)
+        owner["cost"] += request_cost(span.get("model"), **{field: span.get(field, 0) for field in TOKEN_FIELDS})
+    return steps
+
+
+def print_summary(spans):
+    if not spans:
+        print("No spans found.")
+        return
+    steps = summarize(spans)
+    wall = max(span["start"] + span["duration"] for span in spans) - min(span["start"] for span in spans)
+    total_cost = sum(entry["cost"] for entry in steps.values())
+    llm = steps.get(LLM_SPAN, {"count": 0, "total": 0.0})
+    print(colored(f"Trace {spans[0]['trace']}: {wall:.1f}s wall, {llm['count']} llm requests "
+                  f"({llm['total']:.1f}s), ${total_cost:.4f}", "cyan"))
+
+    print(colored("\nCritical path:", "cyan"))
+    for depth, span in critical_path(spans):
+        label = span["name"]
+        for attr in ("file_name", "model"):
+            if attr in span:
+                label += f" {span[attr]}"
+        color = "red" if span["status"] != "ok" else None
+        print(colored(f"  {'  ' * depth}{label:<{50 - 2 * depth}} {span['duration']:>9.2f}s", color))
+
+    print(colored("\nSteps:", "cyan"))
+    print(f"  {'step':<26} {'count':>5} {'total s':>9} {'max s':>8} {'llm':>5} {'retries':>7} {'429s':>5} "
+          f"{'input':>9} {'output':>8} {'cached':>9} {'cost $':>8}")
+    for name, entry in sorted(steps.items(), key=lambda item: item[1]["total"], reverse=True):
+        print(f"  {name:<26} {entry['count']:>5} {entry['total']:>9.1f} {entry['max']:>8.1f} {entry['llm_requests']:>5} "
+              f"{entry['retries']:>7} {entry['rate_limited']:>5} {entry['input_tokens'] + entry['cache_write_tokens']:>9} "
+              f"{entry['output_tokens']:>8} {entry['cache_read_tokens']:>9} {entry['cost']:>8.4f}")
+
+
+def main():
+    usage = "usage: python tracing.py <trace.jsonl> [trace id]"
+    if len(sys.argv) not in (2, 3):
+        print(usage)
+        sys.exit(1)
+    try:
+        spans = load_spans(sys.argv[1], sys.argv[2] if len(sys.argv) == 3 else None)
+    except OSError as e:
+        print(f"Could not read {sys.argv[1]}: {e}")
+        sys.exit(1)
+    print_summary(spans)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import os
+import sys
+import contextvars
+from contextlib import contextmanager
+
+SYSTEM_FOLDER = ".system"  # inside the project folder: plan, logs, caches, snapshots and the virtualenv
+
+_current_workspace = contextvars.ContextVar("current_workspace", default=None)
+_default_workspace = None
+
+
+class Workspace:
+    """
+    Everything one project build owns: its folders, the caches and indexes over its files, its
+    checkpoint and trace, its share of the api budget and the state of its runs.
+
+    The orchestrator reads the workspace with `current_workspace()` instead of module globals, so one
+    process can build several projects at once: each build runs in its own asyncio task under
+    `use_workspace(ws)`, and the tasks and threads it starts inherit the workspace. The components
+    (project index, response cache, tracer, ...) are attached by the orchestrator, which holds their
+    settings; see create_workspace in agent_application_makercopysystemupdate.py.
+    """
+
+    def __init__(self, root, dev_folder_name="devfolder", headless_policy=None, max_attempts=5):
+        """
+        Args:
+            root (str): The folder holding the project folder, such as a --batch job folder.
+            dev_folder_name (str, optional): Name of the project folder inside `root`.
+            headless_policy (HeadlessPolicy, optional): Answers the prompts of an unattended build,
+                None when a person is at the keyboard.
+            max_attempts (int, optional): Fix rounds before the user is asked, or a headless build gives up.
+        """
+        self.root = os.path.abspath(root)
+        self.dev_folder_name = dev_folder_name
+        self.dev_folder = f"{self.root}/{dev_folder_name}"
+        self.system_folder = f"{self.dev_folder}/{SYSTEM_FOLDER}"
+        self.logs_folder = f"{self.system_folder}/logs"
+        self.snapshot_folder = f"{self.system_folder}/snapshots"
+        self.response_cache_folder = f"{self.system_folder}/response_cache"
+        self.plan_file = f"{self.system_folder}/application_plan.xml"
+        self.test_impact_file = f"{self.system_folder}/test_impact.json"
+        self.test_coverage_map_file = f"{self.system_folder}/test_coverage_map.json"  # optional {test module: [files it covers]}
+        self.pipeline_state_file = f"{self.system_folder}/pipeline_state.json"
+        self.trace_file = f"{self.logs_folder}/trace.jsonl"
+
+        self.headless_policy = headless_policy
+        self.max_attempts = max_attempts
+        self.request_counter = 0
+        self.unittest_exists = False
+        self.backup_task = None  # in-flight snapshot shared by concurrent update_backup_folder calls
+        self.changed_files = set()  # project files written since the last test run
+        self.replayed_fixes = set()  # error fingerprints whose fix memo patch was replayed in this build
+        self.last_line_count = None  # LineCount of the last count_lines_of_code
+        self.output = None  # file the prints of the build go to under route_output, None for the terminal
+
+        # attached by the orchestrator
+        self.rate_limiter = None  # the api budget, shared with the other workspaces of the process or a share of it
+        self.project_index = None
+        self.retrieval_index = None
+        self.dependency_environment = None
+        self.response_cache = None
+        self.prompt_cache_stats = None
+        self.tracer = None
+        self.pipeline_state = None
+        self.speculation = None
+        self.log_sink = None
+        self.line_counter = None
+        self.impact_selector = None
+
+    def __repr__(self):
+        return f"Workspace({self.dev_folder!r})"
+
+
+def set_default_workspace(workspace):
+    """Sets the workspace used wherever no other workspace is active."""
+    global _default_workspace
+    _default_workspace = workspace
+
+
+def current_workspace():
+    """
+    Returns the workspace of the running build, or the default workspace outside of any.
+
+    Raises:
+        RuntimeError: If no workspace is active and no default was set.
+    """
+    workspace = _current_workspace.get() or _default_workspace
+    if workspace is None:
+        raise RuntimeError("No workspace is active")
+    return workspace
+
+
+@contextmanager
+def use_workspace(workspace):
+    """Makes `workspace` the current workspace of this task, and of the tasks and threads it starts."""
+    token = _current_workspace.set(workspace)
+    try:
+        yield workspace
+    finally:
+        _current_workspace.reset(token)
+
+
+class _WorkspaceOutput:
+    """Stands in for sys.stdout and sends each write to the output of the current workspace."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def _target(self):
+        workspace = _current_workspace.get()
+        output = workspace.output if workspace is not None else None
+        return output if output is not None else self.stream
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+@contextmanager
+def route_output():
+    """
+    Sends what concurrent builds print to their workspace `output` instead of interleaving it on
+    the terminal. Prints outside of a workspace with an output still reach the terminal.
+    """
+    stream = sys.stdout
+    sys.stdout = _WorkspaceOutput(stream)
+    try:
+        yield
+    finally:
+        sys.stdout = stream